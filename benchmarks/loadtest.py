@@ -0,0 +1,248 @@
+"""
+Load test for the TravelGuide planning flow.
+
+Drives N concurrent simulated sessions through the same steps as one trip in
+main() - geocode both ends, route, summarise, render the directions, fetch
+the weather at both ends, check it with Gemini and build the voice
+instructions - against the recorded stand-ins, with optional latency and
+error injection. Module-level state (consoles, the shared `Genai` object,
+the process-wide tracer) is shared between sessions exactly as it would be
+in a multi-user deployment, so contention shows up in the numbers.
+
+Reports p50/p95/p99 end-to-end and per-stage latency, throughput, error
+counts and memory growth for every concurrency level.
+
+Usage:
+    python benchmarks/loadtest.py [--sessions 200] [--concurrency 1,8,32]
+                                  [--latency-ms 50] [--jitter-ms 20] [--error-rate 0.02]
+                                  [--throttle] [--warm-cache]
+"""
+import argparse
+import json
+import os
+import pathlib
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+os.chdir(ROOT)  # theme files are resolved relative to the project root
+
+from rich.console import Console  # noqa: E402
+
+from utils import voice  # noqa: E402
+from utils.directions import render_steps  # noqa: E402
+from utils.geocoding import Geocoding  # noqa: E402
+from utils.interface import dark  # noqa: E402
+from utils.meteo import OpenMeteo  # noqa: E402
+from utils.routing import Routing  # noqa: E402
+from utils.trace import tracer  # noqa: E402
+
+from run import ROUTE_SIZES, fresh_caches, make_genai, upstream_limits  # noqa: E402
+from standins import (  # noqa: E402
+    Faults, RecordedModel, RecordedUpstreams, SilentMixer, SilentTTS, load_fixture, scaled_route_payload,
+)
+
+DEFAULT_OUTPUT = ROOT / "benchmarks" / "results" / "loadtest.json"
+
+# Trips the simulated sessions cycle through
+TRIPS = (("Incheon", "Seoul"), ("Seoul", "Busan"), ("Daejeon", "Gwangju"), ("Suwon", "Incheon"))
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(timings_ms):
+    timings_ms = sorted(timings_ms)
+    return {
+        "count": len(timings_ms),
+        "p50_ms": round(percentile(timings_ms, 50), 3) if timings_ms else None,
+        "p95_ms": round(percentile(timings_ms, 95), 3) if timings_ms else None,
+        "p99_ms": round(percentile(timings_ms, 99), 3) if timings_ms else None,
+        "max_ms": round(timings_ms[-1], 3) if timings_ms else None,
+    }
+
+
+class StageCollector:
+    """Tracer listener that keeps span durations and error counts per stage name"""
+    def __init__(self):
+        self.timings = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.timings = {}
+            self.errors = {}
+
+    def __call__(self, span):
+        status = span.attrs.get("status")
+        failed = span.error or (isinstance(status, int) and status >= 400)
+        with self._lock:
+            self.timings.setdefault(span.name, []).append(span.duration_ms)
+            if failed:
+                self.errors[span.name] = self.errors.get(span.name, 0) + 1
+
+    def report(self):
+        with self._lock:
+            timings = dict(self.timings)
+            errors = dict(self.errors)
+        return {name: dict(summarize(values), errors=errors.get(name, 0))
+                for name, values in sorted(timings.items())}
+
+
+def run_session(index, geo, router, weather, gpt, console):
+    """
+    Plans one trip like main() does.
+
+    Returns:
+        str: "ok", "degraded" (an LLM step returned an error text) or "failed"
+        (geocoding or routing did not succeed).
+    """
+    origin, destination = TRIPS[index % len(TRIPS)]
+    status, orig_lat, orig_lng, origin = geo.geocoding(origin)
+    if status != 200 or orig_lat == "null":
+        return "failed"
+    status, dest_lat, dest_lng, destination = geo.geocoding(destination)
+    if status != 200 or dest_lat == "null":
+        return "failed"
+
+    status, route = router.route(orig_lat, orig_lng, dest_lat, dest_lng, "car")
+    if status != 200:
+        return "failed"
+
+    texts = [gpt.generate_route_summary(route, origin, destination, "car")]
+    render_steps(console, route)
+
+    hours = max(1, int(route.hours) + 1)
+    current = weather.get_hourly(orig_lat, orig_lng)
+    forecast = weather.get_hourly(dest_lat, dest_lng)
+    texts.append(gpt.check_weather_conditions(origin, destination, f"{route.hours:.1f}", current, forecast, hours))
+
+    instructions = gpt.convert_to_natural_instructions(route)
+    texts.append(instructions if isinstance(instructions, str) else "")
+    return "degraded" if any(str(text).startswith("❌") for text in texts) else "ok"
+
+
+def run_level(concurrency, sessions, session_args, collector):
+    """
+    Runs `sessions` trips on `concurrency` worker threads.
+
+    Returns:
+        dict: End-to-end and per-stage latency percentiles, throughput,
+        outcome counts and traced memory growth in KiB.
+    """
+    collector.reset()
+    end_to_end = []
+    outcomes = {}
+    lock = threading.Lock()
+
+    def session(index):
+        start = time.perf_counter()
+        try:
+            outcome = run_session(index, *session_args)
+        except Exception as e:
+            outcome = f"crashed: {type(e).__name__}"
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            end_to_end.append(elapsed)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(session, range(sessions)))
+    wall = time.perf_counter() - start
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "wall_s": round(wall, 3),
+        "sessions_per_s": round(sessions / wall, 2) if wall else None,
+        "end_to_end": summarize(end_to_end),
+        "outcomes": dict(sorted(outcomes.items())),
+        "memory_growth_kib": round((after - before) / 1024, 1),
+        "memory_peak_kib": round(peak / 1024, 1),
+        "stages": collector.report(),
+    }
+
+
+def print_level(level):
+    e2e = level["end_to_end"]
+    print(f"\nconcurrency {level['concurrency']:>3}: {level['sessions_per_s']} sessions/s, "
+          f"p50 {e2e['p50_ms']} ms, p95 {e2e['p95_ms']} ms, p99 {e2e['p99_ms']} ms, "
+          f"memory +{level['memory_growth_kib']} KiB (peak {level['memory_peak_kib']} KiB), "
+          f"outcomes {level['outcomes']}")
+    for name, stats in level["stages"].items():
+        print(f"  {name:32} n={stats['count']:>5} p50 {stats['p50_ms']:>9} p95 {stats['p95_ms']:>9} "
+              f"p99 {stats['p99_ms']:>9} errors {stats['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the TravelGuide planning flow against local stand-ins")
+    parser.add_argument("--sessions", type=int, default=200, help="sessions per concurrency level")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="injected upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra random upstream latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability that an upstream call fails")
+    parser.add_argument("--route-size", choices=list(ROUTE_SIZES), default="small", help="length of the served route")
+    parser.add_argument("--throttle", action="store_true", help="keep the real upstream rate limits")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="serve repeated trips from the fresh caches instead of the upstreams")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the injected faults")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="where to write the JSON results")
+    args = parser.parse_args()
+
+    faults = Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    route_payload = scaled_route_payload(load_fixture("graphhopper_route.json"), ROUTE_SIZES[args.route_size])
+    upstreams = RecordedUpstreams(route_payload, faults)
+    gpt = make_genai(RecordedModel(faults))
+    quiet = Console(file=open(os.devnull, "w", encoding="utf-8"), theme=dark, width=100, height=40)
+    collector = StageCollector()
+    tracer.add_listener(collector)
+
+    levels = []
+    with mock.patch("requests.get", upstreams.get), \
+            mock.patch("utils.geocoding.console", quiet), \
+            mock.patch("utils.meteo.console", quiet), \
+            fresh_caches(args.warm_cache), \
+            mock.patch("utils.prompts.current_hour_index", return_value=0), \
+            upstream_limits(args.throttle), \
+            mock.patch.object(voice, "gTTS", SilentTTS), \
+            mock.patch.object(voice, "pygame", types.SimpleNamespace(mixer=SilentMixer)):
+        session_args = (Geocoding("loadtest"), Routing("loadtest"), OpenMeteo(), gpt, quiet)
+        for concurrency in (int(level) for level in args.concurrency.split(",")):
+            level = run_level(concurrency, args.sessions, session_args, collector)
+            print_level(level)
+            levels.append(level)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {key: value for key, value in vars(args).items() if key != "output"},
+        "upstream_calls": dict(sorted(upstreams.calls.items())),
+        "levels": levels,
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as fp:
+        json.dump(report, fp, indent=2, sort_keys=True)
+        fp.write("\n")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
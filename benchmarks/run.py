@@ -0,0 +1,272 @@
+"""
+Offline benchmark suite for the TravelGuide pipeline stages.
+
+Replays recorded GraphHopper, Open-Meteo and Gemini responses through local
+stand-ins and reports per-stage latency, memory and throughput for small,
+typical and very long routes. Results are written as JSON so regressions
+show up as plain diffs.
+
+Usage:
+    python benchmarks/run.py [--output FILE] [--compare BASELINE] [--quick]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import pathlib
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+from unittest import mock
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+os.chdir(ROOT)  # theme files are resolved relative to the project root
+
+from rich.console import Console  # noqa: E402
+
+from utils import geocoding, meteo, resilience, routing, voice  # noqa: E402
+from utils.directions import render_steps  # noqa: E402
+from utils.cache import TTLCache  # noqa: E402
+from utils.genai import Genai  # noqa: E402
+from utils.geocoding import Geocoding  # noqa: E402
+from utils.hedge import Hedge  # noqa: E402
+from utils.interface import dark  # noqa: E402
+from utils.meteo import OpenMeteo  # noqa: E402
+from utils.polyline import decode, simplify  # noqa: E402
+from utils.route import Route  # noqa: E402
+from utils.routing import Routing  # noqa: E402
+from utils.timeline import Timeline  # noqa: E402
+
+from standins import (  # noqa: E402
+    RecordedModel, RecordedUpstreams, SilentMixer, SilentTTS, load_fixture, scaled_route_payload,
+)
+
+DEFAULT_OUTPUT = ROOT / "benchmarks" / "results" / "latest.json"
+
+# Route sizes: how many times the recorded route is chained
+ROUTE_SIZES = {"small": 1, "typical": 6, "long": 100}
+
+# Absolute limits on median latency (ms), checked on every run regardless of a baseline
+STAGE_BUDGETS_MS = {
+    "polyline_simplify_long": 2000,
+}
+
+
+def measure(fn, repeat, items=None):
+    """
+    Times `fn` and records its memory use.
+
+    Parameters:
+        fn (callable): The stage to run.
+        repeat (int): Number of timed runs after one warm-up run.
+        items (int): Work items per run (e.g. instructions), for throughput.
+
+    Returns:
+        dict: Latency percentiles in milliseconds, runs per second, optional
+        items per second, and peak/retained traced memory in KiB.
+    """
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    tracemalloc.start()
+    result = fn()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    median = statistics.median(timings)
+    stats = {
+        "runs": repeat,
+        "median_ms": round(median, 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "min_ms": round(timings[0], 3),
+        "runs_per_s": round(1000 / median, 1) if median else None,
+        "peak_kib": round(peak / 1024, 1),
+        "retained_kib": round(retained / 1024, 1),
+    }
+    if items:
+        stats["items"] = items
+        stats["items_per_s"] = round(items * 1000 / median) if median else None
+    return stats
+
+
+def make_genai(model):
+    gpt = Genai.__new__(Genai)
+    gpt.model = gpt.light_model = model
+    gpt.hedge = Hedge("gemini")
+    # Never reuse answers, every call measures the prompt path
+    gpt.responses = TTLCache(-1, maxsize=1)
+    return gpt
+
+
+# Quota used instead of the real ones, so runs measure the code rather than limiter sleeps
+UNLIMITED_RATE_PER_MIN = 10 ** 9
+UNLIMITED_BURST = 1000
+
+
+def upstream_limits(throttle=False):
+    """
+    Patch the process-wide upstream quotas for a harness run: unlimited, or the
+    real ones when `throttle` is set. Upstreams are re-created inside the patch;
+    *_RATE_PER_MIN environment variables still apply.
+    """
+    if throttle:
+        limits = dict(resilience.UPSTREAM_LIMITS)
+    else:
+        limits = {name: (UNLIMITED_RATE_PER_MIN, UNLIMITED_BURST) for name in resilience.UPSTREAM_LIMITS}
+    return mock.patch.multiple(resilience, UPSTREAM_LIMITS=limits, _upstreams={})
+
+
+@contextlib.contextmanager
+def fresh_caches(warm=False):
+    """
+    Turn off the fresh-answer caches of geocoding, routing and forecasts for a
+    harness run, so every call goes through the upstream stand-ins; `warm`
+    keeps them on.
+    """
+    if warm:
+        yield
+        return
+    with mock.patch.object(geocoding, "FRESH_TTL", -1), \
+            mock.patch.object(routing, "FRESH_TTL", -1), \
+            mock.patch.object(meteo, "FRESH_TTL", -1):
+        yield
+
+
+def run_benchmarks(quick=False, throttle=False):
+    repeat = 5 if quick else 20
+    upstreams = RecordedUpstreams()
+    model = RecordedModel()
+    gpt = make_genai(model)
+    quiet = Console(file=io.StringIO(), theme=dark, width=100, height=40)
+    recorded_route = load_fixture("graphhopper_route.json")
+    payloads = {size: scaled_route_payload(recorded_route, copies) for size, copies in ROUTE_SIZES.items()}
+    routes = {size: Route.from_json(payload) for size, payload in payloads.items()}
+
+    results = {}
+    with mock.patch("requests.get", upstreams.get), \
+            mock.patch("utils.geocoding.console", quiet), \
+            mock.patch("utils.meteo.console", quiet), \
+            fresh_caches(), \
+            mock.patch("utils.prompts.current_hour_index", return_value=0), \
+            upstream_limits(throttle), \
+            mock.patch.object(voice, "gTTS", SilentTTS), \
+            mock.patch.object(voice, "pygame", types.SimpleNamespace(mixer=SilentMixer)):
+
+        geo = Geocoding("benchmark")
+        router = Routing("benchmark")
+        weather = OpenMeteo()
+
+        results["geocode"] = measure(lambda: geo.geocoding("Seoul"), repeat)
+        results["route_fetch"] = measure(lambda: router.route(37.45, 126.65, 37.55, 126.97, "car"), repeat)
+
+        for size, payload in payloads.items():
+            route = routes[size]
+            runs = max(2, repeat // 4) if size == "long" else repeat
+            results[f"route_parse_{size}"] = measure(lambda p=payload: Route.from_json(p), runs, len(route))
+            results[f"route_walk_{size}"] = measure(
+                lambda r=route: sum(step.distance for step in r), runs, len(route))
+            # Build the index and ask for the position at every minute of the trip
+            results[f"route_timeline_{size}"] = measure(
+                lambda r=route: Timeline(r).positions_at(range(0, r.time, 60000)), runs, len(route))
+            results[f"polyline_decode_{size}"] = measure(lambda r=route: decode(r.points), runs)
+            lats, lngs = decode(route.points)
+            results[f"polyline_simplify_{size}"] = measure(
+                lambda la=lats, ln=lngs: simplify(la, ln, 5.0), max(2, runs // 4), len(lats))
+            results[f"render_{size}"] = measure(
+                lambda r=route: render_steps(quiet, r), runs, len(route))
+
+        results["weather_parse_1h"] = measure(lambda: weather.get_weather(37.55, 126.98, hours=1, start=0), repeat)
+        results["weather_parse_168h"] = measure(lambda: weather.get_weather(37.55, 126.98, hours=168, start=0), repeat)
+
+        hourly = weather.get_hourly(37.55, 126.98)
+        model.prompt_chars.clear()
+        results["prompt_route_summary"] = measure(
+            lambda: gpt.generate_route_summary(routes["typical"], "Incheon", "Seoul", "car"), repeat)
+        results["prompt_weather"] = measure(
+            lambda: gpt.check_weather_conditions("Incheon", "Seoul", "0.5", hourly, hourly, 168), repeat)
+        results["prompt_natural_instructions"] = measure(
+            lambda: gpt.convert_to_natural_instructions(routes["long"]), repeat)
+        results["prompt_chars_max"] = max(model.prompt_chars)
+
+        instructions = gpt.convert_to_natural_instructions(routes["small"])
+        results["voice_pipeline"] = measure(lambda: voice.voice_navigation(instructions), repeat,
+                                            len(instructions))
+
+    results["upstream_calls"] = dict(sorted(upstreams.calls.items()))
+    return results
+
+
+def over_budget(results):
+    """Print and return stages whose median latency is above their `STAGE_BUDGETS_MS` limit"""
+    failures = []
+    for stage, budget in STAGE_BUDGETS_MS.items():
+        median = (results.get(stage) or {}).get("median_ms")
+        if median is not None and median > budget:
+            print(f"{stage:32} median_ms {median:>12} over the budget of {budget} ms  OVER BUDGET")
+            failures.append(stage)
+    return failures
+
+
+def compare(results, baseline, threshold):
+    """Print stages whose median latency or peak memory grew by more than `threshold` percent"""
+    regressions = []
+    for stage, stats in sorted(results.items()):
+        before = baseline.get(stage)
+        if not isinstance(stats, dict) or not isinstance(before, dict):
+            continue
+        for metric in ("median_ms", "peak_kib"):
+            old = before.get(metric)
+            new = stats.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            marker = "REGRESSION" if change > threshold else ""
+            print(f"{stage:32} {metric:10} {old:>12} -> {new:>12} ({change:+.1f}%) {marker}")
+            if change > threshold:
+                regressions.append((stage, metric))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline TravelGuide benchmarks")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="where to write the JSON results")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=25.0, help="regression threshold in percent")
+    parser.add_argument("--quick", action="store_true", help="fewer runs per stage")
+    parser.add_argument("--throttle", action="store_true", help="keep the real upstream rate limits")
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "stages": run_benchmarks(args.quick, args.throttle),
+    }
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as fp:
+        json.dump(report, fp, indent=2, sort_keys=True)
+        fp.write("\n")
+    print(f"Results written to {args.output}")
+
+    failed = over_budget(report["stages"])
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fp:
+            baseline = json.load(fp)["stages"]
+        failed += compare(report["stages"], baseline, args.threshold)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Local stand-ins for the upstream services, replaying recorded responses.
+
+`RecordedUpstreams.get` replaces `requests.get` and serves the GraphHopper
+and Open-Meteo fixtures by URL; `RecordedModel` replaces the Gemini model
+object held by `Genai`. Both accept a `Faults` object to inject latency and
+errors for load tests. Nothing here touches the network.
+"""
+import json
+import pathlib
+import random
+import threading
+import time
+from array import array
+
+from utils import polyline
+
+FIXTURES_DIR = pathlib.Path(__file__).resolve().parent / "fixtures"
+
+# Largest shift, in degrees (about 3 m), applied to the inner points of each
+# copy of a scaled route, so the copies are not exact repeats of each other
+COPY_JITTER_DEG = 3e-5
+
+
+def load_fixture(name):
+    with open(FIXTURES_DIR / name, "rb") as fp:
+        return fp.read()
+
+
+def scaled_route_payload(payload, copies, jitter=COPY_JITTER_DEG):
+    """
+    Builds a longer route by chaining the recorded route `copies` times.
+
+    Each copy's geometry is shifted so the result stays a continuous line, and
+    its inner points are moved by a small, seeded amount so no two copies are
+    identical, which keeps polyline decoding and simplification realistic.
+
+    Parameters:
+        payload (bytes): Recorded GraphHopper route response.
+        copies (int): How many times to repeat the recorded path.
+        jitter (float): Largest shift of an inner point, in degrees.
+
+    Returns:
+        bytes: A GraphHopper-shaped response body.
+    """
+    data = json.loads(payload)
+    path = data["paths"][0]
+    lats, lngs = polyline.decode(path["points"])
+    dlat = lats[-1] - lats[0]
+    dlng = lngs[-1] - lngs[0]
+    steps = path["instructions"][:-1]
+    finish = path["instructions"][-1]
+    n = len(lats)
+
+    all_lats = array("d")
+    all_lngs = array("d")
+    instructions = []
+    for copy in range(copies):
+        offset = copy * (n - 1)
+        start = 1 if copy else 0
+        rng = random.Random(copy)
+        for i in range(start, n):
+            # The end points stay put so the copies still join up
+            shift_lat, shift_lng = (0.0, 0.0) if i in (0, n - 1) or not copy else \
+                (rng.uniform(-jitter, jitter), rng.uniform(-jitter, jitter))
+            all_lats.append(lats[i] + dlat * copy + shift_lat)
+            all_lngs.append(lngs[i] + dlng * copy + shift_lng)
+        for step in steps:
+            step = dict(step, interval=[step["interval"][0] + offset, step["interval"][1] + offset])
+            instructions.append(step)
+    last = len(all_lats) - 1
+    instructions.append(dict(finish, interval=[last, last]))
+
+    path = dict(path,
+                distance=path["distance"] * copies,
+                time=path["time"] * copies,
+                points=polyline.encode(all_lats, all_lngs),
+                instructions=instructions)
+    return json.dumps(dict(data, paths=[path])).encode("utf-8")
+
+
+class Faults:
+    """
+    Latency and error injection shared by the stand-ins.
+
+    Parameters:
+        latency_ms (float): Base delay added to every call.
+        jitter_ms (float): Extra uniformly distributed delay on top of `latency_ms`.
+        error_rate (float): Probability (0-1) that a call fails.
+        seed (int): Seed for reproducible runs.
+    """
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self):
+        """Sleep for the injected latency and return True if this call should fail"""
+        with self._lock:
+            delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+            failed = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay / 1000)
+        return failed
+
+
+class RecordedResponse:
+    """Minimal stand-in for `requests.Response`"""
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class RecordedUpstreams:
+    """
+    Serves recorded GraphHopper and Open-Meteo responses by URL.
+
+    Parameters:
+        route_payload (bytes): Route response to serve, defaults to the recorded one.
+        faults (Faults): Optional latency and error injection; failed calls get a 503.
+    """
+    def __init__(self, route_payload=None, faults=None):
+        self.geocode = load_fixture("graphhopper_geocode.json")
+        self.route = route_payload or load_fixture("graphhopper_route.json")
+        self.weather = load_fixture("open_meteo.json")
+        self.faults = faults
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, *args, **kwargs):
+        if "graphhopper.com/api/1/geocode" in url:
+            name, body = "geocode", self.geocode
+        elif "graphhopper.com/api/1/route" in url:
+            name, body = "route", self.route
+        elif "api.open-meteo.com" in url:
+            name, body = "weather", self.weather
+        else:
+            return RecordedResponse(b'{"message": "unknown upstream"}', 404)
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.faults and self.faults.apply():
+            return RecordedResponse(b'{"message": "injected upstream error"}', 503)
+        return RecordedResponse(body)
+
+
+class RecordedText:
+    def __init__(self, text):
+        self.text = text
+
+
+class RecordedModel:
+    """
+    Stand-in for `genai.GenerativeModel` that answers from recorded responses.
+
+    The response is picked from keywords in the prompt; prompt sizes are kept
+    so the benchmark can report how large the generated prompts are.
+
+    Parameters:
+        faults (Faults): Optional latency and error injection; failed calls raise.
+    """
+    def __init__(self, faults=None):
+        self.responses = json.loads(load_fixture("gemini.json"))
+        self.faults = faults
+        self.prompt_chars = []
+
+    def generate_content(self, prompt, *args, **kwargs):
+        self.prompt_chars.append(len(prompt))
+        if self.faults and self.faults.apply():
+            raise RuntimeError("injected model error")
+        lowered = prompt.lower()
+        if "weather" in lowered:
+            key = "weather"
+        elif "navigation" in lowered:
+            key = "natural_instructions"
+        elif "acomondation" in lowered or "accommodation" in lowered:
+            key = "accommodations"
+        else:
+            key = "route_summary"
+        return RecordedText(self.responses[key])
+
+
+class SilentMixer:
+    """Stand-in for `pygame.mixer` that finishes playback immediately"""
+    class music:
+        @staticmethod
+        def load(*args, **kwargs):
+            pass
+
+        @staticmethod
+        def play(*args, **kwargs):
+            pass
+
+        @staticmethod
+        def get_busy():
+            return False
+
+    @staticmethod
+    def init(*args, **kwargs):
+        pass
+
+
+class SilentTTS:
+    """Stand-in for `gTTS` that writes a few bytes instead of calling Google"""
+    def __init__(self, text, lang="en"):
+        self.text = text
+
+    def write_to_fp(self, fp):
+        fp.write(b"ID3" + self.text.encode("utf-8"))
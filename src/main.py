@@ -1,8 +1,8 @@
-import requests
 import urllib
 import os
 import dotenv
 import math
+import logging
 from utils import *
 from rich.table import Table
 import datetime
@@ -14,21 +14,35 @@ from rich.columns import Columns
 from rich.text import Text
 import signal
 import sys
+import argparse
 import questionary
 
 from utils.gmaps import create_google_maps_link
-from utils.common import safe_confirm, safe_input, signal_handler, check_quit, open_url_in_browser, custom_style, suggest_transport
+from utils.polyline import simplify, pick_waypoints
+from utils.export import export_route
+from utils.directions import render_steps
+from utils.compare import compare_routes, best_by_profile, COMPARE_PROFILES
+from utils.flight import FlightEstimator
+from utils.transit import GTFSFeed, TransitPlanner
+from utils.trace import tracer, span
+from utils.metrics import registry, record_span
+from utils.common import safe_confirm, safe_input, signal_handler, check_quit, open_url_in_browser, custom_style, suggest_transport, ask
+from utils.deadline import Deadline, Cancelled, activate, allows
+from utils.fallbacks import is_error, local_route_summary, local_weather_advisory, local_voice_instructions
+from utils.history import TripHistory, HISTORY_PATH, ROUTED_PROFILES
+from utils.accommodation import AccommodationIndex, ACCOMMODATIONS_PATH
+from utils.tour import plan_tour, MAX_STOPS
+from utils.isochrone import reachable_area
+from utils.tripstate import trip_state
+from utils.snapshot import SNAPSHOT_PATH, restore as restore_snapshot, save as save_snapshot
 from utils.hotel import find_real_accommodations
-from utils import create_calendar_event
+from utils import create_calendar_events, warm_up_calendar
 from utils.common import exit_event, check_exit, reset_exit
 
 # Theme setup
 from utils.interface import dark
 console = Console(theme=dark)
 
-# API setup
-route_url = "https://graphhopper.com/api/1/route?"
-
 dotenv.load_dotenv()
 graphhopper_api_key = os.getenv("GH_API_KEY")
 genai_api_key = os.getenv("GEMINI_API_KEY")
@@ -54,43 +68,101 @@ if not genai_api_key:
     exit(1)
 
 genai_model = os.getenv("GENAI_MODEL", "gemini-2.0-flash")
+genai_light_model = os.getenv("GENAI_LIGHT_MODEL", "gemini-2.0-flash-lite")
+# Send a second Gemini request when one is slower than this latency percentile, for at most this share of calls
+genai_hedge_percentile = float(os.getenv("GENAI_HEDGE_PERCENTILE", "0.9"))
+genai_hedge_ratio = float(os.getenv("GENAI_HEDGE_RATIO", "0.1"))
+# One line per Gemini call with estimated and reported tokens; empty turns the log off
+genai_token_log = os.getenv("GENAI_TOKEN_LOG", os.path.join("profiles", "genai_tokens.log"))
+gtfs_path = os.getenv("GTFS_PATH")
+trip_budget = float(os.getenv("TRIP_BUDGET_S", "60"))
+# Caches are saved here on exit and reloaded at start; empty turns snapshots off
+snapshot_path = os.getenv("SNAPSHOT_PATH", SNAPSHOT_PATH)
+snapshot_max_bytes = int(float(os.getenv("SNAPSHOT_MAX_MB", "32")) * 1024 * 1024)
+
+# Reachable places listed at most
+MAX_REACHABLE_ROWS = 15
+
+# Budget (seconds) that must be left to attempt an optional stage; otherwise a local fallback is used
+AI_STAGE_MIN_S = 8
+WEATHER_STAGE_MIN_S = 2
 geo = Geocoding(graphhopper_api_key)
-gpt = Genai(genai_api_key, genai_model)
+router = Routing(graphhopper_api_key)
+flights = FlightEstimator()
+lodging = AccommodationIndex(os.getenv("ACCOMMODATIONS_PATH") or ACCOMMODATIONS_PATH)
+transit_planner = None
+gpt = Genai(genai_api_key, genai_model, genai_light_model, genai_hedge_percentile, genai_hedge_ratio)
+
+# Geocoding, route, forecasts and weather advisory of the current trip; a changed input
+# (another profile, a new destination) only re-runs the stages that depend on it
+stages = trip_state(geo, router, OpenMeteo(), gpt)
+
+# Past trips replay instantly and keep the fallback caches warm
+history = TripHistory(os.getenv("HISTORY_PATH", HISTORY_PATH))
+history.warm(geo, router)
+
+# Cache tiers kept across restarts, in the order they get a share of the snapshot size limit
+cache_tiers = {
+    "geocode": geo.fallback,
+    "forecast": OpenMeteo().fallback,
+    "llm": gpt.responses,
+    "route": router.fallback,
+}
+# Sections are only decoded when their cache is first used
+snapshot = restore_snapshot(cache_tiers, snapshot_path, snapshot_max_bytes) if snapshot_path else None
+
+def store_snapshot():
+    """Write the cache tiers to the snapshot file; a failed write only costs a cold start next time"""
+    if not snapshot_path:
+        return
+    try:
+        save_snapshot(cache_tiers, snapshot_path, snapshot_max_bytes)
+    except OSError:
+        pass
 
-def select_vehicle_profile():
+def select_vehicle_profile(recent=False):
     """Interactive menu to select vehicle profile with horizontal arrow keys"""
     profiles = {
         "car": "🚗 Car - Standard road vehicle navigation",
         "bike": "🚲 Bike - Bicycle-friendly routes",
         "foot": "🚶 Foot - Walking routes and pedestrian paths",
-        "flight": "✈️ flight - Flying transportation options"
+        "transit": "🚆 Transit - Public transportation",
+        "flight": "✈️ flight - Flying transportation options",
+        "compare": "⚖️ Compare - Car, bike and foot side by side",
+        "multi-stop": "📍 Multi-stop - Best order for several stops",
+        "reachable": "⏱️ Reachable - Places within a travel time"
     }
+    if recent:
+        profiles["recent"] = "🕘 Recent - Replay a recent trip"
 
     # Use questionary for horizontal selection
-    selection = questionary.select(
+    selection = ask(questionary.select(
         "Select transportation mode:",
         choices=list(profiles),
         style=custom_style,
         qmark="",
         use_arrow_keys=True
-    ).ask()
+    ))
 
     # Handle None result
     if selection is None:
         return "car"  # Default to car if selection is cancelled
     return selection
 
-def print_steps(data, orig, dest, vehicle, orig_lat, orig_lng, dest_lat, dest_lng):
+def print_steps(route, orig, dest, vehicle, orig_lat, orig_lng, dest_lat, dest_lng, summary=None):
     """
     Prints the route steps with improved formatting using panels and tables.
     Also creates and displays a Google Maps link.
+
+    A `summary` from a replayed trip is shown as is instead of asking the AI again.
+    Returns the AI summary that was shown, or None if a local one was used.
     """
     global exit_requested
     if exit_requested:
-        return
+        return None
 
-    distance_m = data["paths"][0]["distance"]
-    duration_ms = data["paths"][0]["time"]
+    distance_m = route.distance
+    duration_ms = route.time
 
     miles = distance_m / 1000 / 1.61
     km = distance_m / 1000
@@ -112,24 +184,34 @@ def print_steps(data, orig, dest, vehicle, orig_lat, orig_lng, dest_lat, dest_ln
                         border_style="panel.border",
                         box=box.ROUNDED))
 
-    # Generate AI summary with progress animation
-    try:
-        with console.status("[deco]AI is analyzing your route...[/deco]", spinner="dots"):
-            summary = gpt.generate_route_summary(data, orig, dest, vehicle)
-            if exit_requested:
-                return
+    # Generate AI summary with progress animation, or a local one when the trip budget runs low
+    if summary is None and allows(AI_STAGE_MIN_S):
+        try:
+            with console.status("[deco]AI is analyzing your route...[/deco]", spinner="dots"):
+                summary = gpt.generate_route_summary(route, orig, dest, vehicle)
+                if exit_requested:
+                    return None
+        except Exception as e:
+            console.print(Panel(f"⚠️ Couldn't generate route summary: {str(e)}",
+                               border_style="error",
+                               box=box.ROUNDED))
 
+    if is_error(summary):
+        summary = None
+        console.print(Panel(local_route_summary(route, orig, dest, vehicle),
+                           title="📝 Route Summary",
+                           border_style="panel.border",
+                           box=box.ROUNDED))
+    else:
         console.print(Panel(f"{summary}",
                            title="🤖 AI Route Summary",
                            border_style="panel.border",
                            box=box.ROUNDED))
-    except Exception as e:
-        console.print(Panel(f"⚠️ Couldn't generate route summary: {str(e)}",
-                           border_style="error",
-                           box=box.ROUNDED))
 
-    # Create Google Maps link
-    maps_url = create_google_maps_link(orig_lat, orig_lng, dest_lat, dest_lng, vehicle)
+    # Create Google Maps link, pinned to the route shape with a few waypoints
+    lats, lngs = route.coordinates()
+    waypoints = pick_waypoints(lats, lngs) if len(lats) > 2 else None
+    maps_url = create_google_maps_link(orig_lat, orig_lng, dest_lat, dest_lng, vehicle, waypoints)
     console.print(Panel(f"🔗 View in Google Maps: [link={maps_url}]{maps_url}[/link]",
                        title="📍 External Map",
                        border_style="deco",
@@ -139,61 +221,251 @@ def print_steps(data, orig, dest, vehicle, orig_lat, orig_lng, dest_lat, dest_ln
     if safe_confirm("Would you like to open this route in Google Maps?"):
         open_url_in_browser(maps_url)
 
+    # Offer to export the route geometry
+    if len(lats) and safe_confirm("Would you like to export this route (GPX/GeoJSON)?"):
+        export_format = ask(questionary.select(
+            "Select export format:",
+            choices=["gpx", "geojson"],
+            style=custom_style,
+            qmark="",
+            use_arrow_keys=True
+        ))
+
+        if export_format:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            export_path = os.path.join("exports", f"route_{timestamp}.{export_format}")
+            count = export_route(export_path, lats, lngs, simplify(lats, lngs, tolerance=5.0), f"{orig} to {dest}")
+            console.print(Panel(f"💾 Saved {count} of {len(lats)} points to {export_path}",
+                               border_style="deco",
+                               box=box.ROUNDED))
+
     # Show directions with step panels
     console.print(Panel(f"🧭 Directions from [highlight]{orig}[/highlight] to [highlight]{dest}[/highlight] ({vehicle})",
                        border_style="title",
                        box=box.ROUNDED))
 
-    steps_table = Table(box=box.SIMPLE, show_header=False, padding=(0, 1))
-    steps_table.add_column("Icon", justify="center", style="highlight")
-    steps_table.add_column("Direction", style="answer")
-
-    for step in data["paths"][0]["instructions"]:
-        if exit_requested:
-            return
-
-        path_text = step["text"]
-
-        # Choose the appropriate direction arrow based on the text
-        path_text_lower = path_text.lower()
-        if "left" in path_text_lower:
-            direction_arrow = "⬅️"
-        elif "right" in path_text_lower:
-            direction_arrow = "➡️"
-        elif "straight" in path_text_lower or "continue" in path_text_lower:
-            direction_arrow = "⬆️"
-        elif "u-turn" in path_text_lower or "turnaround" in path_text_lower:
-            direction_arrow = "🔄"
-        elif "arrive" in path_text_lower or "destination" in path_text_lower:
-            direction_arrow = "🏁"
-        elif "depart" in path_text_lower or "start" in path_text_lower:
-            direction_arrow = "🚩"
-        elif "roundabout" in path_text_lower or "rotary" in path_text_lower:
-            direction_arrow = "🔄"
-        elif "slight left" in path_text_lower:
-            direction_arrow = "↖️"
-        elif "slight right" in path_text_lower:
-            direction_arrow = "↗️"
-        elif "sharp left" in path_text_lower:
-            direction_arrow = "↩️"
-        elif "sharp right" in path_text_lower:
-            direction_arrow = "↪️"
-        else:
-            direction_arrow = "➡️"  # default
-
-        if "distance" in step:
-            step_distance = step["distance"]
-            # Format distance in a more readable way
-            if step_distance < 100:
-                distance_str = f"{step_distance:.0f} m"
-            else:
-                distance_str = f"{step_distance / 1000:.1f} km / {step_distance / 1000 / 1.61:.1f} miles"
+    # Stream directions page by page, icons chosen from the instruction sign codes
+    render_steps(console, route, confirm=safe_confirm, should_stop=lambda: exit_requested or check_exit())
+    return summary
+
+def pick_recent_trip():
+    """Let the user pick one of the recent trips from the history, or None"""
+    trips = history.recent()
+    if not trips:
+        return None
+    labels = [trip.label for trip in trips]
+    picked = ask(questionary.select(
+        "Which trip would you like to replay?",
+        choices=labels + ["cancel"],
+        style=custom_style,
+        qmark="",
+        use_arrow_keys=True
+    ))
+    if picked is None or picked == "cancel":
+        return None
+    return trips[labels.index(picked)]
+
+def plan_multi_stop():
+    """
+    Ask for the stops of a multi-stop trip and plan the best visiting order.
+    Returns (profile, Tour), or None if the user cancelled or planning failed.
+    """
+    profile = ask(questionary.select(
+        "Which mode for the stops?",
+        choices=["car", "bike", "foot"],
+        style=custom_style,
+        qmark="",
+        use_arrow_keys=True
+    ))
+    if profile is None or check_exit():
+        return None
+
+    queries = []
+    while len(queries) < MAX_STOPS:
+        prompt = "\n🚩 Type in starting location:" if not queries else \
+            f"\n📍 Stop {len(queries)} (leave empty when done):"
+        stop = safe_input(prompt)
+        if stop is None or check_quit(stop) or check_exit():
+            return None
+        if not stop.strip():
+            if len(queries) >= 2:
+                break
+            continue
+        queries.append(stop.strip())
+
+    round_trip = safe_confirm("Return to the starting location at the end?")
+    if check_exit():
+        return None
+
+    with console.status(f"[deco]Planning the best order for {len(queries)} stops...[/deco]", spinner="dots"):
+        status, tour = plan_tour(geo, router, queries, profile, round_trip)
+    if status != 200:
+        console.print(Panel(f'❌ Error: {tour.get("message", "Unknown error")}',
+                            border_style="error",
+                            box=box.ROUNDED))
+        return None
+
+    print_tour(tour)
+    return profile, tour
+
+def print_tour(tour):
+    """Print the planned stop order with leg and arrival times"""
+    table = Table(title="📍 Stop Order", box=box.ROUNDED, title_style="title")
+    table.add_column("#", justify="right", style="highlight")
+    table.add_column("Stop", style="highlight")
+    table.add_column("Leg", justify="right", style="answer")
+    table.add_column("Leg time", justify="right", style="answer")
+    table.add_column("Arrival", justify="right", style="answer")
+
+    elapsed = 0
+    table.add_row("1", tour.stops[0][0], "—", "—", "0:00:00")
+    for n, ((name, _, _), (meters, ms)) in enumerate(zip(tour.stops[1:], tour.legs), 2):
+        elapsed += ms or 0
+        table.add_row(str(n), name, f"{(meters or 0) / 1000:.1f} km",
+                      str(datetime.timedelta(seconds=(ms or 0) // 1000)),
+                      str(datetime.timedelta(seconds=elapsed // 1000)))
+    console.print(table)
+
+    note = "estimated locally, the matrix service was unavailable" if tour.estimated else "from one matrix request"
+    console.print(Panel(f"⏱️ Saves {datetime.timedelta(seconds=tour.saved_ms // 1000)} compared to the entered order "
+                        f"({note}).\n🔗 Planned with {tour.requests} requests.",
+                        border_style="deco",
+                        box=box.ROUNDED))
 
-            steps_table.add_row(direction_arrow, f"{path_text} ({distance_str})")
-        else:
-            steps_table.add_row(direction_arrow, path_text)
+def explore_reachable():
+    """
+    Show the places reachable from a location within a travel time, with one
+    isochrone request, and let the user route to one of them.
+    Returns (profile, origin, destination) with (query, name, lat, lng) tuples,
+    or None if the user cancelled or didn't pick a place.
+    """
+    profile = ask(questionary.select(
+        "Which mode?",
+        choices=["car", "bike", "foot"],
+        style=custom_style,
+        qmark="",
+        use_arrow_keys=True
+    ))
+    if profile is None or check_exit():
+        return None
+
+    query = safe_input("\n🚩 Type in starting location:")
+    if query is None or check_quit(query) or check_exit():
+        return None
+    with console.status("Finding location... \n", spinner="dots"):
+        status, lat, lng, name = geo.geocoding(query)
+    if status != 200:
+        console.print(Panel("❌ Could not find starting location",
+                            border_style="error",
+                            box=box.ROUNDED))
+        return None
+
+    minutes = ask(questionary.select(
+        "Within how many minutes?",
+        choices=["10", "15", "20", "30", "45", "60"],
+        style=custom_style,
+        qmark="",
+        use_arrow_keys=True
+    ))
+    if minutes is None or check_exit():
+        return None
+
+    with console.status(f"[deco]Finding what you can reach within {minutes} minutes...[/deco]", spinner="dots"):
+        area = reachable_area(router, lat, lng, profile, int(minutes))
+
+    # Candidates: every place to stay in the index and the destinations of recent trips
+    places = [(lodging.names[i], lodging.lats[i], lodging.lngs[i]) for i in range(len(lodging))]
+    places.extend({trip.destination: (trip.destination, trip.dest_lat, trip.dest_lng)
+                   for trip in history.recent(limit=20)}.values())
+    reachable = area.reachable(places)
+
+    table = Table(title=f"⏱️ Reachable by {profile} within {area.minutes} minutes", box=box.ROUNDED,
+                  title_style="title")
+    table.add_column("#", justify="right", style="highlight")
+    table.add_column("Place", style="highlight")
+    table.add_column("Distance", justify="right", style="answer")
+    for n, (km, place, _, _) in enumerate(reachable[:MAX_REACHABLE_ROWS], 1):
+        table.add_row(str(n), place, f"{km:.1f} km")
+    if reachable:
+        console.print(table)
+    note = "estimated locally, the isochrone service was unavailable" if area.estimated else "from one isochrone request"
+    console.print(Panel(f"📍 {len(reachable)} of {len(places)} places are reachable from {name} ({note}).",
+                        border_style="deco",
+                        box=box.ROUNDED))
+    if not reachable:
+        return None
 
-    console.print(steps_table)
+    labels = [place for _, place, _, _ in reachable[:MAX_REACHABLE_ROWS]]
+    picked = ask(questionary.select(
+        "Route to one of them?",
+        choices=labels + ["cancel"],
+        style=custom_style,
+        qmark="",
+        use_arrow_keys=True
+    ))
+    if picked is None or picked == "cancel" or check_exit():
+        return None
+    _, place, dest_lat, dest_lng = reachable[labels.index(picked)]
+    return profile, (query, name, lat, lng), (place, place, dest_lat, dest_lng)
+
+def get_transit_planner():
+    """Load the GTFS feed from GTFS_PATH once and return a planner, or None if no feed is configured"""
+    global transit_planner
+    if transit_planner is None and gtfs_path:
+        with console.status("[deco]Loading public transit timetable...[/deco]", spinner="dots"):
+            transit_planner = TransitPlanner(GTFSFeed(gtfs_path, datetime.date.today()))
+    return transit_planner
+
+def print_comparison(options):
+    """Print one table comparing distance, duration and weather exposure of route options"""
+    table = Table(title="⚖️ Route Comparison", box=box.ROUNDED, title_style="title")
+    table.add_column("Mode", style="highlight")
+    table.add_column("Distance", justify="right", style="answer")
+    table.add_column("Duration", justify="right", style="answer")
+    table.add_column("Weather exposure", justify="right", style="answer")
+
+    for option in options:
+        duration = str(datetime.timedelta(seconds=option.route.time // 1000))
+        exposure = f"🌧️ {option.exposure_min:.0f} min" if option.exposure_min else "—"
+        table.add_row(option.label, f"{option.distance_km:.1f} km", duration, exposure)
+
+    console.print(table)
+
+def print_accommodations(title, places):
+    """Print a table of places to stay from the local accommodation index"""
+    table = Table(title=title, box=box.ROUNDED, title_style="title")
+    table.add_column("Name", style="highlight")
+    table.add_column("Type", style="answer")
+    table.add_column("Stars", justify="right", style="answer")
+    table.add_column("Distance", justify="right", style="answer")
+    table.add_column("Map", style="answer")
+
+    for km, index in places:
+        name, kind, stars, lat, lng = lodging.describe(index)
+        table.add_row(name, kind.replace("_", " "), "★" * stars if stars else "—", f"{km:.1f} km",
+                      f"https://www.google.com/maps/search/?api=1&query={lat},{lng}")
+
+    console.print(table)
+
+def print_profile():
+    """Print the per-stage timing breakdown of the last trip and write a Chrome trace file"""
+    table = Table(title="⏱️ Trip Profile", box=box.ROUNDED, title_style="title")
+    table.add_column("Stage", style="highlight")
+    table.add_column("Calls", justify="right", style="answer")
+    table.add_column("Total", justify="right", style="answer")
+    table.add_column("Max", justify="right", style="answer")
+    table.add_column("Payload", justify="right", style="answer")
+
+    for name, count, total_ms, max_ms, size in tracer.breakdown():
+        table.add_row(name, str(count), f"{total_ms:.0f} ms", f"{max_ms:.0f} ms",
+                      f"{size / 1024:.1f} KiB" if size else "—")
+    console.print(table)
+
+    trace_path = os.path.join("profiles", f"trace_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    count = tracer.write_chrome_trace(trace_path)
+    console.print(Panel(f"💾 Wrote {count} spans to {trace_path} (open in chrome://tracing or ui.perfetto.dev)",
+                        border_style="deco",
+                        box=box.ROUNDED))
 
 def display_header():
     """Display app header with styled title"""
@@ -205,51 +477,130 @@ def should_offer_accommodation(distance_km):
     """Determine if accommodation should be offered based on distance"""
     return distance_km > 100  # Offer accommodation for trips over 100km
 
-def main():
+def start_token_log(path):
+    """Append one line per Gemini call (stage, model, estimated and reported tokens) to `path`"""
+    if not path:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logger = logging.getLogger("travelguide.genai")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+def start_metrics(port=None, path=None):
+    """Feed finished spans into the metrics registry and expose it over HTTP when a port is given"""
+    tracer.add_listener(record_span)
+    if port:
+        registry.serve(port)
+        console.print(Panel(f"📈 Metrics available at http://127.0.0.1:{port}/metrics",
+                            border_style="deco",
+                            box=box.ROUNDED))
+    if path:
+        console.print(Panel(f"📈 Metrics will be written to {path} after each trip",
+                            border_style="deco",
+                            box=box.ROUNDED))
+
+def main(profile=False, metrics_port=None, metrics_file=None, budget=None):
     """Main application flow with improved UI and exit handling"""
+    global trip_budget
+    trip_budget = budget or trip_budget
     try:
         display_header()
+        tracer.recording = profile
+        start_metrics(metrics_port, metrics_file)
+        start_token_log(genai_token_log)
+
+        # Set when the user switches to a mode that has to be planned from the start
+        next_vehicle = next_places = None
 
         while not check_exit():
             reset_exit()  # Reset exit flag for new route
+            tracer.reset()
+            # Work for this trip (not time spent in prompts) has to fit into the budget
+            activate(Deadline(trip_budget))
 
             # All checks for exit_requested should now use check_exit()
-            vehicle = select_vehicle_profile()
-            if check_quit(vehicle) or check_exit():
-                break
-
-            loc1 = safe_input("\n🚩 Type in starting location:")
-            if loc1 is None or check_quit(loc1) or check_exit():
-                break
+            places, next_places = next_places, None
+            if next_vehicle:
+                vehicle, next_vehicle = next_vehicle, None
+            else:
+                vehicle = select_vehicle_profile(recent=len(history) > 0)
+                if check_quit(vehicle) or check_exit():
+                    break
 
-            # Add exit checks after each operation
-            with console.status("Finding location... \n", spinner="dots"):
-                orig_status, orig_lat, orig_lng, orig_loc = geo.geocoding(loc1)
-                if check_exit():
+            replay = None
+            tour = None
+            if vehicle == "recent":
+                # Coordinates, route and AI texts come from the history, only the weather is refreshed
+                replay = pick_recent_trip()
+                if replay is None or check_exit():
+                    continue
+                vehicle = replay.profile
+                loc1, loc2 = replay.origin_query, replay.destination_query
+                orig_status = dest_status = 200
+                orig_lat, orig_lng, orig_loc = replay.orig_lat, replay.orig_lng, replay.origin
+                dest_lat, dest_lng, dest_loc = replay.dest_lat, replay.dest_lng, replay.destination
+            elif vehicle == "multi-stop":
+                # Stops are geocoded, ordered and routed together; the joined route is shown like any other
+                planned = plan_multi_stop()
+                if planned is None or check_exit():
+                    continue
+                vehicle, tour = planned
+                loc1, loc2 = tour.queries[0], tour.queries[-1]
+                orig_status = dest_status = 200
+                orig_loc, orig_lat, orig_lng = tour.stops[0]
+                dest_loc, dest_lat, dest_lng = tour.stops[-1]
+            elif vehicle == "reachable":
+                # One isochrone answers which places are in reach; the picked one is routed like any trip
+                picked = explore_reachable()
+                if picked is None or check_exit():
+                    continue
+                vehicle, (loc1, orig_loc, orig_lat, orig_lng), (loc2, dest_loc, dest_lat, dest_lng) = picked
+                orig_status = dest_status = 200
+            else:
+                loc1 = places[0] if places else safe_input("\n🚩 Type in starting location:")
+                if loc1 is None or check_quit(loc1) or check_exit():
                     break
 
-            if orig_status != 200:
-                console.print(Panel("❌ Could not find starting location",
-                                   border_style="error",
-                                   box=box.ROUNDED))
-                continue
+                # Add exit checks after each operation
+                with console.status("Finding location... \n", spinner="dots"):
+                    stages.set(origin_query=loc1)
+                    orig_status, orig_lat, orig_lng, orig_loc = stages.get("origin")
+                    if check_exit():
+                        break
 
-            # Get destination
-            loc2 = safe_input("\n🏁 Type in starting location:")
-            if loc2 is None or check_quit(loc2) or check_exit():
-                break
+                if orig_status != 200:
+                    console.print(Panel("❌ Could not find starting location",
+                                       border_style="error",
+                                       box=box.ROUNDED))
+                    continue
 
-            # Show loading animation during geocoding
-            with console.status("Finding location... \n", spinner="dots"):
-                dest_status, dest_lat, dest_lng, dest_loc = geo.geocoding(loc2)
-                if check_exit():
+                # Get destination
+                loc2 = places[1] if places else safe_input("\n🏁 Type in starting location:")
+                if loc2 is None or check_quit(loc2) or check_exit():
                     break
 
-            if dest_status != 200:
-                console.print(Panel("❌ Could not find destination",
-                                   border_style="error",
-                                   box=box.ROUNDED))
-                continue
+                # Show loading animation during geocoding
+                with console.status("Finding location... \n", spinner="dots"):
+                    stages.set(destination_query=loc2)
+                    dest_status, dest_lat, dest_lng, dest_loc = stages.get("destination")
+                    if check_exit():
+                        break
+
+                if dest_status != 200:
+                    console.print(Panel("❌ Could not find destination",
+                                       border_style="error",
+                                       box=box.ROUNDED))
+                    continue
+
+            # Replays, tours and reachable places bring their own coordinates; record them as the trip's
+            stages.set(origin_query=loc1, destination_query=loc2, vehicle=vehicle,
+                       origin=(orig_status, orig_lat, orig_lng, orig_loc),
+                       destination=(dest_status, dest_lat, dest_lng, dest_loc))
 
             console.print(Panel(f"🚩 From: [highlight]{orig_loc}[/highlight]\n🏁 To: [highlight]{dest_loc}[/highlight]",
                                title="Your Route",
@@ -258,54 +609,91 @@ def main():
 
             paths_status = 404
             paths_data = None
+            options = None
 
-            if vehicle == "flight":
-                try:
-                    # Provide a list of common start times for selection
-                    start_time_options = ["6am", "9am", "12pm", "3pm", "6pm", "9pm"]
-                    start_time = questionary.select(
-                        "🕒 Please select a start time:",
-                        choices=start_time_options,
-                        style=custom_style,
-                        qmark="",
-                        use_arrow_keys=True
-                    ).ask()
+            if replay is not None:
+                paths_status, paths_data = 200, replay.route
 
-                    if start_time is None or check_quit(start_time) or check_exit():
+            elif tour is not None:
+                paths_status, paths_data = 200, tour.route
+
+            elif vehicle == "flight":
+                # Estimated locally from the airport index, the AI summary in print_steps adds the narrative
+                with console.status("[deco]Estimating your flight...[/deco]", spinner="dots"), span("flight.estimate"):
+                    paths_status, paths_data = flights.estimate(orig_lat, orig_lng, dest_lat, dest_lng)
+                    if check_exit():
                         break
 
+            elif vehicle == "transit":
+                start_time_options = ["06:00", "09:00", "12:00", "15:00", "18:00", "21:00"]
+                start_time = ask(questionary.select(
+                    "🕒 Please select a start time:",
+                    choices=start_time_options,
+                    style=custom_style,
+                    qmark="",
+                    use_arrow_keys=True
+                ))
+
+                if start_time is None or check_quit(start_time) or check_exit():
+                    break
+
+                try:
+                    planner = get_transit_planner()
                     with console.status("[deco]Planning your public transit route...[/deco]", spinner="dots"):
-                        paths_data, paths_status = gpt.route_public_transportation(orig_loc, dest_loc, start_time)
+                        if planner:
+                            paths_status, paths_data = planner.plan(orig_lat, orig_lng, dest_lat, dest_lng,
+                                                                    datetime.time.fromisoformat(start_time))
+                        else:
+                            # No local timetable configured, ask the AI instead
+                            paths_data, paths_status = gpt.route_public_transportation(orig_loc, dest_loc, start_time)
                         if check_exit():
                             break
-
-                    # Create Google Maps link for public transit
-                    maps_url = create_google_maps_link(orig_lat, orig_lng, dest_lat, dest_lng, "flight")
-                    console.print(Panel(f"🔗 View in Google Maps: [link={maps_url}]{maps_url}[/link]",
-                                       title="📍 Public Transit Route",
-                                       border_style="deco",
-                                       box=box.ROUNDED))
-
-                    # Ask if user wants to open the map
-                    if safe_confirm("Would you like to open this route in Google Maps?"):
-                        open_url_in_browser(maps_url)
-
                 except Exception as e:
                     console.print(Panel(f"⚠️ Couldn't generate route: {str(e)}",
                                        border_style="error",
                                        box=box.ROUNDED))
 
-            elif orig_status == 200 and dest_status == 200:
-                op = "&point=" + str(orig_lat) + "%2C" + str(orig_lng)
-                dp = "&point=" + str(dest_lat) + "%2C" + str(dest_lng)
-                paths_url = route_url + urllib.parse.urlencode(
-                    {"key": graphhopper_api_key, "vehicle": vehicle}
-                ) + op + dp
+            elif vehicle == "compare":
+                preferred = ask(questionary.select(
+                    "Show alternative routes for which mode?",
+                    choices=list(COMPARE_PROFILES),
+                    style=custom_style,
+                    qmark="",
+                    use_arrow_keys=True
+                ))
+                if preferred is None or check_exit():
+                    break
+
+                with console.status("[deco]Comparing car, bike and foot routes...[/deco]", spinner="dots"):
+                    compared = compare_routes(router, OpenMeteo(), orig_lat, orig_lng, dest_lat, dest_lng, preferred)
+                    if check_exit():
+                        break
 
+                if compared:
+                    print_comparison(compared)
+                    labels = [option.label for option in compared]
+                    picked = ask(questionary.select(
+                        "Which route would you like to take?",
+                        choices=labels,
+                        style=custom_style,
+                        qmark="",
+                        use_arrow_keys=True
+                    ))
+                    if picked is None or check_exit():
+                        break
+
+                    chosen = compared[labels.index(picked)]
+                    vehicle = chosen.profile
+                    paths_data = chosen.route
+                    paths_status = 200
+                    options = best_by_profile(compared)
+                    options[vehicle] = chosen
+                else:
+                    paths_data = {"message": "No route could be found for any transport mode"}
+
+            elif orig_status == 200 and dest_status == 200:
                 with console.status("[deco]Calculating your route...[/deco]", spinner="dots"):
-                    response = requests.get(paths_url)
-                    paths_status = response.status_code
-                    paths_data = response.json()
+                    paths_status, paths_data = stages.get("route")
                     if check_exit():
                         break
 
@@ -315,13 +703,16 @@ def main():
                 #                    border_style="panel.border",
                 #                    box=box.ROUNDED))
 
+            if paths_status == 200:
+                stages.set(route=(paths_status, paths_data))
+
             # Process and display route if data is available
             if paths_status == 200 and paths_data is not None and not check_exit():
-                travel_time = paths_data["paths"][0]["time"]
-                travel_time_in_hour = float(travel_time) / 1000 / 60 / 60
-                distance_km = paths_data["paths"][0]["distance"] / 1000
+                travel_time = paths_data.time
+                travel_time_in_hour = paths_data.hours
+                distance_km = paths_data.distance_km
 
-                suggestion = suggest_transport(vehicle, distance_km)
+                suggestion = suggest_transport(vehicle, distance_km, options)
                 if suggestion:
                     console.print(Panel(suggestion,
                                     title="🚦 Transport Suggestion",
@@ -330,12 +721,43 @@ def main():
 
                     # Ask if user wants to change transport mode
                     if safe_confirm("Would you like to change your transport mode?"):
-                        vehicle = select_vehicle_profile()
-                        if check_quit(vehicle) or check_exit():
+                        picked = select_vehicle_profile()
+                        if check_quit(picked) or check_exit():
                             break
 
+                        # The trip only takes the new mode once there is a route for it
+                        if options and picked in options:
+                            # Compared routes are already available, no need to re-plan
+                            vehicle, paths_data = picked, options[picked].route
+                            stages.set(vehicle=vehicle, route=(200, paths_data))
+                        elif tour is None and picked in ROUTED_PROFILES:
+                            # Same places, so only the route (and what depends on it) is redone
+                            with console.status("[deco]Calculating your route...[/deco]", spinner="dots"):
+                                stages.set(vehicle=picked)
+                                status, data = stages.get("route")
+                                if check_exit():
+                                    break
+                            if status == 200:
+                                vehicle, paths_data = picked, data
+                            else:
+                                console.print(Panel(f'⚠️ Keeping the previous route: {data.get("message", "Unknown error")}',
+                                                   border_style="error",
+                                                   box=box.ROUNDED))
+                                stages.set(vehicle=vehicle, route=(200, paths_data))
+                        elif picked != vehicle:
+                            # Flights, transit, comparisons and tours are planned their own way: start over in that mode
+                            next_vehicle = "multi-stop" if tour is not None and picked in ROUTED_PROFILES else picked
+                            next_places = (loc1, loc2)
+                            continue
+                        travel_time = paths_data.time
+                        travel_time_in_hour = paths_data.hours
+                        distance_km = paths_data.distance_km
+
                 # Ask about calendar integration before showing route details
                 if safe_confirm("Would you like to add this trip to your Google Calendar?"):
+                    # Authenticate in the background while the user picks day and time
+                    warm_up_calendar()
+
                     # Split days into two weeks and format them for display
                     week1 = [
                         f"Week 1: {(datetime.date.today() + datetime.timedelta(days=i)).strftime('%A, %Y-%m-%d')}"
@@ -349,12 +771,12 @@ def main():
                     # Combine weeks with a separator
                     days_options = week1 + ["------------------"] + week2
 
-                    selected_day = questionary.select(
+                    selected_day = ask(questionary.select(
                         "Select the day for the trip:",
                         choices=days_options,
                         style=custom_style,
                         qmark=""
-                    ).ask()
+                    ))
 
                     if selected_day and selected_day != "------------------":
                         # Split time options into AM/PM groups
@@ -367,43 +789,102 @@ def main():
                             "18:00", "19:00", "20:00", "21:00", "22:00"
                         ]
 
-                        start_time = questionary.select(
+                        start_time = ask(questionary.select(
                             "Select start time for the trip:",
                             choices=time_options,
                             style=custom_style,
                             qmark=""
-                        ).ask()
+                        ))
 
                         if start_time and not start_time.startswith(("Morning", "Afternoon", "Evening")):
                             # Remove the "Week X: " prefix from selected_day
                             selected_date = selected_day.split(": ")[1].split(", ")[1]
                             event_datetime = f"{selected_date}T{start_time}:00"
 
-                            success, message = create_calendar_event(
-                                orig_loc, dest_loc, event_datetime,
-                                int(travel_time / 1000), vehicle
-                            )
+                            schedule = ask(questionary.select(
+                                "How would you like to schedule this trip?",
+                                choices=["Single trip", "Round trip", "Every day for a week"],
+                                style=custom_style,
+                                qmark=""
+                            )) or "Single trip"
+
+                            duration_seconds = int(travel_time / 1000)
+                            trips = [dict(origin=orig_loc, destination=dest_loc, start_time=event_datetime,
+                                          duration_seconds=duration_seconds, mode=vehicle)]
+
+                            if schedule == "Round trip":
+                                return_time = ask(questionary.select(
+                                    "Select return time:",
+                                    choices=[option for option in time_options if ":" in option],
+                                    style=custom_style,
+                                    qmark=""
+                                ))
+                                if return_time:
+                                    trips.append(dict(origin=dest_loc, destination=orig_loc,
+                                                      start_time=f"{selected_date}T{return_time}:00",
+                                                      duration_seconds=duration_seconds, mode=vehicle))
+                            elif schedule == "Every day for a week":
+                                first_start = datetime.datetime.fromisoformat(event_datetime)
+                                trips = [dict(trips[0], start_time=(first_start + datetime.timedelta(days=day)).isoformat())
+                                         for day in range(7)]
+
+                            export_target = ask(questionary.select(
+                                "Where should the events go?",
+                                choices=["Google Calendar", "ICS file"],
+                                style=custom_style,
+                                qmark=""
+                            ))
+
+                            if export_target == "ICS file":
+                                ics_path = os.path.join("exports", f"trip_{selected_date}.ics")
+                                results = create_calendar_events(trips, dry_run=True, ics_path=ics_path)
+                            else:
+                                with console.status("[deco]Adding events to your calendar...[/deco]", spinner="dots"):
+                                    results = create_calendar_events(trips)
+
+                            created = sum(1 for success, _ in results if success)
+                            if len(results) == 1:
+                                message = results[0][1]
+                            else:
+                                message = f"✅ {created} of {len(results)} events added"
+                                failures = [message for success, message in results if not success]
+                                if failures:
+                                    message += "\n" + "\n".join(f"❌ {failure}" for failure in failures)
                             console.print(Panel(message,
                                               title="📅 Calendar Integration",
-                                              border_style="panel.border" if success else "error",
+                                              border_style="panel.border" if created == len(results) else "error",
                                               box=box.ROUNDED))
 
-                # Display weather information
-                weather = OpenMeteo()
-                with console.status("[deco]Checking weather conditions...[/deco]", spinner="dots"):
-                    curr_weather = weather.get_weather(orig_lat, orig_lng, hours=1)
-                    forecast = weather.get_weather(dest_lat, dest_lng, hours=math.ceil(travel_time_in_hour))
-                    if check_exit():
-                        break
-                    weather_advisory = gpt.check_weather_conditions(orig_loc, dest_loc, str(travel_time_in_hour), curr_weather, forecast)
-
-                console.print(Panel(weather_advisory,
-                                   title="🌦️ Weather Advisory",
-                                   border_style="panel.border",
-                                   box=box.ROUNDED))
+                # Display weather information, skipping the AI advisory when the trip budget runs low
+                if allows(WEATHER_STAGE_MIN_S):
+                    weather = OpenMeteo()
+                    weather_advisory = None
+                    with console.status("[deco]Checking weather conditions...[/deco]", spinner="dots"):
+                        orig_hourly = stages.get("origin_forecast")
+                        dest_hourly = stages.get("destination_forecast")
+                        forecast_hours = math.ceil(travel_time_in_hour)
+                        curr_weather = weather.get_weather(orig_lat, orig_lng, hours=1, hourly=orig_hourly)
+                        forecast = weather.get_weather(dest_lat, dest_lng, hours=forecast_hours, hourly=dest_hourly)
+                        if check_exit():
+                            break
+                        if allows(AI_STAGE_MIN_S):
+                            # The raw forecasts go into the prompt as compact tables
+                            weather_advisory = stages.get("weather_advisory")
+
+                    if is_error(weather_advisory):
+                        weather_advisory = local_weather_advisory(curr_weather, forecast)
+                    console.print(Panel(weather_advisory,
+                                       title="🌦️ Weather Advisory",
+                                       border_style="panel.border",
+                                       box=box.ROUNDED))
+                else:
+                    console.print(Panel("⏱️ Skipped the weather check to stay within the trip time budget",
+                                       border_style="error",
+                                       box=box.ROUNDED))
 
                 # Print route steps with Google Maps link
-                print_steps(paths_data, orig_loc, dest_loc, vehicle, orig_lat, orig_lng, dest_lat, dest_lng)
+                ai_summary = print_steps(paths_data, orig_loc, dest_loc, vehicle, orig_lat, orig_lng, dest_lat, dest_lng,
+                                         summary=replay.summary if replay and replay.profile == vehicle else None)
                 if exit_requested:
                     break
 
@@ -412,12 +893,30 @@ def main():
                 if exit_requested or voice_option is None:
                     break
 
+                natural_instructions = None
                 if voice_option:
-                    with console.status("[deco]Preparing voice navigation...[/deco]", spinner="dots"):
-                        natural_instructions = gpt.convert_to_natural_instructions(paths_data["paths"][0]["instructions"])
+                    if replay is not None and replay.profile == vehicle:
+                        natural_instructions = replay.natural_instructions
+                    if natural_instructions is None and allows(AI_STAGE_MIN_S):
+                        # Chunks are rewritten in parallel and spoken as soon as each one is ready
+                        natural_instructions = ["Directions"]
+
+                        def rewritten():
+                            for chunk in gpt.stream_natural_instructions(paths_data):
+                                natural_instructions.extend(chunk)
+                                yield from chunk
+
+                        voice_navigation_stream(rewritten(), should_stop=check_exit)
                         if exit_requested:
                             break
-                    voice_navigation(natural_instructions)
+                    elif not natural_instructions or is_error(natural_instructions[0]):
+                        # Read the route's own instructions instead of the AI-polished ones
+                        natural_instructions = None
+                        voice_navigation(local_voice_instructions(paths_data), should_stop=check_exit)
+                    else:
+                        voice_navigation(natural_instructions, should_stop=check_exit)
+
+                ai_accommodations = None
 
                 # Only offer accommodation for longer trips
                 if should_offer_accommodation(distance_km) and safe_confirm(
@@ -432,14 +931,14 @@ def main():
                     #     price_panels.append(panel)
 
                     # console.print(Columns(price_panels, equal=True, expand=True))
-                    price_range = questionary.select(
+                    price_range = ask(questionary.select(
                         "\n💲 Price Range Preference",
                         choices=list(price_options.keys()),
                         style=custom_style,
                         qmark="",
                         use_arrow_keys=True,
                         default="medium"
-                    ).ask()
+                    ))
 
                     if price_range is None:
                         price_range = "medium"  # Default value if None
@@ -447,16 +946,29 @@ def main():
                     if check_quit(price_range) or check_exit():
                         break
 
-                    # Get AI suggestions using existing method
-                    with console.status(f"[deco]Finding places to stay in {dest_loc}...[/deco]", spinner="dots"):
-                        ai_accommodations = gpt.find_accommodations(dest_loc)
-                        if check_exit():
-                            break
-
-                    console.print(Panel(ai_accommodations,
-                                       title=f"🤖 AI Accommodation Suggestions for {dest_loc}",
-                                       border_style="panel.border",
-                                       box=box.ROUNDED))
+                    # Places to stay from the local POI index, around the destination and each overnight stop
+                    nearby = lodging.near(dest_lat, dest_lng, price_range)
+                    if nearby:
+                        print_accommodations(f"🏨 {price_options[price_range]} places to stay near {dest_loc}", nearby)
+                    if vehicle in ROUTED_PROFILES:
+                        for night, (hours, places) in enumerate(lodging.along_route(paths_data, price_range), 1):
+                            if places:
+                                print_accommodations(f"🌙 Night {night} — after {hours:.1f} h on the road", places)
+
+                    # Get AI suggestions using existing method, if the trip budget allows
+                    if replay is not None and replay.accommodations:
+                        ai_accommodations = replay.accommodations
+                    elif allows(AI_STAGE_MIN_S):
+                        with console.status(f"[deco]Finding places to stay in {dest_loc}...[/deco]", spinner="dots"):
+                            ai_accommodations = gpt.find_accommodations(dest_loc)
+                            if check_exit():
+                                break
+
+                    if ai_accommodations:
+                        console.print(Panel(ai_accommodations,
+                                           title=f"🤖 AI Accommodation Suggestions for {dest_loc}",
+                                           border_style="panel.border",
+                                           box=box.ROUNDED))
 
                     # Add real accommodation links
                     real_accommodations = find_real_accommodations(dest_loc, price_range)
@@ -474,13 +986,13 @@ def main():
                         "expedia": f"https://www.expedia.com/Hotel-Search?destination={urllib.parse.quote(dest_loc)}"
                     }
 
-                    open_site = questionary.select(
+                    open_site = ask(questionary.select(
                         "\n🔗 Open accommodation sites",
                         choices=list(sites.keys()) + ["skip"],
                         style=custom_style,
                         qmark="",
                         use_arrow_keys=True
-                    ).ask()
+                    ))
 
                     if open_site != "skip" and open_site in sites:
                         open_url_in_browser(sites[open_site])
@@ -498,11 +1010,22 @@ def main():
                 table.add_row(f"{loc1.title()}", f"{loc2.title()}", f"{formatted_time}", f"{vehicle.title()}")
                 console.print(table)
 
+                # Keep the trip so it can be replayed without calling the upstreams again
+                if tour is None:
+                    history.record(loc1, loc2, orig_loc, dest_loc, vehicle, orig_lat, orig_lng, dest_lat, dest_lng,
+                                   paths_data, summary=ai_summary, instructions=natural_instructions,
+                                   accommodations=None if is_error(ai_accommodations) else ai_accommodations)
+
             elif not check_exit():
                 console.print(Panel(f'❌ Error: {paths_data.get("message", "Unknown error")}',
                                    border_style="error",
                                    box=box.ROUNDED))
 
+            if profile:
+                print_profile()
+            if metrics_file:
+                registry.write(metrics_file)
+
             # Ask to plan another route
             if check_exit():
                 break
@@ -515,13 +1038,29 @@ def main():
                            border_style="title",
                            box=box.DOUBLE))
 
-    except KeyboardInterrupt:
-        os._exit(0)  # Force immediate exit
+    except (KeyboardInterrupt, Cancelled):
+        # Cancelled at a checkpoint (or a second Ctrl+C): leave cleanly instead of killing the process
+        console.print(Panel("👋 Trip cancelled. Thank you for using TravelGuide!",
+                           border_style="title",
+                           box=box.DOUBLE))
     except Exception as e:
         console.print(Panel(f"❌ An unexpected error occurred: {str(e)}",
                            border_style="error",
                            box=box.ROUNDED))
-        os._exit(1)  # Force immediate exit with error code
+        sys.exit(1)
+    finally:
+        store_snapshot()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="TravelGuide - Your Smart Journey Planner")
+    parser.add_argument("--profile", action="store_true",
+                        help="print a per-stage timing breakdown after each trip and write a Chrome trace file")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-file",
+                        help="write Prometheus metrics to this file after each trip")
+    parser.add_argument("--budget", type=float,
+                        help="seconds of work each trip may take before optional AI stages fall back to local output "
+                             "(default: TRIP_BUDGET_S or 60)")
+    args = parser.parse_args()
+    main(profile=args.profile, metrics_port=args.metrics_port, metrics_file=args.metrics_file, budget=args.budget)
@@ -1,6 +1,8 @@
 from .genai import Genai
-from .voice import voice_navigation
+from .voice import voice_navigation, voice_navigation_stream
 from .geocoding import Geocoding
+from .route import Route, Instruction
+from .routing import Routing
 from .meteo import OpenMeteo
 from .common import safe_confirm, safe_input, check_quit, open_url_in_browser
-from .calendar import create_calendar_event
+from .calendar import create_calendar_event, create_calendar_events, warm_up_calendar
@@ -0,0 +1,166 @@
+import csv
+import json
+import math
+import pathlib
+from array import array
+
+from .spatial import KDTree
+from .trace import span
+
+ACCOMMODATIONS_PATH = pathlib.Path(__file__).resolve().parents[2] / "public" / "data" / "accommodations.csv"
+
+# OSM tourism=* values that count as a place to stay
+KINDS = frozenset(("hotel", "hostel", "guest_house", "motel", "apartment"))
+PRICE_TIERS = ("low", "medium", "high")
+
+SEARCH_RADIUS_KM = 10
+MAX_RESULTS = 5
+
+# Overnight stops on long trips
+TRAVEL_DAY_H = 8           # hours on the road before stopping for the night
+STOP_RADIUS_KM = 30
+
+
+def price_tier(kind, stars):
+    """
+    Map an accommodation to the app's low/medium/high price ranges.
+
+    Hostels, guest houses, motels and hotels with up to two stars are "low",
+    four and five star hotels "high", everything else "medium".
+    """
+    if kind in ("hostel", "guest_house", "motel") or (stars and stars <= 2):
+        return "low"
+    if stars and stars >= 4:
+        return "high"
+    return "medium"
+
+
+def _stars(value):
+    try:
+        return int(float(str(value).rstrip("S*")))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as fp:
+        for row in csv.DictReader(fp):
+            yield row["name"], row["kind"], _stars(row.get("stars")), float(row["lat"]), float(row["lng"])
+
+
+def _read_geojson(path):
+    """Points (or polygon centres) of an OSM export, e.g. from overpass-turbo, with tourism/name/stars tags"""
+    with open(path, encoding="utf-8") as fp:
+        data = json.load(fp)
+    for feature in data.get("features", ()):
+        tags = feature.get("properties") or {}
+        geometry = feature.get("geometry") or {}
+        if not tags.get("name"):
+            continue
+        if geometry.get("type") == "Point":
+            lng, lat = geometry["coordinates"][:2]
+        elif geometry.get("type") == "Polygon" and geometry["coordinates"]:
+            ring = geometry["coordinates"][0]
+            lng = sum(point[0] for point in ring) / len(ring)
+            lat = sum(point[1] for point in ring) / len(ring)
+        else:
+            continue
+        yield tags["name"], tags.get("tourism", "hotel"), _stars(tags.get("stars")), lat, lng
+
+
+class AccommodationIndex:
+    """
+    Finds places to stay around a coordinate from a local POI dataset.
+
+    Places are split by price tier and each tier gets its own `KDTree`, so a
+    radius or k-nearest query for one price range only visits matching
+    places. The bundled CSV is a small sample; a full OSM extract (GeoJSON
+    with tourism=hotel/hostel/guest_house features) can be loaded instead.
+
+    Parameters:
+        path (str): CSV (name, kind, stars, city, country, lat, lng) or GeoJSON file.
+    """
+    def __init__(self, path=ACCOMMODATIONS_PATH):
+        self.names = []
+        self.kinds = []
+        self.stars = array("b")
+        self.tiers = []
+        self.lats = array("d")
+        self.lngs = array("d")
+
+        rows = _read_geojson(path) if str(path).endswith((".json", ".geojson")) else _read_csv(path)
+        with span("accommodation.load"):
+            for name, kind, stars, lat, lng in rows:
+                if kind not in KINDS:
+                    continue
+                self.names.append(name)
+                self.kinds.append(kind)
+                self.stars.append(min(stars, 7))
+                self.tiers.append(price_tier(kind, stars))
+                self.lats.append(lat)
+                self.lngs.append(lng)
+
+            # One tree per price tier; members map tree positions back to place indices
+            self.members = {tier: [i for i, t in enumerate(self.tiers) if t == tier] for tier in PRICE_TIERS}
+            self.trees = {
+                tier: KDTree([self.lats[i] for i in members], [self.lngs[i] for i in members])
+                for tier, members in self.members.items()
+            }
+            self.tree = KDTree(self.lats, self.lngs)
+
+    def __len__(self):
+        return len(self.names)
+
+    def near(self, lat, lng, price_range=None, k=MAX_RESULTS, radius_km=SEARCH_RADIUS_KM):
+        """
+        Returns the closest places to stay around a coordinate.
+
+        Parameters:
+            lat, lng: Query coordinate.
+            price_range (str): "low", "medium" or "high"; None for any price.
+            k (int): Maximum number of places.
+            radius_km (float): Search radius.
+
+        Returns:
+            list: (distance_km, place index) tuples, closest first.
+        """
+        if price_range not in self.trees:
+            return self.tree.nearest(lat, lng, k, radius_km)
+        members = self.members[price_range]
+        return [(km, members[i]) for km, i in self.trees[price_range].nearest(lat, lng, k, radius_km)]
+
+    def within(self, lat, lng, radius_km, price_range=None):
+        """All places within `radius_km`, closest first, as (distance_km, place index) tuples"""
+        if price_range not in self.trees:
+            return self.tree.within(lat, lng, radius_km)
+        members = self.members[price_range]
+        return [(km, members[i]) for km, i in self.trees[price_range].within(lat, lng, radius_km)]
+
+    def overnight_stops(self, route, day_hours=TRAVEL_DAY_H):
+        """
+        Points along a route where each travel day ends.
+
+        Returns:
+            list: (hours into the trip, lat, lng) tuples, one per night.
+        """
+        day_ms = day_hours * 3600000
+        timeline = route.timeline()
+        nights = [day_ms * day for day in range(1, math.ceil(timeline.total_ms / day_ms))]
+        if not nights:
+            return []
+        lats, lngs = timeline.positions_at(nights)
+        return [(ms / 3600000, lat, lng) for ms, lat, lng in zip(nights, lats, lngs)]
+
+    def along_route(self, route, price_range=None, k=3, radius_km=STOP_RADIUS_KM, day_hours=TRAVEL_DAY_H):
+        """
+        Places to stay around each overnight stop of a long route.
+
+        Returns:
+            list: (hours into the trip, [(distance_km, place index), ...]) tuples.
+        """
+        return [(hours, self.near(lat, lng, price_range, k, radius_km))
+                for hours, lat, lng in self.overnight_stops(route, day_hours)]
+
+    def describe(self, index):
+        """Display fields of a place: (name, kind, stars, lat, lng)"""
+        return self.names[index], self.kinds[index], self.stars[index], self.lats[index], self.lngs[index]
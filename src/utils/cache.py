@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    Expired entries are kept until they are evicted, so callers can still
+    serve a stale value when the upstream that produced it is unavailable.
+    Entries saved by an earlier run can be attached with `preload`; they are
+    only decoded on first use.
+
+    Parameters:
+        ttl (float): Seconds an entry counts as fresh.
+        maxsize (int): Maximum number of entries; the least recently used one is evicted first.
+    """
+    def __init__(self, ttl, maxsize=256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = None
+
+    def get(self, key, default=None, stale=False, max_age=None):
+        """
+        Return the cached value for `key`.
+
+        Parameters:
+            key: Cache key.
+            default: Returned when there is no (fresh) entry.
+            stale (bool): Also return entries older than `ttl`.
+            max_age (float): Count entries as fresh for this many seconds instead of `ttl`.
+        """
+        with self._lock:
+            self._load_pending()
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            stored_at, value = entry
+            if not stale and time.time() - stored_at > (self.ttl if max_age is None else max_age):
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, stored_at=None):
+        """Store a value; `stored_at` (epoch seconds) keeps the age of values restored from elsewhere"""
+        with self._lock:
+            self._load_pending()
+            self._store(key, value, time.time() if stored_at is None else stored_at)
+
+    def _store(self, key, value, stored_at):
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def preload(self, loader):
+        """
+        Attach entries from elsewhere (e.g. a snapshot) without decoding them yet.
+
+        `loader()` is called on the first access and returns (key, stored_at, value)
+        tuples, least recently used first. Entries already in the cache win.
+        """
+        with self._lock:
+            self._pending = loader
+
+    def _load_pending(self):
+        if self._pending is None:
+            return
+        loader, self._pending = self._pending, None
+        try:
+            restored = list(loader())
+        except Exception:
+            return  # an unreadable snapshot only means a cold cache
+        current = self._entries
+        self._entries = OrderedDict()
+        for key, stored_at, value in restored:
+            self._store(key, value, stored_at)
+        for key, entry in current.items():
+            self._store(key, entry[1], entry[0])
+
+    def items(self):
+        """All entries as (key, stored_at, value) tuples, least recently used first"""
+        with self._lock:
+            self._load_pending()
+            return [(key, stored_at, value) for key, (stored_at, value) in self._entries.items()]
+
+    def clear(self):
+        with self._lock:
+            self._pending = None
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            self._load_pending()
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            self._load_pending()
+            return key in self._entries
@@ -6,10 +6,14 @@ import os
 import datetime
 import pickle
 import logging
+import threading
+import uuid
 from rich.console import Console
 from rich.panel import Panel
 from rich import box
 
+from .trace import span
+
 # Suppress OAuth2 verification logs
 logging.getLogger('googleapiclient.discovery_cache').setLevel(logging.ERROR)
 logging.getLogger('googleapiclient.discovery').setLevel(logging.ERROR)
@@ -17,79 +21,286 @@ logging.getLogger('google_auth_oauthlib.flow').setLevel(logging.ERROR)
 
 console = Console()
 SCOPES = ['https://www.googleapis.com/auth/calendar.events']
-TOKEN_PATH = 'credentials/token.pickle'
+TOKEN_PATH = 'credentials/token.json'
+LEGACY_TOKEN_PATH = 'credentials/token.pickle'
 CREDENTIALS_PATH = 'credentials/credentials.json'
 
-def get_calendar_service():
-    """Get or create Google Calendar API service"""
-    creds = None
+# Maximum number of calls in one Calendar batch request
+BATCH_LIMIT = 50
+
+# Refresh the access token when it expires within this window
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+# Process-wide calendar client, built once and reused for every insert
+_service = None
+_creds = None
+_lock = threading.Lock()
+_warmup_thread = None
+
+
+def _save_credentials(creds):
+    """Store credentials as JSON, readable only by the current user"""
+    os.makedirs(os.path.dirname(TOKEN_PATH), exist_ok=True)
+    fd = os.open(TOKEN_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as token:
+        token.write(creds.to_json())
+
+
+def _load_credentials():
+    """Load stored credentials, migrating a legacy pickle token to JSON once"""
     if os.path.exists(TOKEN_PATH):
-        with open(TOKEN_PATH, 'rb') as token:
+        return Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+
+    if os.path.exists(LEGACY_TOKEN_PATH):
+        with open(LEGACY_TOKEN_PATH, 'rb') as token:
             creds = pickle.load(token)
+        _save_credentials(creds)
+        os.remove(LEGACY_TOKEN_PATH)
+        return creds
 
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            try:
-                console.print(Panel(
-                    "🔐 Opening browser for Google Calendar authentication...",
-                    border_style="info",
-                    box=box.ROUNDED
-                ))
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    CREDENTIALS_PATH,
-                    SCOPES,
-                    redirect_uri='urn:ietf:wg:oauth:2.0:oob'  # Use manual auth flow
-                )
-                auth_url, _ = flow.authorization_url(prompt='consent')
-                console.print(Panel(
-                    f"Please visit this URL to authorize the application:\n[link]{auth_url}[/link]",
-                    border_style="info",
-                    box=box.ROUNDED
-                ))
-                code = console.input("[bold cyan]Enter the authorization code: [/bold cyan]")
-                flow.fetch_token(code=code)
-                creds = flow.credentials
-
-                # Save credentials
-                os.makedirs(os.path.dirname(TOKEN_PATH), exist_ok=True)
-                with open(TOKEN_PATH, 'wb') as token:
-                    pickle.dump(creds, token)
-            except Exception as e:
-                console.print(Panel(
-                    f"❌ Authentication failed: {str(e)}",
-                    border_style="error",
-                    box=box.ROUNDED
-                ))
+    return None
+
+
+def _needs_refresh(creds):
+    if not creds.expiry:
+        return not creds.valid
+    return creds.expiry - datetime.datetime.utcnow() < REFRESH_MARGIN
+
+
+def _authorize():
+    """Run the interactive OAuth flow and return new credentials, or None on failure"""
+    try:
+        console.print(Panel(
+            "🔐 Opening browser for Google Calendar authentication...",
+            border_style="info",
+            box=box.ROUNDED
+        ))
+        flow = InstalledAppFlow.from_client_secrets_file(
+            CREDENTIALS_PATH,
+            SCOPES,
+            redirect_uri='urn:ietf:wg:oauth:2.0:oob'  # Use manual auth flow
+        )
+        auth_url, _ = flow.authorization_url(prompt='consent')
+        console.print(Panel(
+            f"Please visit this URL to authorize the application:\n[link]{auth_url}[/link]",
+            border_style="info",
+            box=box.ROUNDED
+        ))
+        code = console.input("[bold cyan]Enter the authorization code: [/bold cyan]")
+        flow.fetch_token(code=code)
+        creds = flow.credentials
+
+        # Save credentials
+        _save_credentials(creds)
+        return creds
+    except Exception as e:
+        console.print(Panel(
+            f"❌ Authentication failed: {str(e)}",
+            border_style="error",
+            box=box.ROUNDED
+        ))
+        return None
+
+
+def get_calendar_service(interactive=True):
+    """
+    Get the shared Google Calendar API service.
+
+    The service is built once per process. Later calls only refresh the
+    access token when it is about to expire; the refreshed credentials are
+    picked up by the existing service, so nothing is rebuilt.
+
+    Parameters:
+    - interactive: Whether the browser authorization flow may be started when
+      there is no usable stored token
+
+    Returns:
+    - The Calendar service, or None if no credentials are available
+    """
+    global _service, _creds
+    with _lock, span("calendar.auth", cache_hit=_service is not None) as s:
+        if _creds is None:
+            _creds = _load_credentials()
+
+        if _creds and _needs_refresh(_creds) and _creds.refresh_token:
+            s.set(refreshed=True)
+            _creds.refresh(Request())
+            _save_credentials(_creds)
+
+        if not _creds or not _creds.valid:
+            if not interactive:
                 return None
+            _creds = _authorize()
+            _service = None
+            if _creds is None:
+                return None
+
+        if _service is None:
+            _service = build('calendar', 'v3', credentials=_creds, cache_discovery=False)
+        return _service
+
 
-    return build('calendar', 'v3', credentials=creds, cache_discovery=False)
+def warm_up_calendar():
+    """
+    Start loading credentials and building the Calendar service in the background.
+
+    Call this as soon as the user opts into calendar integration; the service
+    is then usually ready by the time the day and time have been picked. Only
+    a stored token is used here, the interactive flow stays in the foreground.
+    """
+    global _warmup_thread
+    if _service is not None or (_warmup_thread and _warmup_thread.is_alive()):
+        return
+
+    def warm_up():
+        try:
+            get_calendar_service(interactive=False)
+        except Exception:
+            pass  # create_calendar_event retries and reports the error
+
+    _warmup_thread = threading.Thread(target=warm_up, daemon=True)
+    _warmup_thread.start()
+
+
+def build_event(origin, destination, start_time, duration_seconds, mode):
+    """Build the Calendar event body for a trip"""
+    # Parse ISO format datetime string
+    start_datetime = datetime.datetime.fromisoformat(start_time)
+    end_datetime = start_datetime + datetime.timedelta(seconds=duration_seconds)
+
+    return {
+        'summary': f'Trip: {origin} to {destination}',
+        'location': destination,
+        'description': f'Travel from {origin} to {destination} via {mode}',
+        'start': {
+            'dateTime': start_datetime.isoformat(),
+            'timeZone': 'UTC',
+        },
+        'end': {
+            'dateTime': end_datetime.isoformat(),
+            'timeZone': 'UTC',
+        },
+    }
 
 def create_calendar_event(origin, destination, start_time, duration_seconds, mode):
     """Create a calendar event for the trip"""
     try:
         service = get_calendar_service()
+        if service is None:
+            return False, "Failed to create calendar event: Google Calendar is not authorized"
 
-        # Parse ISO format datetime string
-        start_datetime = datetime.datetime.fromisoformat(start_time)
-        end_datetime = start_datetime + datetime.timedelta(seconds=duration_seconds)
-
-        event = {
-            'summary': f'Trip: {origin} to {destination}',
-            'location': destination,
-            'description': f'Travel from {origin} to {destination} via {mode}',
-            'start': {
-                'dateTime': start_datetime.isoformat(),
-                'timeZone': 'UTC',
-            },
-            'end': {
-                'dateTime': end_datetime.isoformat(),
-                'timeZone': 'UTC',
-            },
-        }
-
-        event = service.events().insert(calendarId='primary', body=event).execute()
+        event = build_event(origin, destination, start_time, duration_seconds, mode)
+        with span("calendar.insert"):
+            event = service.events().insert(calendarId='primary', body=event).execute()
         return True, f"Event created: {event.get('htmlLink')}"
     except Exception as e:
         return False, f"Failed to create calendar event: {str(e)}"
+
+def create_calendar_events(trips, dry_run=False, ics_path=None):
+    """
+    Create calendar events for many trips using Calendar batch requests.
+
+    Inserts are grouped into batches of at most BATCH_LIMIT calls, so a round
+    trip or a multi-day itinerary costs one HTTP request per batch instead of
+    one per event. A failing insert does not affect the others.
+
+    Parameters:
+    - trips: List of dicts with origin, destination, start_time (ISO string),
+      duration_seconds and mode keys, in the order the results are wanted
+    - dry_run: Only build the events, do not contact Google Calendar
+    - ics_path: Optional path of an .ics file to write the events to
+
+    Returns:
+    - List of (success, message) tuples, one per trip and in the same order
+    """
+    results = [None] * len(trips)
+    events = []
+    for i, trip in enumerate(trips):
+        try:
+            events.append((i, build_event(**trip)))
+        except Exception as e:
+            results[i] = (False, f"Invalid trip: {str(e)}")
+
+    if ics_path:
+        try:
+            write_ics(ics_path, [event for _, event in events])
+        except Exception as e:
+            return [result or (False, f"Failed to write {ics_path}: {str(e)}") for result in results]
+
+    if dry_run or not events:
+        target = f"Saved to {ics_path}" if ics_path else "Would create"
+        return [result or (True, f"{target}: {trips[i]['origin']} to {trips[i]['destination']} "
+                                 f"at {trips[i]['start_time']}")
+                for i, result in enumerate(results)]
+
+    try:
+        service = get_calendar_service()
+        if service is None:
+            raise RuntimeError("Google Calendar is not authorized")
+    except Exception as e:
+        return [result or (False, f"Failed to create calendar event: {str(e)}") for result in results]
+
+    def callback(request_id, response, exception):
+        index = int(request_id)
+        if exception is not None:
+            results[index] = (False, f"Failed to create calendar event: {str(exception)}")
+        else:
+            results[index] = (True, f"Event created: {response.get('htmlLink')}")
+
+    for start in range(0, len(events), BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=callback)
+        chunk = events[start:start + BATCH_LIMIT]
+        for index, event in chunk:
+            batch.add(service.events().insert(calendarId='primary', body=event), request_id=str(index))
+        try:
+            with span("calendar.batch", events=len(chunk)):
+                batch.execute()
+        except Exception as e:
+            for index, _ in chunk:
+                if results[index] is None:
+                    results[index] = (False, f"Failed to create calendar event: {str(e)}")
+
+    return results
+
+def _ics_text(value):
+    return (value.replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+def _ics_time(value):
+    return datetime.datetime.fromisoformat(value).strftime("%Y%m%dT%H%M%SZ")
+
+def _ics_fold(line):
+    # Content lines longer than 75 octets are folded (RFC 5545, section 3.1)
+    parts = []
+    while len(line.encode("utf-8")) > 75:
+        cut = 74
+        while len(line[:cut].encode("utf-8")) > 74:
+            cut -= 1
+        parts.append(line[:cut])
+        line = " " + line[cut:]
+    parts.append(line)
+    return "\r\n".join(parts)
+
+def write_ics(path, events):
+    """Write Calendar event bodies to an iCalendar (.ics) file"""
+    stamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//TravelGuide//Trip Planner//EN"]
+    for event in events:
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{uuid.uuid4()}@travelguide",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{_ics_time(event['start']['dateTime'])}",
+            f"DTEND:{_ics_time(event['end']['dateTime'])}",
+            f"SUMMARY:{_ics_text(event['summary'])}",
+            f"LOCATION:{_ics_text(event['location'])}",
+            f"DESCRIPTION:{_ics_text(event['description'])}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as fp:
+        fp.write("\r\n".join(_ics_fold(line) for line in lines) + "\r\n")
@@ -8,9 +8,9 @@ import questionary
 from questionary import Style as QuestionaryStyle
 import sys
 import threading
-import os
 
 from .interface import dark
+from . import deadline as trip_deadline
 console = Console(theme=dark)
 
 # Custom style for questionary
@@ -45,12 +45,23 @@ def check_quit(user_input):
     return False
 
 def signal_handler(sig, frame):
-    """Handle keyboard interrupts (Ctrl+C)"""
+    """
+    Handle keyboard interrupts (Ctrl+C) cooperatively.
+
+    The first Ctrl+C sets the exit flag and cancels the current trip: running
+    stages stop at their next checkpoint and no new upstream call is started.
+    A second Ctrl+C raises KeyboardInterrupt to abort right away.
+    """
+    if exit_event.is_set():
+        raise KeyboardInterrupt
+    exit_event.set()
+    deadline = trip_deadline.current()
+    if deadline is not None:
+        deadline.cancel()
     console.print("\n")
-    console.print(Panel("⚠️ Program stop requested. Exiting...",
+    console.print(Panel("⚠️ Program stop requested. Finishing up... (press Ctrl+C again to quit now)",
                         border_style="error",
                         box=box.ROUNDED))
-    os._exit(0)  # Force immediate exit
 
 def check_exit():
     """Check if exit has been requested"""
@@ -60,6 +71,11 @@ def reset_exit():
     """Reset exit event - useful for new route planning"""
     exit_event.clear()
 
+def ask(question):
+    """Ask a questionary question with the trip clock paused while the user answers"""
+    with trip_deadline.paused():
+        return question.ask()
+
 def safe_input(prompt, choices=None, default=None):
     """
     Enhanced input function with arrow key support for choices and exit checking
@@ -68,24 +84,24 @@ def safe_input(prompt, choices=None, default=None):
         if exit_event.is_set():
             return None
         if choices:
-            result = questionary.select(
+            result = ask(questionary.select(
                 prompt,
                 choices=choices,
                 default=default,
                 style=custom_style,
                 qmark=""
-            ).ask()
+            ))
             # Handle None result
             if result is None:
                 return ""
         else:
             # Use questionary's text input for free text
-            result = questionary.text(
+            result = ask(questionary.text(
                 prompt,
                 default=default or "",
                 style=custom_style,
                 qmark=""
-            ).ask()
+            ))
             # Handle None result
             if result is None:
                 return ""
@@ -101,12 +117,12 @@ def safe_confirm(prompt):
     try:
         if exit_event.is_set():
             return False
-        result = questionary.select(
+        result = ask(questionary.select(
             prompt,
             choices=["Yes", "No"],
             style=custom_style,
             qmark=""
-        ).ask()
+        ))
         # Handle None result
         if result is None:
             return False
@@ -115,16 +131,24 @@ def safe_confirm(prompt):
         signal_handler(signal.SIGINT, None)
         return False
 
-def suggest_transport(mode: str, distance_km: float) -> str:
+def suggest_transport(mode: str, distance_km: float, options: dict = None) -> str:
     """
     Return a warning string if the distance is too long for walking or biking,
     or suggest alternatives based on the distance range.
     mode: one of "car", "bike", "foot"/"walk", "public", or "flight"
     distance_km: the total trip distance in kilometers
+    options: optional {profile: RouteOption} from a route comparison; when the
+        current mode is part of it, the suggestion is based on the measured
+        durations and weather exposure instead of the distance thresholds
     """
-    # Normalize GraphHopper's "foot" to our "walk"
+    if options and mode in options:
+        return suggest_from_options(mode, options)
+
+    # Normalize GraphHopper's "foot" to our "walk" and "transit" to "public"
     if mode == "foot":
         key = "walk"
+    elif mode == "transit":
+        key = "public"
     else:
         key = mode
 
@@ -155,3 +179,29 @@ def suggest_transport(mode: str, distance_km: float) -> str:
             return f"⚠️ {distance_km:.1f} km is an extremely long trip. Ensure you plan for layovers and rest!"
 
     return ""
+
+
+def suggest_from_options(mode: str, options: dict) -> str:
+    """
+    Suggest another mode only when the comparison shows a real benefit:
+    a clearly shorter trip, or a similar trip without bad-weather exposure.
+    """
+    current = options[mode]
+    minutes = current.hours * 60
+    fastest = min(options.values(), key=lambda option: option.hours)
+    saved = minutes - fastest.hours * 60
+
+    # Worth switching if it saves at least 10 minutes and a quarter of the trip
+    if fastest.profile != mode and saved >= 10 and saved >= minutes / 4:
+        return (f"⏱️ {fastest.profile.title()} takes {fastest.hours * 60:.0f} min instead of "
+                f"{minutes:.0f} min by {mode} ({fastest.distance_km:.1f} km). Consider switching!")
+
+    if current.exposure_min >= 10:
+        dry = [option for option in options.values()
+               if option.exposure_min == 0 and option.hours <= current.hours * 1.5]
+        if dry:
+            alternative = min(dry, key=lambda option: option.hours)
+            return (f"🌧️ About {current.exposure_min:.0f} min of this {mode} trip is in rain or strong wind. "
+                    f"{alternative.profile.title()} takes {alternative.hours * 60:.0f} min and keeps you dry.")
+
+    return ""
@@ -0,0 +1,156 @@
+import contextvars
+import datetime
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+from .trace import span
+
+# Profiles requested side by side in compare mode
+COMPARE_PROFILES = ("car", "bike", "foot")
+
+# Profiles where the traveller is exposed to the weather for the whole trip
+OUTDOOR_PROFILES = frozenset(("bike", "foot"))
+
+# Open-Meteo weather codes from drizzle upwards count as wet weather
+WET_WEATHER_CODE = 51
+# Wind speed (km/h) from which bike and foot trips count as windy
+WINDY_KMH = 30
+
+
+class RouteOption:
+    """
+    One row of a route comparison.
+
+    Attributes:
+        profile (str): GraphHopper profile of the route.
+        label (str): Display label, e.g. "car" or "car (alt 1)".
+        route (Route): The route itself.
+        exposure_min (float): Minutes spent outdoors in wet or windy weather.
+    """
+    __slots__ = ("profile", "label", "route", "exposure_min")
+
+    def __init__(self, profile, label, route, exposure_min=0.0):
+        self.profile = profile
+        self.label = label
+        self.route = route
+        self.exposure_min = exposure_min
+
+    @property
+    def distance_km(self):
+        return self.route.distance_km
+
+    @property
+    def hours(self):
+        return self.route.hours
+
+
+def current_hour_index(times, now=None):
+    """
+    Index of the forecast hour containing `now` (default: the current local time).
+
+    Open-Meteo's hourly columns start at local midnight; `times` are their
+    sorted "YYYY-MM-DDTHH:MM" strings. Returns 0 when `now` is before the first
+    hour and the last hour when it is past the end.
+    """
+    if not times:
+        return 0
+    stamp = (now or datetime.datetime.now()).strftime("%Y-%m-%dT%H:00")
+    return max(0, bisect_right(times, stamp) - 1)
+
+
+def weather_exposure(profile, hours, hourly, now=None):
+    """
+    Estimates how many minutes of a trip are spent outdoors in bad weather.
+
+    Only bike and foot trips are exposed. Each forecast hour overlapping the trip,
+    starting at the current hour, counts when its weather code is drizzle or
+    worse, or the wind is strong.
+
+    Parameters:
+        profile (str): GraphHopper profile.
+        hours (float): Trip duration in hours.
+        hourly (dict): Raw Open-Meteo hourly columns from `OpenMeteo.get_hourly`.
+        now (datetime): Departure time, default now.
+
+    Returns:
+        float: Exposed minutes.
+    """
+    if profile not in OUTDOOR_PROFILES or not hourly:
+        return 0.0
+
+    codes = hourly.get("weathercode", [])
+    winds = hourly.get("wind_speed_10m", [])
+    start = current_hour_index(hourly.get("time", []), now)
+    exposed = 0.0
+    hour = 0
+    while hour < hours and start + hour < len(codes):
+        overlap = min(1.0, hours - hour)
+        i = start + hour
+        wind = winds[i] if i < len(winds) else 0
+        if (codes[i] or 0) >= WET_WEATHER_CODE or (wind or 0) >= WINDY_KMH:
+            exposed += overlap * 60
+        hour += 1
+    return exposed
+
+
+def compare_routes(router, weather, orig_lat, orig_lng, dest_lat, dest_lng, chosen="car", alternatives=2):
+    """
+    Fetches car, bike and foot routes, alternatives for the chosen profile and the
+    origin forecast concurrently, so the whole comparison costs a single wait.
+
+    Parameters:
+        router (Routing): Routing client.
+        weather (OpenMeteo): Weather client used for the exposure column.
+        orig_lat, orig_lng: Origin coordinates.
+        dest_lat, dest_lng: Destination coordinates.
+        chosen (str): Profile for which alternative routes are requested.
+        alternatives (int): Number of alternatives to request for `chosen`.
+
+    Returns:
+        list: `RouteOption` objects, fastest first. Profiles that fail are skipped.
+    """
+    coords = (orig_lat, orig_lng, dest_lat, dest_lng)
+    with span("compare.routes", chosen=chosen), ThreadPoolExecutor(max_workers=len(COMPARE_PROFILES) + 1) as pool:
+        def submit(fn, *args):
+            # Run in a copy of the caller's context so workers see the trip deadline
+            return pool.submit(contextvars.copy_context().run, fn, *args)
+
+        futures = {}
+        for profile in COMPARE_PROFILES:
+            if profile == chosen and alternatives:
+                futures[profile] = submit(router.alternatives, *coords, profile, alternatives)
+            else:
+                futures[profile] = submit(router.route, *coords, profile)
+        hourly_future = submit(weather.get_hourly, orig_lat, orig_lng)
+
+        try:
+            hourly = hourly_future.result()
+        except Exception:
+            hourly = {}
+
+        options = []
+        for profile, future in futures.items():
+            try:
+                status, data = future.result()
+            except Exception:
+                continue
+            if status != 200:
+                continue
+
+            routes = data if isinstance(data, list) else [data]
+            for i, route in enumerate(routes):
+                label = profile if i == 0 else f"{profile} (alt {i})"
+                exposure = weather_exposure(profile, route.hours, hourly)
+                options.append(RouteOption(profile, label, route, exposure))
+
+    options.sort(key=lambda option: option.route.time)
+    return options
+
+
+def best_by_profile(options):
+    """Return the fastest option of each profile as a {profile: RouteOption} dict"""
+    best = {}
+    for option in options:
+        if option.profile not in best or option.route.time < best[option.profile].route.time:
+            best[option.profile] = option
+    return best
@@ -0,0 +1,120 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Request timeout used when no trip deadline is active, and the shortest one handed out
+DEFAULT_TIMEOUT_S = 15.0
+MIN_TIMEOUT_S = 0.5
+
+
+class Cancelled(BaseException):
+    """
+    Raised at the next checkpoint after a trip was cancelled (Ctrl+C).
+
+    Derives from BaseException like KeyboardInterrupt, so the broad
+    `except Exception` blocks around optional stages don't swallow it.
+    """
+
+
+class BudgetExceeded(Exception):
+    """Raised when a stage would start after the trip deadline has passed"""
+
+
+class Deadline:
+    """
+    Time budget of one trip, shared by every stage that runs for it.
+
+    Time spent waiting for the user is not counted: prompts run inside
+    `paused()`, which pushes the expiry back by the time the prompt took.
+
+    Parameters:
+        budget_s (float): Seconds of work the trip may take.
+    """
+    def __init__(self, budget_s):
+        self.budget_s = budget_s
+        self.expires_at = time.monotonic() + budget_s
+        self._cancelled = threading.Event()
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, seconds):
+        """True when at least `seconds` of budget are left and the trip was not cancelled"""
+        return not self.cancelled and self.remaining() >= seconds
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        """
+        Cooperative checkpoint for stages.
+
+        Raises:
+            Cancelled: The trip was cancelled.
+            BudgetExceeded: The deadline has passed.
+        """
+        if self.cancelled:
+            raise Cancelled()
+        if self.expired():
+            raise BudgetExceeded(f"Trip budget of {self.budget_s:.0f} s exceeded")
+
+    @contextmanager
+    def paused(self):
+        start = time.monotonic()
+        try:
+            yield self
+        finally:
+            self.expires_at += time.monotonic() - start
+
+
+_current = contextvars.ContextVar("deadline", default=None)
+
+
+def activate(deadline):
+    """Make `deadline` the current trip deadline of this thread (and of contexts copied from it)"""
+    _current.set(deadline)
+    return deadline
+
+
+def current():
+    """Return the active `Deadline`, or None outside a trip"""
+    return _current.get()
+
+
+def request_timeout(cap=DEFAULT_TIMEOUT_S):
+    """
+    Timeout for an outbound call: `cap`, shortened to the remaining trip budget.
+
+    Raises:
+        Cancelled, BudgetExceeded: See `Deadline.check`.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return cap
+    deadline.check()
+    return max(MIN_TIMEOUT_S, min(cap, deadline.remaining()))
+
+
+@contextmanager
+def paused():
+    """Stop the current trip clock, e.g. while a prompt waits for the user"""
+    deadline = _current.get()
+    if deadline is None:
+        yield None
+        return
+    with deadline.paused():
+        yield deadline
+
+
+def allows(seconds):
+    """True when the current trip (if any) has at least `seconds` of budget left"""
+    deadline = _current.get()
+    return deadline is None or deadline.allows(seconds)
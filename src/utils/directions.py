@@ -0,0 +1,130 @@
+from itertools import islice
+
+from rich.table import Table
+from rich import box
+
+from .trace import span
+
+# Direction icons keyed by GraphHopper instruction sign codes
+SIGN_ICONS = {
+    -98: "🔄",  # u-turn (direction unknown)
+    -8: "🔄",   # left u-turn
+    -7: "↖️",   # keep left
+    -6: "🔄",   # leave roundabout
+    -3: "↩️",   # sharp left
+    -2: "⬅️",   # left
+    -1: "↖️",   # slight left
+    0: "⬆️",    # continue
+    1: "↗️",    # slight right
+    2: "➡️",    # right
+    3: "↪️",    # sharp right
+    4: "🏁",    # finish
+    5: "📍",    # via point reached
+    6: "🔄",    # roundabout
+    7: "↗️",    # keep right
+    8: "🔄",    # right u-turn
+    101: "🚌",  # board public transit
+    102: "🔁",  # transfer to another vehicle
+    103: "🚏",  # leave public transit
+}
+DEFAULT_ICON = "➡️"
+
+# Signs that do not require a real manoeuvre and can be merged with their neighbours;
+# keep left/right (-7, 7) are forks and exits, so they always get their own row
+MINOR_SIGNS = frozenset((0,))
+
+
+def format_distance(distance):
+    """Format a step distance in a readable way"""
+    if distance < 100:
+        return f"{distance:.0f} m"
+    return f"{distance / 1000:.1f} km / {distance / 1000 / 1.61:.1f} miles"
+
+
+def iter_rows(route, collapse=True):
+    """
+    Yields (icon, text) display rows for a route, one instruction at a time.
+
+    Icons come from the numeric `sign` of each instruction. With `collapse`
+    enabled, runs of consecutive minor steps ("continue") are merged into the
+    first step of the run and their distances summed.
+
+    Parameters:
+        route (Route): The route to render.
+        collapse (bool): Whether to merge consecutive minor steps.
+
+    Yields:
+        tuple: (icon, text) for each displayed row.
+    """
+    texts = route.texts
+    distances = route.distances
+    signs = route.signs
+    n = len(texts)
+    i = 0
+
+    while i < n:
+        sign = signs[i]
+        text = texts[i]
+        distance = distances[i]
+        j = i + 1
+        if collapse and sign in MINOR_SIGNS:
+            while j < n and signs[j] in MINOR_SIGNS:
+                distance += distances[j]
+                j += 1
+            if j - i > 1:
+                text = f"{text} (+{j - i - 1} more)"
+
+        icon = SIGN_ICONS.get(sign, DEFAULT_ICON)
+        if distance:
+            yield icon, f"{text} ({format_distance(distance)})"
+        else:
+            yield icon, text
+        i = j
+
+
+def render_steps(console, route, page_size=None, confirm=None, should_stop=None, collapse=True):
+    """
+    Prints route directions page by page instead of building one large table.
+
+    Each page is a small table that is printed as soon as its rows are
+    formatted, so the first screen appears immediately even for routes with
+    thousands of steps.
+
+    Parameters:
+        console (Console): Rich console to print to.
+        route (Route): The route to render.
+        page_size (int): Rows per page, defaults to the console height minus a margin.
+        confirm (callable): Called with a prompt between pages; returning False
+            stops rendering. When None, all pages are printed.
+        should_stop (callable): Returns True when rendering should stop early.
+        collapse (bool): Whether to merge consecutive minor steps.
+
+    Returns:
+        int: Number of rows printed.
+    """
+    if page_size is None:
+        page_size = max(5, console.height - 6)
+
+    rows = iter_rows(route, collapse)
+    printed = 0
+    while True:
+        with span("render.directions_page") as s:
+            page = list(islice(rows, page_size))
+            if not page:
+                break
+
+            steps_table = Table(box=box.SIMPLE, show_header=False, padding=(0, 1))
+            steps_table.add_column("Icon", justify="center", style="highlight")
+            steps_table.add_column("Direction", style="answer")
+            for icon, text in page:
+                steps_table.add_row(icon, text)
+            console.print(steps_table)
+            printed += len(page)
+            s.set(rows=len(page))
+
+        if len(page) < page_size or (should_stop and should_stop()):
+            break
+        if confirm and not confirm(f"Showing {printed} steps. Show more directions?"):
+            break
+
+    return printed
@@ -0,0 +1,99 @@
+import json
+import os
+from xml.sax.saxutils import escape
+
+# Number of formatted points collected before each write call.
+WRITE_BATCH = 4096
+
+
+def _iter_indices(count, indices):
+    return range(count) if indices is None else indices
+
+
+def write_gpx(fp, lats, lngs, indices=None, name="Route"):
+    """
+    Streams a route as a GPX 1.1 track to an open text file.
+
+    Points are formatted and written in fixed-size batches straight from the
+    coordinate columns, so memory use stays flat no matter how long the route is.
+
+    Parameters:
+        fp: A writable text file object.
+        lats (sequence): Latitudes.
+        lngs (sequence): Longitudes.
+        indices (sequence): Optional subset of point indices to write, e.g. the
+            result of `polyline.simplify`.
+        name (str): Track name.
+
+    Returns:
+        int: Number of points written.
+    """
+    fp.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<gpx version="1.1" creator="TravelGuide" xmlns="http://www.topografix.com/GPX/1/1">\n'
+             f'<trk><name>{escape(name)}</name><trkseg>\n')
+    batch = []
+    written = 0
+    for i in _iter_indices(len(lats), indices):
+        batch.append(f'<trkpt lat="{lats[i]:.6f}" lon="{lngs[i]:.6f}"/>\n')
+        if len(batch) == WRITE_BATCH:
+            fp.write("".join(batch))
+            written += len(batch)
+            batch.clear()
+    fp.write("".join(batch))
+    written += len(batch)
+    fp.write("</trkseg></trk>\n</gpx>\n")
+    return written
+
+
+def write_geojson(fp, lats, lngs, indices=None, properties=None):
+    """
+    Streams a route as a GeoJSON Feature with a LineString geometry.
+
+    Parameters:
+        fp: A writable text file object.
+        lats (sequence): Latitudes.
+        lngs (sequence): Longitudes.
+        indices (sequence): Optional subset of point indices to write.
+        properties (dict): Optional JSON-serializable feature properties.
+
+    Returns:
+        int: Number of points written.
+    """
+    fp.write('{"type": "Feature", "properties": ' + json.dumps(properties or {}) + ', '
+             '"geometry": {"type": "LineString", "coordinates": [')
+    batch = []
+    written = 0
+    for i in _iter_indices(len(lats), indices):
+        # GeoJSON coordinates are [longitude, latitude]
+        batch.append(f'{"," if written or batch else ""}[{lngs[i]:.6f},{lats[i]:.6f}]')
+        if len(batch) == WRITE_BATCH:
+            fp.write("".join(batch))
+            written += len(batch)
+            batch.clear()
+    fp.write("".join(batch))
+    written += len(batch)
+    fp.write("]}}\n")
+    return written
+
+
+def export_route(path, lats, lngs, indices=None, name="Route"):
+    """
+    Writes a route to `path`, picking GPX or GeoJSON from the file extension.
+
+    Parameters:
+        path (str): Target file ending in `.gpx`, `.geojson` or `.json`.
+        lats (sequence): Latitudes.
+        lngs (sequence): Longitudes.
+        indices (sequence): Optional subset of point indices to write.
+        name (str): Route name stored in the file.
+
+    Returns:
+        int: Number of points written.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fp:
+        if path.endswith(".gpx"):
+            return write_gpx(fp, lats, lngs, indices, name)
+        return write_geojson(fp, lats, lngs, indices, {"name": name})
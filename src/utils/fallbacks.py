@@ -0,0 +1,78 @@
+"""
+Local stand-ins for the optional AI stages, used when the trip budget runs
+low or Gemini is unavailable. They only use data that is already on hand.
+"""
+# Words in the decoded Open-Meteo forecast that deserve a warning
+SEVERE_WEATHER = ("drizzle", "rain", "snow", "thunderstorm", "fog")
+
+
+def is_error(text):
+    """True for the "❌ ..." strings the Genai methods return when a call fails"""
+    return not text or str(text).startswith(("❌", "Unable to"))
+
+
+def local_route_summary(route, origin, destination, vehicle, roads=3):
+    """
+    Plain summary of a route: distance, duration and the roads it mostly follows.
+
+    Parameters:
+        route (Route): The route to summarize.
+        origin, destination (str): Display names of the endpoints.
+        vehicle (str): Transport mode.
+        roads (int): How many main roads to name.
+    """
+    minutes = round(route.time / 60000)
+    lines = [f"{vehicle.title()} trip from {origin} to {destination}: "
+             f"{route.distance_km:.1f} km in about {minutes // 60} h {minutes % 60:02d} min."]
+
+    by_street = {}
+    for name, distance in zip(route.street_names, route.distances):
+        if name:
+            by_street[name] = by_street.get(name, 0.0) + distance
+    main_roads = sorted(by_street, key=by_street.get, reverse=True)[:roads]
+    if main_roads:
+        lines.append("Main roads: " + ", ".join(main_roads) + ".")
+    return "\n".join(lines)
+
+
+def local_weather_advisory(current, forecast):
+    """
+    Weather advisory built from the formatted Open-Meteo lines without an LLM.
+
+    Parameters:
+        current (str): Current weather line at the departure.
+        forecast (str): Hourly forecast lines at the destination.
+    """
+    lines = [f"Now at departure: {current}" if current else "Current weather is unavailable."]
+    hours = (forecast or "").splitlines()
+    if hours:
+        lines.append(f"At the destination: {hours[0]}")
+        if len(hours) > 1:
+            lines.append(f"On arrival: {hours[-1]}")
+        severe = [hour for hour in hours if any(word in hour for word in SEVERE_WEATHER)]
+        if severe:
+            lines.append(f"⚠️ {len(severe)} of {len(hours)} forecast hours have rain, snow, fog or storms. "
+                         f"Plan accordingly.")
+    return "\n".join(lines)
+
+
+def spoken_distance(distance):
+    if distance < 1000:
+        return f"{distance:.0f} meters"
+    return f"{distance / 1000:.1f} kilometers"
+
+
+def local_voice_steps(route, start=0, stop=None):
+    """Spoken form of the route's own steps `start` to `stop`"""
+    return [
+        f"{text}, then continue for {spoken_distance(distance)}." if distance else f"{text}."
+        for text, distance in zip(route.texts[start:stop], route.distances[start:stop])
+    ]
+
+
+def local_voice_instructions(route, limit=None):
+    """
+    Voice instructions read straight from the route, in the list shape returned
+    by `Genai.convert_to_natural_instructions` (the first entry is a heading).
+    """
+    return ["Directions"] + local_voice_steps(route, 0, limit)
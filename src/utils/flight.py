@@ -0,0 +1,149 @@
+import csv
+import pathlib
+from array import array
+
+from . import polyline
+from .route import Route
+from .spatial import KDTree, haversine, haversine_many
+
+AIRPORTS_PATH = pathlib.Path(__file__).resolve().parents[2] / "public" / "data" / "airports.csv"
+
+# Block time model (minutes unless noted)
+TAXI_MIN = 25              # taxi out + taxi in
+CLIMB_DESCENT_MIN = 20     # extra time spent below cruise speed
+CRUISE_KMH = 830
+AIRWAY_FACTOR = 1.05       # flown distance vs. great-circle distance
+CHECK_IN_MIN = 90          # arrive at the departure airport this early
+DOMESTIC_CHECK_IN_MIN = 60
+ARRIVAL_MIN = 30           # deplaning and baggage claim
+
+# Ground legs to and from the airports
+GROUND_KMH = 50
+ROAD_FACTOR = 1.3          # road distance vs. straight-line distance
+
+# Candidate airport search
+AIRPORT_RADIUS_KM = 250
+AIRPORT_CANDIDATES = 3
+MIN_FLIGHT_KM = 150
+
+
+class FlightEstimator:
+    """
+    Estimates door-to-door flight trips locally from a bundled airport dataset.
+
+    Airports are indexed in a `KDTree`, the nearest suitable airports around
+    each endpoint are paired up and every pair is scored with a simple block
+    time model plus ground access legs. The result is a `Route` with the same
+    shape as a GraphHopper route, so the rest of the app can treat flights
+    like any other profile.
+
+    Parameters:
+        airports_path (str): CSV file with iata, name, city, country, lat, lng and type columns.
+        airport_types (tuple): Airport types considered suitable for scheduled flights.
+    """
+    def __init__(self, airports_path=AIRPORTS_PATH, airport_types=("large",)):
+        self.iata = []
+        self.names = []
+        self.countries = []
+        self.lats = array("d")
+        self.lngs = array("d")
+
+        with open(airports_path, newline="", encoding="utf-8") as fp:
+            for row in csv.DictReader(fp):
+                if row["type"] not in airport_types:
+                    continue
+                self.iata.append(row["iata"])
+                self.names.append(row["name"])
+                self.countries.append(row["country"])
+                self.lats.append(float(row["lat"]))
+                self.lngs.append(float(row["lng"]))
+
+        self.tree = KDTree(self.lats, self.lngs)
+
+    def nearest_airports(self, lat, lng, k=AIRPORT_CANDIDATES, max_km=AIRPORT_RADIUS_KM):
+        """Return up to k (distance_km, airport index) tuples around a coordinate"""
+        return self.tree.nearest(lat, lng, k, max_km)
+
+    def block_minutes(self, distance_km):
+        """Gate-to-gate time for a flight over the given great-circle distance"""
+        return TAXI_MIN + CLIMB_DESCENT_MIN + distance_km * AIRWAY_FACTOR / CRUISE_KMH * 60
+
+    def estimate(self, orig_lat, orig_lng, dest_lat, dest_lng):
+        """
+        Estimates the fastest door-to-door flight between two coordinates.
+
+        Parameters:
+            orig_lat, orig_lng: Origin coordinates.
+            dest_lat, dest_lng: Destination coordinates.
+
+        Returns:
+            tuple: (status code, data) where data is a `Route` on success and a
+            dict with a `message` otherwise, mirroring `Routing.route`.
+        """
+        orig_lat, orig_lng, dest_lat, dest_lng = map(float, (orig_lat, orig_lng, dest_lat, dest_lng))
+        if haversine(orig_lat, orig_lng, dest_lat, dest_lng) < MIN_FLIGHT_KM:
+            return 400, {"message": f"Trips shorter than {MIN_FLIGHT_KM} km are not worth a flight"}
+
+        departures = self.nearest_airports(orig_lat, orig_lng)
+        arrivals = self.nearest_airports(dest_lat, dest_lng)
+        if not departures or not arrivals:
+            return 404, {"message": f"No airport with scheduled flights within {AIRPORT_RADIUS_KM} km"}
+
+        arrival_lats = [self.lats[i] for _, i in arrivals]
+        arrival_lngs = [self.lngs[i] for _, i in arrivals]
+
+        best = None
+        for dep_km, dep in departures:
+            flight_kms = haversine_many(self.lats[dep], self.lngs[dep], arrival_lats, arrival_lngs)
+            for (arr_km, arr), flight_km in zip(arrivals, flight_kms):
+                if dep == arr:
+                    continue
+                minutes = self.door_to_door(dep, arr, dep_km, arr_km, flight_km)
+                if best is None or minutes < best[0]:
+                    best = (minutes, dep, arr, dep_km, arr_km, flight_km)
+
+        if best is None:
+            return 404, {"message": "Both locations are served by the same airport"}
+
+        _, dep, arr, dep_km, arr_km, flight_km = best
+        return 200, self.build_route(orig_lat, orig_lng, dest_lat, dest_lng, dep, arr, dep_km, arr_km, flight_km)
+
+    def check_in_minutes(self, dep, arr):
+        return DOMESTIC_CHECK_IN_MIN if self.countries[dep] == self.countries[arr] else CHECK_IN_MIN
+
+    def door_to_door(self, dep, arr, dep_km, arr_km, flight_km):
+        ground = (dep_km + arr_km) * ROAD_FACTOR / GROUND_KMH * 60
+        return ground + self.check_in_minutes(dep, arr) + self.block_minutes(flight_km) + ARRIVAL_MIN
+
+    def build_route(self, orig_lat, orig_lng, dest_lat, dest_lng, dep, arr, dep_km, arr_km, flight_km):
+        to_airport_km = dep_km * ROAD_FACTOR
+        from_airport_km = arr_km * ROAD_FACTOR
+        dep_label = f"{self.names[dep]} ({self.iata[dep]})"
+        arr_label = f"{self.names[arr]} ({self.iata[arr]})"
+
+        # (text, distance m, time ms, sign, first point, last point)
+        steps = [
+            (f"Travel to {dep_label}", to_airport_km * 1000, to_airport_km / GROUND_KMH * 3600000, 0, 0, 1),
+            (f"Check in and pass security at {self.iata[dep]}", 0, self.check_in_minutes(dep, arr) * 60000, 5, 1, 1),
+            (f"Fly from {self.iata[dep]} to {arr_label}", flight_km * AIRWAY_FACTOR * 1000,
+             self.block_minutes(flight_km) * 60000, 0, 1, 2),
+            (f"Deplane and collect baggage at {self.iata[arr]}", 0, ARRIVAL_MIN * 60000, 5, 2, 2),
+            ("Travel from the airport to your destination", from_airport_km * 1000,
+             from_airport_km / GROUND_KMH * 3600000, 0, 2, 3),
+            ("Arrive at destination", 0, 0, 4, 3, 3),
+        ]
+
+        points = polyline.encode(
+            (orig_lat, self.lats[dep], self.lats[arr], dest_lat),
+            (orig_lng, self.lngs[dep], self.lngs[arr], dest_lng),
+        )
+        return Route.from_path({
+            "distance": sum(step[1] for step in steps),
+            "time": int(sum(step[2] for step in steps)),
+            "points": points,
+            "instructions": [
+                {"text": text, "distance": distance, "time": int(time), "sign": sign,
+                 "interval": [first, last], "street_name": ""}
+                for text, distance, time, sign, first, last in steps
+            ],
+        })
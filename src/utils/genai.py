@@ -1,5 +1,71 @@
 import google.generativeai as genai
+import contextvars
 import json
+import logging
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from . import prompts
+
+from .cache import TTLCache
+from .deadline import request_timeout
+from .fallbacks import local_voice_steps
+from .hedge import Hedge, HEDGE_PERCENTILE, HEDGE_RATIO
+from .resilience import upstream
+from .route import Route
+from .singleflight import SingleFlight
+from .trace import Span, span
+
+log = logging.getLogger("travelguide.genai")
+
+# Identical prompts sent at the same time share one generation
+_flight = SingleFlight("gemini")
+
+# Answers are reused for identical prompts to the same model for this long
+RESPONSE_TTL = 12 * 3600
+MAX_RESPONSES = 256
+
+# Longest a single generation may take, shortened to the remaining trip budget
+GENERATE_TIMEOUT_S = 30.0
+
+# Voice instructions are rewritten in chunks: a short first one so speaking can start
+# early, then at most MAX_INSTRUCTION_CHUNKS - 1 larger ones covering the rest of the route
+FIRST_CHUNK_STEPS = 3
+CHUNK_STEPS = 10
+MAX_INSTRUCTION_CHUNKS = 6
+CHUNK_WORKERS = 3
+
+# Numbering or bullets the model puts in front of an instruction line
+_LINE_PREFIX = re.compile(r"^\s*(?:\d+\s*[.|):]\s*|[-*•]\s+)")
+
+# Stages with short, structured answers; they run on the lighter model
+LIGHT_STAGES = frozenset(("accommodations", "parse_input", "natural_instructions"))
+
+
+class CachedResponse:
+    """A stored answer, shaped like the parts of a Gemini response the stages read"""
+    __slots__ = ("text",)
+    usage_metadata = None
+
+    def __init__(self, text):
+        self.text = text
+
+
+def instruction_chunks(steps, first=FIRST_CHUNK_STEPS, size=CHUNK_STEPS, max_chunks=MAX_INSTRUCTION_CHUNKS):
+    """
+    Splits `steps` route steps into (start, stop) ranges for chunked rewriting: a
+    short first chunk, then chunks of at least `size` steps, at most `max_chunks` in all.
+    """
+    if steps <= 0:
+        return []
+    chunks = [(0, min(first, steps))]
+    if steps > first:
+        size = max(size, math.ceil((steps - first) / max(1, max_chunks - 1)))
+        chunks.extend((start, min(steps, start + size)) for start in range(first, steps, size))
+    return chunks
+
 
 class Genai:
     """
@@ -10,15 +76,90 @@ class Genai:
 
     Attributes:
         model: An instance of Gemini's GenerativeModel configured with the specified model name.
+        light_model: GenerativeModel used for the stages in `LIGHT_STAGES`; the same as
+            `model` when no light model is configured.
+        hedge: Hedged-request policy shared by all stages.
+        responses: TTLCache of answers by (model name, prompt text).
 
     Methods:
         None
     """
-    def __init__(self, genai_api_key: str, model_name: str):
+    def __init__(self, genai_api_key: str, model_name: str, light_model_name: str = None,
+                 hedge_percentile: float = HEDGE_PERCENTILE, hedge_ratio: float = HEDGE_RATIO):
         if not genai_api_key:
             raise ValueError("Gemini API key cannot be empty or None")
         genai.configure(api_key=genai_api_key)
         self.model = genai.GenerativeModel(model_name)
+        if light_model_name and light_model_name != model_name:
+            self.light_model = genai.GenerativeModel(light_model_name)
+        else:
+            self.light_model = self.model
+        self.hedge = Hedge("gemini", hedge_percentile, hedge_ratio)
+        self.responses = TTLCache(RESPONSE_TTL, maxsize=MAX_RESPONSES)
+
+    def model_for(self, stage):
+        """Model that answers a stage: the light model for short structured outputs"""
+        return self.light_model if stage in LIGHT_STAGES else self.model
+
+    def _generate(self, prompt):
+        """
+        Send a `Prompt` to the model inside a tracing span named after its stage.
+
+        Calls go through the shared Gemini rate limiter and circuit breaker, so a
+        burst waits for quota instead of failing and an outage fails fast with
+        `UpstreamUnavailable`. Concurrent calls with the same stage and prompt share
+        one request. A call slower than the usual latency of its stage is hedged
+        with a second request (see `Hedge`). Answers are kept in `responses`, so an
+        identical prompt to the same model is answered without a request.
+
+        Tokens are estimated before sending and logged per call together with
+        the usage the model reports.
+        """
+        model = self.model_for(prompt.stage)
+        text = prompt.text
+        key = (getattr(model, "model_name", "?"), text)
+        with span("cache.llm", stage=prompt.stage) as s:
+            cached = self.responses.get(key)
+            s.set(cache_hit=cached is not None)
+        if cached is not None:
+            return CachedResponse(cached)
+        response = _flight.do((id(model), prompt.stage, text), self._send, model, prompt.stage, text)
+        self.responses.set(key, response.text)
+        return response
+
+    def _send(self, model, stage, prompt):
+        estimate = prompts.estimate_tokens(prompt)
+        with span(f"gemini.{stage}", prompt_chars=len(prompt), prompt_tokens_est=estimate) as s:
+            # The hedged copy only goes out if quota is left right now. Both calls run at
+            # once, so each records into its own span and only the winner's is copied to `s`
+            (response, attempt), hedged, backup_won = self.hedge.run(
+                (id(model), stage),
+                partial(self._call, model, prompt, Span(s.name, {}), True),
+                partial(self._hedge_call, model, stage, prompt))
+            s.set(**attempt.attrs)
+            s.set(bytes=len(response.text))
+            if hedged:
+                s.set(hedged=True, hedge_won=backup_won)
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None:
+                s.set(prompt_tokens=getattr(usage, "prompt_token_count", 0),
+                      output_tokens=getattr(usage, "candidates_token_count", 0),
+                      cached_tokens=getattr(usage, "cached_content_token_count", 0))
+        log.info("stage=%s model=%s chars=%d est_tokens=%d prompt_tokens=%s output_tokens=%s cached_tokens=%s "
+                 "hedged=%s ms=%.0f", stage, getattr(model, "model_name", "?"), len(prompt), estimate,
+                 s.attrs.get("prompt_tokens", "?"), s.attrs.get("output_tokens", "?"),
+                 s.attrs.get("cached_tokens", "?"), hedged, s.duration_ms)
+        return response
+
+    def _call(self, model, prompt, s, queue):
+        response = upstream("gemini").call(model.generate_content, prompt, span=s, queue=queue,
+                                           request_options={"timeout": request_timeout(GENERATE_TIMEOUT_S)})
+        return response, s
+
+    def _hedge_call(self, model, stage, prompt):
+        # The backup request shows up as its own span next to the primary's stage span
+        with span(f"gemini.{stage}.hedge") as h:
+            return self._call(model, prompt, h, False)
 
     def convert_to_natural_instructions(self, instructions):
         """
@@ -29,36 +170,70 @@ class Genai:
         and human-friendly voice instructions.
 
         Parameters:
-        instructions: list
-            List of navigation instructions. Each instruction is expected to be a dictionary
-            containing a 'text' key representing the instruction details, and optionally a
-            'distance' key for the corresponding distance in meters.
+        instructions: Route
+            The route whose instructions should be converted. Step distances are included
+            in the prompt when the route provides them.
 
         Returns:
         list
-            A list of natural voice-like navigation instructions. If an error occurs during
-            the instruction generation process, a single-element list containing an error
-            message is returned.
-        """
-        if "distance" in instructions:
-            instructions_text = "\n".join(
-                [f"{i + 1}. {step['text']} ({step['distance']}m)" for i, step in enumerate(instructions[:10])]
-            )
-        else:
-            instructions_text = "\n".join(
-                [f"{i + 1}. {step['text']})" for i, step in enumerate(instructions[:10])]
-            )
+            A heading followed by natural voice-like navigation instructions for the whole
+            route. Chunks the model could not rewrite are read from the route. If no chunk
+            could be rewritten, a single-element list containing an error message is returned.
+        """
+        lines = ["Directions"]
+        errors = []
+        for chunk, error in self._rewritten_chunks(instructions):
+            lines.extend(chunk)
+            if error is not None:
+                errors.append(error)
+        if errors and len(errors) == len(instruction_chunks(len(instructions))):
+            return [f"Unable to generate voice instructions: {str(errors[0])}"]
+        return lines
+
+    def stream_natural_instructions(self, route):
+        """
+        Rewrites all steps of a route into voice-like instructions and yields them chunk
+        by chunk, in route order, as soon as each chunk is ready.
+
+        Chunks are rewritten concurrently, each with the step before it as context. The
+        first chunk is short, so the first instruction can be spoken after one short
+        generation. A chunk that fails is read from the route instead, so the whole
+        route is always covered.
 
-        prompt = (
-            "Convert these technical navigation instructions to natural, voice-like navigation:\n"
-            f"{instructions_text}\n\nMake them sound like a friendly GPS voice. Keep each instruction concise."
-        )
+        Parameters:
+            route (Route): The route to convert.
 
+        Yields:
+            list: Instruction lines of the next chunk.
+        """
+        for chunk, _ in self._rewritten_chunks(route):
+            yield chunk
+
+    def _rewritten_chunks(self, route):
+        chunks = instruction_chunks(len(route))
+        if not chunks:
+            return
+        pool = ThreadPoolExecutor(max_workers=min(CHUNK_WORKERS, len(chunks)), thread_name_prefix="instructions")
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.split('\n')
-        except Exception as e:
-            return [f"Unable to generate voice instructions: {str(e)}"]
+            # Submitted in route order, so the first chunk starts first
+            futures = [pool.submit(contextvars.copy_context().run, self._rewrite_chunk, route, start, stop)
+                       for start, stop in chunks]
+            for (start, stop), future in zip(chunks, futures):
+                try:
+                    yield future.result(), None
+                except Exception as e:
+                    yield local_voice_steps(route, start, stop), e
+        finally:
+            # Stop chunks nobody is waiting for any more, e.g. when playback was stopped
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _rewrite_chunk(self, route, start, stop):
+        response = self._generate(prompts.natural_instructions(route, start, stop))
+        lines = [_LINE_PREFIX.sub("", line).strip() for line in response.text.split("\n")]
+        lines = [line for line in lines if line and not line.lower().startswith("ctx")]
+        if not lines:
+            raise ValueError("empty answer")
+        return lines
 
     def generate_route_summary(self, paths_data, origin, destination, vehicle):
         """
@@ -70,7 +245,7 @@ class Genai:
         origin, destination, and key instructions for navigation.
 
         Parameters:
-            paths_data (dict): Dictionary containing paths and instruction details.
+            paths_data (Route): The route to summarize.
             origin (str): The starting point of the route.
             destination (str): The endpoint of the route.
             vehicle (str): The type of vehicle for the route (e.g., car, bike).
@@ -79,18 +254,10 @@ class Genai:
             str: A generated textual summary of the route based on the provided
                  data.
         """
-        distance = paths_data["paths"][0]["distance"] / 1000
-        duration = paths_data["paths"][0]["time"] / (1000 * 60)
-
-        key_points = [step["text"] for step in paths_data["paths"][0]["instructions"][:5]]
-        prompt = (
-            f"Summarize a {vehicle} route from {origin} to {destination}. "
-            f"Distance: {distance:.1f}km, Duration: {duration:.0f} minutes. "
-            f"Key instructions: {', '.join(key_points[:3])}."
-        )
+        prompt = prompts.route_summary(paths_data, origin, destination, vehicle)
 
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt)
             return response.text
         except Exception as e:
             return f"❌ Error generating summary: {str(e)}"
@@ -109,9 +276,9 @@ class Genai:
             A JSON-formatted string containing extracted location information from the input text
             or an error message if parsing fails.
         """
-        prompt = f"Extract specific location information from: '{input_text}' and return it as a JSON object."
+        prompt = prompts.parse_input(input_text)
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt)
             return response.text
         except Exception as e:
             return f"❌ Error parsing input: {str(e)}"
@@ -132,11 +299,9 @@ class Genai:
             str: A comma-separated string listing three accommodations for the specified
             destination or an error message in case of an exception.
         """
-        prompt = (f"Can you recommend me any acomondation in '{destination}', no need for any specification! Just list me 3 "
-                  f"accomodations in '{destination}' without any context in English and in this format: Accomondation1, "
-                  f"Accomondation2, Accomondation3")
+        prompt = prompts.accommodations(destination)
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt)
             return response.text
         except Exception as e:
             return f"❌ Error parsing input: {str(e)}"
@@ -160,18 +325,12 @@ class Genai:
         Returns:
             tuple
                 A tuple containing:
-                - dict: Parsed JSON with route details and instructions.
+                - Route: The suggested route and its instructions.
                 - int: HTTP-like status code indicating success (200) or failure.
         """
-        example_json = json.dumps({"paths":[{"distance":195858.491,"weight":10526.955824,"time":7240491,"instructions":[{"distance":69.286,"heading":114.41,"sign":0,"interval":[0,1],"text":"Continue onto Singerstraße","time":15589,"street_name":"Singerstraße"},{"distance":70.162,"sign":2,"interval":[1,2],"text":"Turn right onto Liliengasse","time":15786,"street_name":"Liliengasse"}]}]})
-        prompt = (f"Please tell me instructions to get from '{start_location}' to '{end_location}' starting at "
-                  f"'{start_time}' only using Public Transportation! - please answer me in a proper json format having "
-                  f"this points: time, distance, starting "
-                  f"location, end location, paths! For distance just give me the number in meter and for time ms! Please in English! "
-                  f"It should look like this:"
-                  f"'{example_json}'")
+        prompt = prompts.public_transportation(start_location, end_location, start_time)
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt)
             cleaned = bytes(response.text, "utf-8").decode("unicode_escape")
             if cleaned.startswith('"') and cleaned.endswith('"'):
                 cleaned = cleaned[1:-1]
@@ -181,11 +340,12 @@ class Genai:
 
             parsed_json = json.loads(cleaned)
             paths_status = 200
-            return parsed_json, paths_status
+            return Route.from_response(parsed_json), paths_status
         except Exception as e:
             return f"❌ Error parsing input: {str(e)}"
 
-    def check_weather_conditions(self, departure, destination, travel_time, current_weather, forecast_weather):
+    def check_weather_conditions(self, departure, destination, travel_time, current_weather, forecast_weather,
+                                 hours=None):
         """
         Analyzes weather conditions for a trip by comparing current weather in the departure
         location and the forecasted weather at the destination and generates a summary.
@@ -197,10 +357,14 @@ class Genai:
                 The target location of the trip.
             travel_time: str
                 The estimated duration to reach the destination.
-            current_weather: str
-                The current weather at the departure location.
-            forecast_weather: str
-                The forecasted weather at the destination after the specified travel time.
+            current_weather: dict or str
+                The current weather at the departure location: hourly columns from
+                `OpenMeteo.get_hourly` (sent as a compact table) or formatted text.
+            forecast_weather: dict or str
+                The forecasted weather at the destination, in the same forms.
+            hours: int
+                Forecast hours to include when `forecast_weather` are hourly columns;
+                defaults to the travel time rounded up.
 
         Raises:
             Exception
@@ -210,17 +374,9 @@ class Genai:
             str
                 A summary and comparison of weather conditions, or an error message upon failure.
         """
-        # print(f"Current weather : {current_weather} \n Forecast weather :{forecast_weather}\n")  # debug
-        prompt = (
-            f"I'm planning a trip from {departure} to {destination}.\n"
-            f"Current weather in {departure} is {current_weather}.\n"
-            f"Forecast after the next {travel_time} in {destination} is {forecast_weather}.\n"
-            f"Are there any extreme weather conditions that might affect the trip?\n "
-            f"Do I need any preparation to accomadate these weather situations? \n"
-            f"Don't repeat my questions. Give me a summary and a comparison. Use emojis, don't use **"
-        )
+        prompt = prompts.weather(departure, destination, travel_time, current_weather, forecast_weather, hours)
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt)
             return response.text
         except Exception as e:
             return f"❌ Error: {str(e)}"
@@ -2,15 +2,30 @@ import urllib.parse
 import requests
 
 from . import interface
+from .cache import TTLCache
+from .deadline import BudgetExceeded, request_timeout
+from .resilience import RETRY_STATUSES, UpstreamUnavailable, upstream
+from .singleflight import SingleFlight
+from .trace import span
 from rich.console import Console
 # parameters for interface
 dark = interface.theme_manager.get("dark")
 console = Console(theme=dark)
 
+# How long a geocoding answer may be served while GraphHopper is unavailable
+FALLBACK_TTL = 7 * 24 * 3600
+# Answers younger than this are reused without asking GraphHopper again
+FRESH_TTL = 24 * 3600
+
+# Concurrent lookups of the same place share one request
+_flight = SingleFlight("graphhopper.geocode")
+
 
 class Geocoding:
     def __init__(self, graphhopper_api_key: str):
         self.ghr_api_key = graphhopper_api_key
+        self.upstream = upstream("graphhopper", graphhopper_api_key)
+        self.fallback = TTLCache(FALLBACK_TTL, maxsize=512)
 
     def geocoding(self, location):
         """
@@ -41,9 +56,25 @@ class Geocoding:
         url = geocode_url + urllib.parse.urlencode(
             {"q": location, "limit": "1", "key": self.ghr_api_key}
         )
-        replydata = requests.get(url)
+        with span("cache.geocode") as s:
+            cached = self.fallback.get(location.lower(), max_age=FRESH_TTL)
+            s.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+        return _flight.do(url, self._geocode, location, url)
+
+    def _geocode(self, location, url):
+        with span("graphhopper.geocode", query=location) as s:
+            try:
+                replydata = self.upstream.call(requests.get, url, timeout=request_timeout(), span=s)
+            except (UpstreamUnavailable, BudgetExceeded, requests.RequestException) as e:
+                s.set(status=503)
+                return self.from_fallback(location, e)
+            json_status = replydata.status_code
+            s.set(status=json_status, bytes=len(replydata.content))
+        if json_status in RETRY_STATUSES:
+            return self.from_fallback(location, f"GraphHopper answered {json_status}")
         json_data = replydata.json()
-        json_status = replydata.status_code
 
         if json_status == 200 and len(json_data["hits"]) != 0:
             lat = json_data["hits"][0]["point"]["lat"]
@@ -63,6 +94,7 @@ class Geocoding:
             console.print(
                 f"🌍 Location Type: {value}\n{url}", style = "answer"
             )
+            self.fallback.set(location.lower(), (json_status, lat, lng, new_loc))
         else:
             lat = "null"
             lng = "null"
@@ -71,3 +103,12 @@ class Geocoding:
                 console.print(f"❌ Error: {json_status}", style = "error")
                 console.print(f'❌ Geocode API status: {json_status} \nError message: {json_data["message"]}', style = "error")
         return json_status, lat, lng, new_loc
+
+    def from_fallback(self, location, reason):
+        """Serve the last known answer for a location while GraphHopper is unavailable"""
+        cached = self.fallback.get(location.lower(), stale=True)
+        if cached:
+            console.print(f"⚠️ {reason} - using the last known result for {location}", style = "error")
+            return cached
+        console.print(f"❌ {reason}", style = "error")
+        return 503, "null", "null", location
@@ -1,4 +1,17 @@
-def create_google_maps_link(origin_lat, origin_lng, dest_lat, dest_lng, vehicle):
+# Google Maps travel modes for our vehicle profiles
+TRAVEL_MODES = {
+    "car": "driving",
+    "bike": "bicycling",
+    "foot": "walking",
+    "transit": "transit",
+    "flight": "transit",
+}
+
+# Google Maps URLs accept at most 9 intermediate waypoints
+MAX_WAYPOINTS = 9
+
+
+def create_google_maps_link(origin_lat, origin_lng, dest_lat, dest_lng, vehicle, waypoints=None):
     """
     Creates a Google Maps URL for the given coordinates and transportation mode
 
@@ -8,6 +21,8 @@ def create_google_maps_link(origin_lat, origin_lng, dest_lat, dest_lng, vehicle)
     - dest_lat: Destination latitude
     - dest_lng: Destination longitude
     - vehicle: Transportation mode (car, bike, foot, flight)
+    - waypoints: Optional list of (lat, lng) tuples the route should pass through,
+      e.g. from `polyline.pick_waypoints`
 
     Returns:
     - Google Maps URL string
@@ -19,4 +34,13 @@ def create_google_maps_link(origin_lat, origin_lng, dest_lat, dest_lng, vehicle)
         f"&destination={dest_lat},{dest_lng}"
     )
 
+    if vehicle in TRAVEL_MODES:
+        maps_url += f"&travelmode={TRAVEL_MODES[vehicle]}"
+
+    # Google Maps ignores waypoints for transit directions
+    if waypoints and TRAVEL_MODES.get(vehicle) != "transit":
+        maps_url += "&waypoints=" + "%7C".join(
+            f"{lat:.5f},{lng:.5f}" for lat, lng in waypoints[:MAX_WAYPOINTS]
+        )
+
     return maps_url
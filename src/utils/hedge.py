@@ -0,0 +1,106 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Latency percentile after which a second (hedged) request is sent
+HEDGE_PERCENTILE = 0.9
+# Latencies remembered per key, and how many are needed before the percentile is trusted
+WINDOW = 50
+MIN_SAMPLES = 5
+DEFAULT_DELAY_S = 5.0      # hedge delay until enough latencies were seen
+MIN_DELAY_S = 0.5
+
+# Spend cap: every call earns `ratio` hedge credits and a hedge costs one, so at
+# most that share of calls is hedged; unused credit is capped at MAX_CREDIT
+HEDGE_RATIO = 0.1
+MAX_CREDIT = 2.0
+
+_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+class Hedge:
+    """
+    Hedged requests: when a call is slower than the given percentile of its
+    recent latencies, a second identical call is started and whichever
+    finishes first wins. The slower call is left to finish in the background
+    and its result is dropped.
+
+    Parameters:
+        name (str): Name of the hedged upstream.
+        percentile (float): Latency percentile (0-1) after which to hedge.
+        ratio (float): Largest share of calls that may be hedged; 0 disables hedging.
+    """
+    def __init__(self, name, percentile=HEDGE_PERCENTILE, ratio=HEDGE_RATIO):
+        self.name = name
+        self.percentile = percentile
+        self.ratio = ratio
+        self.credit = 1.0 if ratio > 0 else 0.0
+        self.latencies = {}
+        self._lock = threading.Lock()
+
+    def delay(self, key):
+        """Seconds to wait for the first call before hedging calls with this key"""
+        with self._lock:
+            samples = sorted(self.latencies.get(key, ()))
+        if len(samples) < MIN_SAMPLES:
+            return DEFAULT_DELAY_S
+        rank = min(len(samples) - 1, int(self.percentile * len(samples)))
+        return max(MIN_DELAY_S, samples[rank])
+
+    def observe(self, key, seconds):
+        with self._lock:
+            if key not in self.latencies:
+                self.latencies[key] = deque(maxlen=WINDOW)
+            self.latencies[key].append(seconds)
+
+    def _earn(self):
+        with self._lock:
+            self.credit = min(MAX_CREDIT, self.credit + self.ratio)
+
+    def _spend(self):
+        with self._lock:
+            if self.credit < 1:
+                return False
+            self.credit -= 1
+            return True
+
+    def run(self, key, primary, backup):
+        """
+        Call `primary()`, and `backup()` as well if `primary` is still running after
+        the hedge delay of `key` and the spend cap allows it.
+
+        Parameters:
+            key: Latency class of the call, e.g. the stage.
+            primary (callable): The call.
+            backup (callable): The hedged call; typically the same request but
+                failing fast instead of waiting for quota.
+
+        Returns:
+            tuple: (result, hedged, backup_won).
+
+        Raises:
+            The exception of `primary` when neither call succeeds.
+        """
+        self._earn()
+        start = time.monotonic()
+        first = _pool.submit(contextvars.copy_context().run, primary)
+
+        def finished(future):
+            if not future.cancelled() and future.exception() is None:
+                self.observe(key, time.monotonic() - start)
+
+        first.add_done_callback(finished)
+        done, _ = wait([first], timeout=self.delay(key))
+        if done or not self._spend():
+            return first.result(), False, False
+
+        second = _pool.submit(contextvars.copy_context().run, backup)
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), True, future is second
+        raise first.exception()
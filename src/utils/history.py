@@ -0,0 +1,170 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .route import Route
+
+HISTORY_PATH = os.path.join("history", "trips.db")
+
+# Profiles whose routes come from GraphHopper and can seed the routing cache
+ROUTED_PROFILES = ("car", "bike", "foot")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trips (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    origin_query TEXT NOT NULL,
+    destination_query TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    orig_lat REAL NOT NULL,
+    orig_lng REAL NOT NULL,
+    dest_lat REAL NOT NULL,
+    dest_lng REAL NOT NULL,
+    route TEXT NOT NULL,
+    summary TEXT,
+    instructions TEXT,
+    accommodations TEXT
+);
+CREATE INDEX IF NOT EXISTS trips_by_pair ON trips (origin, destination, profile, created_at);
+CREATE INDEX IF NOT EXISTS trips_by_time ON trips (created_at);
+"""
+
+COLUMNS = ("id", "created_at", "origin_query", "destination_query", "origin", "destination", "profile",
+           "orig_lat", "orig_lng", "dest_lat", "dest_lng", "route", "summary", "instructions", "accommodations")
+SELECT = f"SELECT {', '.join(COLUMNS)} FROM trips"
+
+
+class Trip:
+    """
+    One planned trip as stored in the history.
+
+    The route is kept as a GraphHopper-shaped JSON path and only parsed into a
+    `Route` when it is used.
+    """
+    __slots__ = ("id", "created_at", "origin_query", "destination_query", "origin", "destination", "profile",
+                 "orig_lat", "orig_lng", "dest_lat", "dest_lng", "route_json", "summary", "instructions",
+                 "accommodations", "_route")
+
+    def __init__(self, row):
+        (self.id, self.created_at, self.origin_query, self.destination_query, self.origin, self.destination,
+         self.profile, self.orig_lat, self.orig_lng, self.dest_lat, self.dest_lng, self.route_json,
+         self.summary, self.instructions, self.accommodations) = row
+        self._route = None
+
+    @property
+    def route(self):
+        if self._route is None:
+            self._route = Route.from_path(json.loads(self.route_json))
+        return self._route
+
+    @property
+    def natural_instructions(self):
+        return json.loads(self.instructions) if self.instructions else None
+
+    @property
+    def label(self):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.created_at))
+        return f"{self.origin} → {self.destination} ({self.profile}, {when})"
+
+
+class TripHistory:
+    """
+    Append-only SQLite log of planned trips.
+
+    Every finished trip is inserted once with its resolved coordinates, the
+    compact route and the AI outputs, so a recent trip can be replayed without
+    any geocoding, routing or LLM call. Rows are never updated; replaying a
+    trip appends a new row.
+
+    Parameters:
+        path (str): Database file, created on first use.
+    """
+    def __init__(self, path=HISTORY_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def record(self, origin_query, destination_query, origin, destination, profile,
+               orig_lat, orig_lng, dest_lat, dest_lng, route, summary=None, instructions=None, accommodations=None):
+        """
+        Append a finished trip.
+
+        Parameters:
+            origin_query, destination_query (str): What the user typed.
+            origin, destination (str): Resolved display names.
+            profile (str): Transport mode of the route.
+            orig_lat, orig_lng, dest_lat, dest_lng (float): Resolved coordinates.
+            route (Route): The planned route.
+            summary (str): AI route summary, if one was generated.
+            instructions (list): AI voice instructions, if generated.
+            accommodations (str): AI accommodation suggestions, if generated.
+
+        Returns:
+            int: Id of the new row.
+        """
+        row = (time.time(), origin_query, destination_query, origin, destination, profile,
+               float(orig_lat), float(orig_lng), float(dest_lat), float(dest_lng),
+               json.dumps(route.to_path(), separators=(",", ":")),
+               summary, json.dumps(instructions) if instructions else None, accommodations)
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                f"INSERT INTO trips ({', '.join(COLUMNS[1:])}) VALUES ({', '.join('?' * (len(COLUMNS) - 1))})", row)
+        return cursor.lastrowid
+
+    def recent(self, limit=5):
+        """Most recent trip per (origin, destination, profile), newest first"""
+        with self._lock:
+            rows = self._db.execute(
+                f"{SELECT} WHERE id IN (SELECT MAX(id) FROM trips GROUP BY origin, destination, profile) "
+                f"ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [Trip(row) for row in rows]
+
+    def latest(self, origin, destination, profile):
+        """Most recent trip between two resolved places with a given profile, or None"""
+        with self._lock:
+            row = self._db.execute(
+                f"{SELECT} WHERE origin = ? AND destination = ? AND profile = ? ORDER BY created_at DESC LIMIT 1",
+                (origin, destination, profile)).fetchone()
+        return Trip(row) if row else None
+
+    def since(self, timestamp):
+        """All trips recorded after `timestamp` (epoch seconds), oldest first"""
+        with self._lock:
+            rows = self._db.execute(f"{SELECT} WHERE created_at > ? ORDER BY created_at", (timestamp,)).fetchall()
+        return [Trip(row) for row in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM trips").fetchone()[0]
+
+    def warm(self, geo, router, limit=20):
+        """
+        Seed the geocoding and routing fallback caches from recent trips, so
+        they can be served even if GraphHopper is unavailable from the start.
+
+        Returns:
+            int: Number of trips used.
+        """
+        trips = self.recent(limit)
+        for trip in reversed(trips):
+            geo.fallback.set(trip.origin_query.lower(), (200, trip.orig_lat, trip.orig_lng, trip.origin),
+                             stored_at=trip.created_at)
+            geo.fallback.set(trip.destination_query.lower(), (200, trip.dest_lat, trip.dest_lng, trip.destination),
+                             stored_at=trip.created_at)
+            if trip.profile in ROUTED_PROFILES:
+                url = router.build_url(trip.orig_lat, trip.orig_lng, trip.dest_lat, trip.dest_lng, trip.profile)
+                body = json.dumps({"paths": [json.loads(trip.route_json)]}).encode("utf-8")
+                router.fallback.set(router.cache_key(url), body, stored_at=trip.created_at)
+        return len(trips)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
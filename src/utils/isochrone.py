@@ -0,0 +1,180 @@
+import json
+import math
+from array import array
+
+from .spatial import EARTH_RADIUS_KM, haversine_many
+from .tour import PROFILE_KMH, ROAD_FACTOR
+from .trace import span
+
+# Origins are snapped to about 100 m and time limits to 5 minute buckets, so
+# nearby queries for similar times share one cached polygon
+SNAP_DECIMALS = 3
+TIME_BUCKET_MIN = 5
+MAX_MINUTES = 60
+
+# Horizontal bands of the point-in-polygon index; a point is only tested
+# against the edges crossing its band
+BANDS = 64
+
+# Vertices of the circle used when the isochrone service is unavailable
+ESTIMATE_VERTICES = 48
+
+
+def snap(lat, lng, decimals=SNAP_DECIMALS):
+    """Round a coordinate so nearby origins share a cache entry"""
+    return round(float(lat), decimals), round(float(lng), decimals)
+
+
+def time_bucket(minutes, bucket=TIME_BUCKET_MIN, limit=MAX_MINUTES):
+    """Round a time limit to the nearest bucket, between one bucket and `limit` minutes"""
+    return int(min(limit, max(bucket, round(float(minutes) / bucket) * bucket)))
+
+
+class Isochrone:
+    """
+    Area reachable from an origin within a time limit, with a fast
+    point-in-polygon test.
+
+    All rings (outer rings and holes of every polygon) are split into edges
+    and the edges are sorted into horizontal bands over the bounding box. A
+    point outside the box is rejected right away; otherwise only the edges of
+    its band are tested, using the even-odd rule, so holes need no special case.
+
+    Attributes:
+        lat, lng: Snapped origin.
+        profile (str): GraphHopper profile.
+        minutes (int): Time limit.
+        estimated (bool): True when the area was estimated locally.
+        rings (list): (lats, lngs) arrays of each ring.
+    """
+    def __init__(self, lat, lng, profile, minutes, rings, estimated=False):
+        self.lat = lat
+        self.lng = lng
+        self.profile = profile
+        self.minutes = minutes
+        self.rings = rings
+        self.estimated = estimated
+        self._index()
+
+    @classmethod
+    def from_json(cls, data, lat, lng, profile, minutes):
+        """Reads the polygons of a GraphHopper isochrone response (bytes, str or dict)"""
+        if isinstance(data, (bytes, str)):
+            data = json.loads(data)
+        rings = []
+        for feature in data.get("polygons", ()):
+            geometry = feature.get("geometry") or {}
+            if geometry.get("type") == "Polygon":
+                polygons = [geometry["coordinates"]]
+            elif geometry.get("type") == "MultiPolygon":
+                polygons = geometry["coordinates"]
+            else:
+                continue
+            for polygon in polygons:
+                for ring in polygon:
+                    if len(ring) >= 3:
+                        rings.append((array("d", (p[1] for p in ring)), array("d", (p[0] for p in ring))))
+        return cls(lat, lng, profile, minutes, rings)
+
+    @classmethod
+    def estimate(cls, lat, lng, profile, minutes, vertices=ESTIMATE_VERTICES):
+        """Circle of the distance the profile covers in `minutes`, for when the service is unavailable"""
+        kmh = PROFILE_KMH.get(profile, PROFILE_KMH["car"])
+        radius = math.degrees(kmh * minutes / 60 / ROAD_FACTOR / EARTH_RADIUS_KM)
+        scale = 1 / max(0.01, math.cos(math.radians(lat)))
+        angles = [2 * math.pi * i / vertices for i in range(vertices)]
+        ring = (array("d", (lat + radius * math.sin(a) for a in angles)),
+                array("d", (lng + radius * scale * math.cos(a) for a in angles)))
+        return cls(lat, lng, profile, minutes, [ring], estimated=True)
+
+    def _index(self):
+        lats = [lat for ring_lats, _ in self.rings for lat in ring_lats]
+        lngs = [lng for _, ring_lngs in self.rings for lng in ring_lngs]
+        if not lats:
+            self.bbox = None
+            self._bands = []
+            return
+        self.bbox = (min(lats), min(lngs), max(lats), max(lngs))
+        self._band_height = (self.bbox[2] - self.bbox[0]) / BANDS or 1.0
+
+        # Each edge is (lat1, lng1, lat2, lng2), filed under every band it spans
+        self._bands = [[] for _ in range(BANDS)]
+        for ring_lats, ring_lngs in self.rings:
+            n = len(ring_lats)
+            for i in range(n):
+                j = i - 1
+                y1, x1, y2, x2 = ring_lats[j], ring_lngs[j], ring_lats[i], ring_lngs[i]
+                if y1 == y2:
+                    continue  # horizontal edges never cross a ray along the latitude
+                edge = (y1, x1, y2, x2)
+                for band in range(self._band(min(y1, y2)), self._band(max(y1, y2)) + 1):
+                    self._bands[band].append(edge)
+
+    def _band(self, lat):
+        return min(BANDS - 1, max(0, int((lat - self.bbox[0]) / self._band_height)))
+
+    def __len__(self):
+        return sum(len(lats) for lats, _ in self.rings)
+
+    def contains(self, lat, lng):
+        """True when the coordinate lies inside the reachable area"""
+        box = self.bbox
+        if box is None or not (box[0] <= lat <= box[2] and box[1] <= lng <= box[3]):
+            return False
+        inside = False
+        for y1, x1, y2, x2 in self._bands[self._band(lat)]:
+            if (y1 > lat) != (y2 > lat) and lng < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+        return inside
+
+    def contains_many(self, lats, lngs):
+        """
+        Batch point-in-polygon test.
+
+        Parameters:
+            lats, lngs (sequence): Candidate coordinates.
+
+        Returns:
+            list: Indices of the candidates inside the reachable area.
+        """
+        with span("isochrone.contains", candidates=len(lats)) as s:
+            contains = self.contains
+            inside = [i for i in range(len(lats)) if contains(lats[i], lngs[i])]
+            s.set(inside=len(inside))
+        return inside
+
+    def reachable(self, places):
+        """
+        Places inside the reachable area, closest first.
+
+        Parameters:
+            places (list): (name, lat, lng) tuples.
+
+        Returns:
+            list: (distance_km, name, lat, lng) tuples.
+        """
+        lats = [lat for _, lat, _ in places]
+        lngs = [lng for _, _, lng in places]
+        inside = self.contains_many(lats, lngs)
+        distances = haversine_many(self.lat, self.lng, [lats[i] for i in inside], [lngs[i] for i in inside])
+        return sorted((km, *places[i]) for km, i in zip(distances, inside))
+
+
+def reachable_area(router, lat, lng, profile, minutes):
+    """
+    The area reachable within `minutes`, from the isochrone service or, when it
+    is unavailable, estimated locally as a circle (see `Isochrone.estimate`).
+
+    Parameters:
+        router (Routing): Routing client.
+        lat, lng: Origin coordinates.
+        profile (str): GraphHopper profile.
+        minutes (float): Time limit.
+
+    Returns:
+        Isochrone: The reachable area; `estimated` tells where it came from.
+    """
+    status, area = router.isochrone(lat, lng, profile, minutes)
+    if status == 200 and area.bbox is not None:
+        return area
+    return Isochrone.estimate(*snap(lat, lng), profile, time_bucket(minutes))
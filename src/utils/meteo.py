@@ -3,9 +3,42 @@ from rich.panel import Panel
 from rich import box
 from rich.console import Console
 from utils.interface import dark
+from utils.cache import TTLCache
+from utils.compare import current_hour_index
+from utils.deadline import BudgetExceeded, request_timeout
+from utils.resilience import UpstreamUnavailable, upstream
+from utils.singleflight import SingleFlight
+from utils.trace import span
 
 console = Console(theme=dark)
 
+# How long a forecast may be served while Open-Meteo is unavailable
+FALLBACK_TTL = 6 * 3600
+
+# Weather code mapping with emojis
+WEATHER_CODES = {
+    0: "☀️ clear sky",
+    1: "🌤️ mainly clear",
+    2: "⛅ partly cloudy",
+    3: "☁️ overcast",
+    45: "🌫️ fog",
+    48: "❄️ depositing rime fog",
+    51: "🌦️ light drizzle",
+    61: "🌧️ light rain",
+    71: "❄️ light snow",
+    95: "⛈️ thunderstorm",
+    96: "🌩️ thunderstorm w/ hail"
+}
+
+# Forecasts younger than this are reused without a request (Open-Meteo updates hourly)
+FRESH_TTL = 30 * 60
+
+# Concurrent forecasts for the same place share one request
+_flight = SingleFlight("open_meteo.forecast")
+
+# Shared by every OpenMeteo instance, so forecasts outlive the client of one trip
+_forecasts = TTLCache(FALLBACK_TTL, maxsize=128)
+
 class OpenMeteo:
     """
     Provides functionality to interact with the Open-Meteo weather API.
@@ -13,21 +46,56 @@ class OpenMeteo:
 
     def __init__(self):
         self.base_url = "https://api.open-meteo.com/v1/forecast"
+        self.upstream = upstream("open_meteo")
+        self.fallback = _forecasts
 
-    def get_weather(self, lat, lng, hours=12):
+    def get_hourly(self, lat, lng):
+        """
+        Fetches the raw hourly forecast columns (time, temperature_2m, weathercode,
+        wind_speed_10m) for a coordinate.
+        """
         url = (
-            f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lng}"
+            f"{self.base_url}?latitude={lat}&longitude={lng}"
             f"&hourly=temperature_2m,weathercode,wind_speed_10m&timezone=auto"
         )
-        response = requests.get(url)
-        data = response.json()
+        key = (round(float(lat), 2), round(float(lng), 2))
+        with span("cache.forecast") as s:
+            cached = self.fallback.get(key, max_age=FRESH_TTL)
+            s.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+        return _flight.do(url, self._fetch_hourly, url, key)
+
+    def _fetch_hourly(self, url, key):
+        with span("open_meteo.forecast") as s:
+            try:
+                response = self.upstream.call(requests.get, url, timeout=request_timeout(), span=s)
+            except (UpstreamUnavailable, BudgetExceeded, requests.RequestException):
+                s.set(status=503)
+                return self.fallback.get(key, {}, stale=True)
+            s.set(status=response.status_code, bytes=len(response.content))
+        if response.status_code != 200:
+            return self.fallback.get(key, {}, stale=True)
+        hourly = response.json().get("hourly", {})
+        self.fallback.set(key, hourly)
+        return hourly
+
+    def get_weather(self, lat, lng, hours=12, hourly=None, start=None):
+        """
+        Formats `hours` forecast hours as one line per hour, from the current hour
+        or from index `start`. Pass `hourly` from `get_hourly` to format an
+        already fetched forecast.
+        """
+        if hourly is None:
+            hourly = self.get_hourly(lat, lng)
         if (hours > 168):
             console.print(Panel("⚠️ The travel duration exceeds the available forecast range.\n Weather conditions will be shown for up to the next 168 hours only.",
                                 border_style="error",
                                 box=box.ROUNDED))
 
-        hourly = data.get("hourly", {})
-        available_hours = len(hourly.get("time", []))
+        if start is None:
+            start = current_hour_index(hourly.get("time", []))
+        available_hours = len(hourly.get("time", [])) - start
 
         hours = min(hours, available_hours)  # cap to prevent out-of-range
 
@@ -36,7 +104,7 @@ class OpenMeteo:
                 f"{hourly['time'][i]}: {hourly['temperature_2m'][i]}°C, "
                 f"{self.decode_weather(hourly['weathercode'][i])}, "
                 f"wind {hourly['wind_speed_10m'][i]} km/h"
-                for i in range(hours)
+                for i in range(start, start + hours)
             ]
             return "\n".join(forecast)
         except Exception as e:
@@ -45,18 +113,4 @@ class OpenMeteo:
                                 box=box.ROUNDED))
 
     def decode_weather(self, code):
-        # Weather code mapping with emojis
-        weather_map = {
-            0: "☀️ clear sky",
-            1: "🌤️ mainly clear",
-            2: "⛅ partly cloudy",
-            3: "☁️ overcast",
-            45: "🌫️ fog",
-            48: "❄️ depositing rime fog",
-            51: "🌦️ light drizzle",
-            61: "🌧️ light rain",
-            71: "❄️ light snow",
-            95: "⛈️ thunderstorm",
-            96: "🌩️ thunderstorm w/ hail"
-        }
-        return weather_map.get(code, "unknown")
+        return WEATHER_CODES.get(code, "unknown")
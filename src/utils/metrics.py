@@ -0,0 +1,292 @@
+import os
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Span name prefixes of outbound calls, mapped to the upstream label
+UPSTREAMS = {
+    "graphhopper.geocode": "graphhopper_geocode",
+    "graphhopper.route": "graphhopper_route",
+    "graphhopper.matrix": "graphhopper_matrix",
+    "graphhopper.isochrone": "graphhopper_isochrone",
+    "open_meteo.": "open_meteo",
+    "gemini.": "gemini",
+    "calendar.insert": "calendar",
+    "calendar.batch": "calendar",
+    "tts.synthesize": "gtts",
+}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. requests or errors"""
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, e.g. cache size or hit ratio"""
+    kind = "gauge"
+
+    def set(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, e.g. request latency"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, *labels):
+        counts, _ = self._values.get(self._key(labels), ([], 0.0))
+        return sum(counts)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        samples = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+                samples.append((f"{self.name}_bucket", labels, cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class Registry:
+    """
+    Holds the metrics of the process and renders them in Prometheus text format.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    def write(self, path):
+        """Dump the metrics to a file, e.g. for the node_exporter textfile collector"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            fp.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Serve the metrics on http://host:port/metrics from a background thread.
+
+        Returns:
+            ThreadingHTTPServer: The running server (call shutdown() to stop it).
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # keep the interactive console clean
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# Process-wide registry and the metrics the app records
+registry = Registry()
+
+upstream_requests = registry.counter(
+    "travelguide_upstream_requests_total", "Requests sent to upstream services.", ("upstream", "status"))
+upstream_latency = registry.histogram(
+    "travelguide_upstream_request_seconds", "Latency of upstream requests in seconds.", ("upstream",))
+upstream_errors = registry.counter(
+    "travelguide_upstream_errors_total", "Failed upstream requests (exceptions or HTTP status >= 400).", ("upstream",))
+upstream_retries = registry.counter(
+    "travelguide_upstream_retries_total", "Retried upstream requests.", ("upstream",))
+upstream_throttled = registry.counter(
+    "travelguide_upstream_throttled_seconds_total", "Time spent waiting for the client-side rate limiter.", ("upstream",))
+cache_requests = registry.counter(
+    "travelguide_cache_requests_total", "Cache lookups by cache and result (hit or miss).", ("cache", "result"))
+cache_hit_ratio = registry.gauge(
+    "travelguide_cache_hit_ratio", "Share of cache lookups that were hits.", ("cache",))
+llm_tokens = registry.counter(
+    "travelguide_llm_tokens_total", "LLM tokens used by stage and kind (prompt, output or cached prompt prefix).", ("stage", "kind"))
+llm_hedges = registry.counter(
+    "travelguide_llm_hedged_requests_total", "LLM calls that sent a hedged second request, by winner.",
+    ("stage", "winner"))
+singleflight_shared = registry.counter(
+    "travelguide_singleflight_shared_total", "Calls served by an identical request already in flight.", ("group",))
+stage_latency = registry.histogram(
+    "travelguide_stage_seconds", "Duration of local pipeline stages in seconds.", ("stage",))
+
+
+def upstream_for(span_name):
+    """Return the upstream label for an outbound-call span name, or None for local stages"""
+    for prefix, upstream in UPSTREAMS.items():
+        if span_name.startswith(prefix):
+            return upstream
+    return None
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup and update that cache's hit ratio"""
+    cache_requests.inc(cache, "hit" if hit else "miss")
+    hits = cache_requests.value(cache, "hit")
+    total = hits + cache_requests.value(cache, "miss")
+    cache_hit_ratio.set(cache, value=hits / total)
+
+
+def record_span(span):
+    """
+    Tracer listener that turns finished spans into running metrics.
+
+    Outbound-call spans feed the per-upstream request, latency and error
+    metrics; other spans feed the stage latency histogram. `cache_hit`,
+    `prompt_tokens`, `output_tokens` and `hedged` attributes are counted as well.
+    """
+    seconds = span.duration_ms / 1000
+    attrs = span.attrs
+    upstream = upstream_for(span.name)
+
+    if span.name == "singleflight.wait":
+        singleflight_shared.inc(attrs.get("group", ""))
+    elif upstream:
+        status = attrs.get("status", "error" if span.error else "ok")
+        upstream_requests.inc(upstream, status)
+        upstream_latency.observe(upstream, value=seconds)
+        if span.error or (isinstance(status, int) and status >= 400):
+            upstream_errors.inc(upstream)
+    else:
+        stage_latency.observe(span.name, value=seconds)
+
+    if "cache_hit" in attrs:
+        record_cache(span.name, attrs["cache_hit"])
+    if attrs.get("retries"):
+        upstream_retries.inc(upstream or span.name, amount=attrs["retries"])
+    if attrs.get("throttled_ms"):
+        upstream_throttled.inc(upstream or span.name, amount=attrs["throttled_ms"] / 1000)
+    if "prompt_tokens" in attrs:
+        stage = span.name.split(".", 1)[-1]
+        llm_tokens.inc(stage, "prompt", amount=attrs["prompt_tokens"] or 0)
+        llm_tokens.inc(stage, "output", amount=attrs.get("output_tokens") or 0)
+        if attrs.get("cached_tokens"):
+            llm_tokens.inc(stage, "cached", amount=attrs["cached_tokens"])
+    if attrs.get("hedged"):
+        llm_hedges.inc(span.name.split(".", 1)[-1], "hedge" if attrs.get("hedge_won") else "primary")
@@ -0,0 +1,201 @@
+import math
+from array import array
+
+# Meters per degree of latitude, used for the local planar projection.
+METERS_PER_DEGREE = 111320.0
+
+# Squared distances this close (relative) count as a tie in `simplify`
+TIE_EPSILON = 1e-9
+# Longest input `simplify` works on in one piece
+SIMPLIFY_WINDOW = 4096
+
+
+def decode(encoded, precision=1e5, elevation=False):
+    """
+    Decodes a GraphHopper/Google encoded polyline into coordinate columns.
+
+    The string is walked once as raw bytes and the values are written straight
+    into typed `array` columns, so decoding a few hundred thousand points does
+    not build a list of per-point tuples.
+
+    Parameters:
+        encoded (str): The encoded polyline.
+        precision (float): Coordinate multiplier (GraphHopper uses 1e5).
+        elevation (bool): Whether every point carries a third (elevation) value,
+            as returned when the route is requested with `elevation=true`.
+
+    Returns:
+        tuple: (lats, lngs) arrays of floats, or (lats, lngs, eles) when
+        `elevation` is set.
+    """
+    data = encoded.encode("ascii")
+    n = len(data)
+    dims = 3 if elevation else 2
+    columns = [array("d") for _ in range(dims)]
+    appends = [column.append for column in columns]
+    values = [0] * dims
+    scales = [precision, precision, 100.0][:dims]
+    index = 0
+
+    while index < n:
+        for dim in range(dims):
+            result = 0
+            shift = 0
+            while True:
+                b = data[index] - 63
+                index += 1
+                result |= (b & 0x1F) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            values[dim] += ~(result >> 1) if result & 1 else result >> 1
+            appends[dim](values[dim] / scales[dim])
+
+    return tuple(columns)
+
+
+def encode(lats, lngs, precision=1e5):
+    """
+    Encodes coordinate columns into a polyline string (the inverse of `decode`).
+
+    Parameters:
+        lats (sequence): Latitudes.
+        lngs (sequence): Longitudes.
+        precision (float): Coordinate multiplier.
+
+    Returns:
+        str: The encoded polyline.
+    """
+    out = []
+    prev_lat = 0
+    prev_lng = 0
+    for lat, lng in zip(lats, lngs):
+        ilat = int(round(lat * precision))
+        ilng = int(round(lng * precision))
+        for delta in (ilat - prev_lat, ilng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat = ilat
+        prev_lng = ilng
+    return "".join(out)
+
+
+def simplify(lats, lngs, tolerance=10.0, window=SIMPLIFY_WINDOW):
+    """
+    Simplifies a polyline with the Douglas-Peucker algorithm.
+
+    Points are projected onto a local equirectangular plane so `tolerance` is
+    expressed in meters. The recursion is replaced by an explicit stack, so
+    very long routes cannot hit the interpreter's recursion limit.
+
+    Among (nearly) equally distant points the one closest to the middle of the
+    span is kept, so repetitive geometry is still split in halves. Inputs longer
+    than `window` points are simplified in windows that share their end
+    points, which bounds the work on any input.
+
+    Parameters:
+        lats (sequence): Latitudes.
+        lngs (sequence): Longitudes.
+        tolerance (float): Maximum allowed deviation in meters.
+        window (int): Points per independently simplified window.
+
+    Returns:
+        array: Indices ('l') of the points to keep, in ascending order.
+    """
+    n = len(lats)
+    if n < 3:
+        return array("l", range(n))
+    if n > window:
+        keep = array("l")
+        for first in range(0, n - 1, window - 1):
+            last = min(n, first + window)
+            part = _simplify(lats[first:last], lngs[first:last], tolerance)
+            keep.extend(first + i for i in part[1 if first else 0:])
+        return keep
+    return _simplify(lats, lngs, tolerance)
+
+
+def _simplify(lats, lngs, tolerance):
+    n = len(lats)
+    if n < 3:
+        return array("l", range(n))
+
+    lat0 = math.radians((lats[0] + lats[n - 1]) / 2)
+    kx = METERS_PER_DEGREE * math.cos(lat0)
+    ky = METERS_PER_DEGREE
+    xs = array("d", (lng * kx for lng in lngs))
+    ys = array("d", (lat * ky for lat in lats))
+
+    keep = bytearray(n)
+    keep[0] = 1
+    keep[n - 1] = 1
+    tol2 = tolerance * tolerance
+    stack = [(0, n - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        ax = xs[first]
+        ay = ys[first]
+        dx = xs[last] - ax
+        dy = ys[last] - ay
+        seg2 = dx * dx + dy * dy
+
+        max_d2 = -1.0
+        max_i = first
+        mid = (first + last) // 2
+        for i in range(first + 1, last):
+            px = xs[i] - ax
+            py = ys[i] - ay
+            if seg2 == 0.0:
+                d2 = px * px + py * py
+            else:
+                t = (px * dx + py * dy) / seg2
+                if t < 0.0:
+                    t = 0.0
+                elif t > 1.0:
+                    t = 1.0
+                ex = px - t * dx
+                ey = py - t * dy
+                d2 = ex * ex + ey * ey
+            if d2 > max_d2 * (1 + TIE_EPSILON):
+                max_i = i
+            elif d2 >= max_d2 * (1 - TIE_EPSILON) and abs(i - mid) < abs(max_i - mid):
+                max_i = i  # a tie: prefer the point nearer the middle, so the span splits evenly
+            if d2 > max_d2:
+                max_d2 = d2
+
+        if max_d2 > tol2:
+            keep[max_i] = 1
+            stack.append((first, max_i))
+            stack.append((max_i, last))
+
+    return array("l", (i for i in range(n) if keep[i]))
+
+
+def pick_waypoints(lats, lngs, max_points=9, tolerance=50.0):
+    """
+    Chooses a handful of intermediate points that best describe the route shape.
+
+    The geometry is simplified first and, if more interior points remain than
+    `max_points`, they are thinned evenly so the result fits in a maps link.
+
+    Parameters:
+        lats (sequence): Latitudes.
+        lngs (sequence): Longitudes.
+        max_points (int): Maximum number of waypoints to return.
+        tolerance (float): Douglas-Peucker tolerance in meters.
+
+    Returns:
+        list: (lat, lng) tuples, excluding the start and end point.
+    """
+    kept = simplify(lats, lngs, tolerance)
+    interior = kept[1:-1]
+    if len(interior) > max_points:
+        step = len(interior) / max_points
+        interior = [interior[int(step * k + step / 2)] for k in range(max_points)]
+    return [(lats[i], lngs[i]) for i in interior]
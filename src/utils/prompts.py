@@ -0,0 +1,208 @@
+import math
+
+from .compare import current_hour_index
+from .meteo import WEATHER_CODES
+
+# Static instruction blocks. Every prompt starts with the block of its stage,
+# byte for byte, and only the data after it changes, so repeated calls share a
+# prefix the model side can cache.
+ROUTE_SUMMARY_PREFIX = (
+    "You summarize a planned trip for a traveller in a few friendly sentences. "
+    "Data follows as key: value lines."
+)
+WEATHER_PREFIX = (
+    "You check the weather for a trip. Are there extreme conditions that might affect it, and what "
+    "preparation is needed? Don't repeat the question. Give a summary and a comparison of departure "
+    "and destination. Use emojis, don't use **.\n"
+    "Forecasts are tables: time (MM-DD HH, local) | °C | weather code | wind km/h. "
+    "A time range covers hours with the same values; min-max is given for merged blocks."
+)
+INSTRUCTIONS_PREFIX = (
+    "Convert technical navigation instructions to natural, voice-like navigation. Sound like a friendly GPS "
+    "voice, keep each instruction concise. Answer with exactly one line per step, in order, without heading or "
+    "numbering. Input lines are: step | instruction | meters. Lines starting with ctx are the steps just "
+    "before, given for continuity only: don't output them."
+)
+PARSE_INPUT_PREFIX = "Extract specific location information from the text below and return it as a JSON object."
+ACCOMMODATIONS_PREFIX = (
+    "Recommend 3 accommodations in the destination below. No specification or context, English only, "
+    "in this format: Accommodation1, Accommodation2, Accommodation3"
+)
+TRANSIT_PREFIX = (
+    "Give instructions for the trip below using public transportation only, in English. Answer with JSON only "
+    "in GraphHopper's route format: "
+    '{"paths":[{"distance":meters,"time":ms,"instructions":[{"text":str,"street_name":str,"distance":meters,'
+    '"time":ms,"sign":int,"interval":[first,last]}]}]}'
+)
+
+# Largest number of table rows per forecast; longer forecasts are merged into blocks
+MAX_WEATHER_ROWS = 24
+# Route steps included in prompts
+MAX_ROUTE_STEPS = 10
+# Earlier steps sent along with an instruction chunk for continuity
+CONTEXT_STEPS = 1
+
+
+class Prompt:
+    """
+    A prompt split into its static, cacheable prefix and the per-call data.
+
+    Attributes:
+        stage (str): Genai stage the prompt is for.
+        prefix (str): Static instructions shared by every call of the stage.
+        body (str): Data of this call.
+    """
+    __slots__ = ("stage", "prefix", "body")
+
+    def __init__(self, stage, prefix, body):
+        self.stage = stage
+        self.prefix = prefix
+        self.body = body
+
+    @property
+    def text(self):
+        return f"{self.prefix}\n\n{self.body}"
+
+    def __str__(self):
+        return self.text
+
+    def __len__(self):
+        return len(self.prefix) + 2 + len(self.body)
+
+    @property
+    def tokens(self):
+        return estimate_tokens(self.text)
+
+
+def estimate_tokens(text):
+    """
+    Token count estimate without a round trip to the model: about four
+    characters per token for ASCII text and one per character otherwise
+    (emojis, Hangul and other scripts).
+    """
+    ascii_chars = sum(1 for c in text if c < "\x80")
+    return math.ceil(ascii_chars / 4) + len(text) - ascii_chars
+
+
+def weather_table(hourly, hours, start=0, max_rows=MAX_WEATHER_ROWS):
+    """
+    Encodes Open-Meteo hourly columns as a compact table.
+
+    Consecutive hours with identical rounded values share one row, and
+    forecasts longer than `max_rows` hours are merged into equal blocks
+    (min-max temperature, worst weather code, strongest wind). Weather codes
+    are explained once in a legend instead of on every row.
+
+    Parameters:
+        hourly (dict): Columns from `OpenMeteo.get_hourly`.
+        hours (int): Number of hours to include.
+        start (int): First hour index.
+        max_rows (int): Largest number of blocks before merging identical rows.
+
+    Returns:
+        str: The table, or "unavailable" without forecast data.
+    """
+    times = hourly.get("time") or []
+    end = min(len(times), start + max(1, hours))
+    if start >= end:
+        return "unavailable"
+    temps = hourly.get("temperature_2m") or []
+    codes = hourly.get("weathercode") or []
+    winds = hourly.get("wind_speed_10m") or []
+
+    def column(values, i):
+        return values[i] if i < len(values) and values[i] is not None else 0
+
+    size = math.ceil((end - start) / max_rows)
+    rows = []
+    for first in range(start, end, size):
+        block = range(first, min(end, first + size))
+        low = round(min(column(temps, i) for i in block))
+        high = round(max(column(temps, i) for i in block))
+        values = (f"{low}" if low == high else f"{low}-{high}",
+                  max(column(codes, i) for i in block),
+                  round(max(column(winds, i) for i in block)))
+        label = times[block[-1]]
+        if rows and rows[-1][2] == values:
+            rows[-1][1] = label
+        else:
+            rows.append([times[first], label, values])
+
+    lines = []
+    for first_time, last_time, (temp, code, wind) in rows:
+        first, last = _short_time(first_time), _short_time(last_time)
+        if first == last:
+            when = first
+        else:
+            # Only repeat the date when the range crosses midnight
+            when = f"{first}-{last[-2:]}" if first[:5] == last[:5] else f"{first}-{last}"
+        lines.append(f"{when}|{temp}|{code}|{wind}")
+
+    used = sorted({code for _, _, (_, code, _) in rows})
+    legend = ", ".join(f"{code}={_plain(WEATHER_CODES.get(code, 'unknown'))}" for code in used)
+    return "\n".join(lines) + f"\ncodes: {legend}"
+
+
+def _short_time(iso):
+    # "2024-05-01T08:00" -> "05-01 08"
+    return iso[5:13].replace("T", " ")
+
+
+def _plain(label):
+    # Drop the leading emoji of a weather label
+    return label.split(" ", 1)[-1]
+
+
+def route_steps(route, start=0, stop=MAX_ROUTE_STEPS):
+    """Encodes steps `start` to `stop` of a route as "step | instruction | meters" lines"""
+    return "\n".join(
+        f"{i}|{text}|{distance:.0f}" if distance else f"{i}|{text}|"
+        for i, (text, distance) in enumerate(zip(route.texts[start:stop], route.distances[start:stop]), start + 1)
+    )
+
+
+def route_summary(route, origin, destination, vehicle):
+    return Prompt("route_summary", ROUTE_SUMMARY_PREFIX, (
+        f"mode: {vehicle}\nfrom: {origin}\nto: {destination}\n"
+        f"distance_km: {route.distance / 1000:.1f}\nduration_min: {route.time / 60000:.0f}\n"
+        f"key_steps: {'; '.join(route.texts[:3])}"
+    ))
+
+
+def natural_instructions(route, start=0, stop=MAX_ROUTE_STEPS, context=CONTEXT_STEPS):
+    """Voice instruction prompt for steps `start` to `stop`, with up to `context` earlier steps as ctx lines"""
+    first = max(0, start - context)
+    lines = [f"ctx|{line}" for line in route_steps(route, first, start).splitlines()]
+    lines.append(route_steps(route, start, stop))
+    return Prompt("natural_instructions", INSTRUCTIONS_PREFIX, "\n".join(lines))
+
+
+def parse_input(text):
+    return Prompt("parse_input", PARSE_INPUT_PREFIX, f"text: {text}")
+
+
+def accommodations(destination):
+    return Prompt("accommodations", ACCOMMODATIONS_PREFIX, f"destination: {destination}")
+
+
+def public_transportation(start_location, end_location, start_time):
+    return Prompt("public_transportation", TRANSIT_PREFIX,
+                  f"from: {start_location}\nto: {end_location}\ndeparture: {start_time}")
+
+
+def weather(departure, destination, travel_time, current, forecast, hours=None):
+    """
+    Weather check prompt. `current` and `forecast` are raw hourly columns
+    (encoded with `weather_table` from the current hour on) or already
+    formatted text, which is used as is.
+    """
+    if isinstance(current, dict):
+        current = weather_table(current, 1, start=current_hour_index(current.get("time") or []))
+    if isinstance(forecast, dict):
+        forecast = weather_table(forecast, hours or math.ceil(float(travel_time) or 1),
+                                 start=current_hour_index(forecast.get("time") or []))
+    return Prompt("weather", WEATHER_PREFIX, (
+        f"from: {departure}\nto: {destination}\ntravel_hours: {travel_time}\n"
+        f"departure now:\n{current}\n"
+        f"destination forecast:\n{forecast}"
+    ))
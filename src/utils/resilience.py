@@ -0,0 +1,322 @@
+import datetime
+import email.utils
+import os
+import threading
+import time
+
+from . import deadline as trip_deadline
+
+# Requests per minute and burst size per upstream. The defaults sit just under the
+# free-tier quotas and can be overridden with e.g. GRAPHHOPPER_RATE_PER_MIN=120.
+UPSTREAM_LIMITS = {
+    "graphhopper": (60, 5),
+    "gemini": (15, 3),
+    "open_meteo": (500, 10),
+}
+
+# Status codes that mean "try again later" rather than "this request is wrong"
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+
+MAX_RETRIES = 2
+BACKOFF_S = 1.0             # first retry delay when no Retry-After is given
+MAX_WAIT_S = 20.0           # give up instead of blocking the user for longer
+FAILURE_THRESHOLD = 5       # consecutive failures that open the circuit
+RESET_TIMEOUT_S = 30.0      # how long an open circuit fails fast
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Raised instead of calling an upstream whose circuit is open or whose quota
+    is exhausted for longer than the caller is willing to wait.
+
+    Attributes:
+        upstream (str): Upstream name, e.g. "graphhopper".
+        retry_in (float): Seconds until the upstream may be tried again.
+    """
+    def __init__(self, upstream, retry_in):
+        self.upstream = upstream
+        self.retry_in = retry_in
+        super().__init__(f"{upstream} is unavailable, try again in {retry_in:.0f} s")
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate_per_min`, allowing bursts of up to `burst` calls.
+
+    `pause(seconds)` empties the bucket until the given time has passed, which
+    is how a Retry-After header slows down every caller of the same upstream.
+    """
+    def __init__(self, rate_per_min, burst=1):
+        self.rate = rate_per_min / 60.0
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now < self.paused_until:
+            self.updated = now
+            return
+        start = max(self.updated, self.paused_until)
+        self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take a token and return how many seconds the caller has to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = max(0.0, self.paused_until - now)
+            if self.tokens < 0:
+                wait += -self.tokens / self.rate
+            return wait
+
+    def release(self):
+        """Give back a token reserved by a caller that decided not to wait"""
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = min(self.tokens, 0.0)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and fails fast for
+    `reset_timeout` seconds; afterwards a single trial call decides whether it
+    closes again (success) or stays open for another period (failure).
+    """
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT_S):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def admit(self):
+        """
+        Ask to make a call.
+
+        Returns:
+            tuple: (seconds until a call is let through, 0 when it is now; True when
+            the call is the half-open trial and must end with `record_success`,
+            `record_failure` or `release_trial`).
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0, False
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                return remaining, False
+            if self.trial_running:
+                return self.reset_timeout, False
+            self.trial_running = True
+            return 0.0, True
+
+    def retry_in(self):
+        """Seconds until a call would be let through, 0 when it would be now; unlike `admit`, starts no trial"""
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                return remaining
+            return self.reset_timeout if self.trial_running else 0.0
+
+    def release_trial(self):
+        """End a trial call that never reached the upstream or gave no answer, so another one may run"""
+        with self._lock:
+            self.trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def retry_after_seconds(headers):
+    """Parse a Retry-After header (delta seconds or HTTP date), None when absent or invalid"""
+    value = (headers or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+def _exception_status(error):
+    """HTTP-like status of a client library exception (e.g. Gemini's ResourceExhausted), if any"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return 429
+    if type(error).__name__ in ("ServiceUnavailable", "DeadlineExceeded"):
+        return 503
+    return None
+
+
+class Upstream:
+    """
+    Rate limiter, retry policy and circuit breaker for one upstream and API key.
+
+    Parameters:
+        name (str): Upstream name used in errors and metrics.
+        rate_per_min (float): Sustained request rate allowed by the quota.
+        burst (int): Calls allowed back to back before the rate applies.
+        max_retries (int): Retries after 429/5xx responses.
+        max_wait (float): Longest the caller is blocked by the limiter or a Retry-After.
+    """
+    def __init__(self, name, rate_per_min, burst=1, max_retries=MAX_RETRIES, max_wait=MAX_WAIT_S):
+        self.name = name
+        self.bucket = TokenBucket(rate_per_min, burst)
+        self.breaker = CircuitBreaker()
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+
+    def _max_wait(self):
+        """`max_wait`, shortened to what is left of the trip deadline"""
+        deadline = trip_deadline.current()
+        if deadline is None:
+            return self.max_wait
+        deadline.check()
+        return min(self.max_wait, deadline.remaining())
+
+    def _acquire(self, queue=True):
+        """
+        Wait for the breaker and the quota.
+
+        Returns:
+            tuple: (seconds waited, True when this call is the breaker's half-open trial).
+        """
+        max_wait = self._max_wait()
+        if not queue:
+            max_wait = 0.0
+        retry_in, trial = self.breaker.admit()
+        if retry_in:
+            raise UpstreamUnavailable(self.name, retry_in)
+        try:
+            wait = self.bucket.reserve()
+            if wait > max_wait:
+                self.bucket.release()
+                raise UpstreamUnavailable(self.name, wait)
+            if wait:
+                time.sleep(wait)
+        except BaseException:
+            # The trial never reached the upstream; let the next call try
+            if trial:
+                self.breaker.release_trial()
+            raise
+        return wait, trial
+
+    def call(self, fn, *args, span=None, queue=True, **kwargs):
+        """
+        Calls `fn(*args, **kwargs)` (e.g. `requests.get`) within the quota.
+
+        429 and 5xx answers are retried after the Retry-After delay or an
+        exponential backoff; the response of the last attempt is returned.
+        Exceptions from `fn` count as failures and are re-raised.
+
+        Parameters:
+            fn (callable): The outbound call.
+            span (Span): Optional tracing span that receives `retries` and `throttled_ms`.
+            queue (bool): Wait for quota; False fails at once when no call is left.
+
+        Waits for quota and between retries never run past the trip deadline.
+
+        Raises:
+            UpstreamUnavailable: The circuit is open or the quota is exhausted.
+            Cancelled, BudgetExceeded: The trip was cancelled or ran out of time.
+        """
+        retries = 0
+        throttled = 0.0
+        trial = False
+        try:
+            while True:
+                wait, trial = self._acquire(queue)
+                throttled += wait
+                delay = None
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    status = _exception_status(e)
+                    if status not in RETRY_STATUSES or retries >= self.max_retries:
+                        self.breaker.record_failure()
+                        trial = False
+                        raise
+                else:
+                    status = getattr(result, "status_code", 200)
+                    if status not in RETRY_STATUSES:
+                        if status >= 500:
+                            self.breaker.record_failure()
+                        else:
+                            self.breaker.record_success()
+                        trial = False
+                        return result
+                    if retries >= self.max_retries:
+                        if status != 429:
+                            self.breaker.record_failure()
+                            trial = False
+                        return result
+                    delay = retry_after_seconds(getattr(result, "headers", None))
+
+                if status != 429:
+                    self.breaker.record_failure()
+                elif trial:
+                    self.breaker.release_trial()  # a 429 says nothing about the upstream's health
+                trial = False
+                delay = BACKOFF_S * 2 ** retries if delay is None else delay
+                self.bucket.pause(delay)
+                if delay > self._max_wait():
+                    raise UpstreamUnavailable(self.name, delay)
+                retries += 1
+        finally:
+            # A trial that ended without a recorded outcome (429, cancelled) must not block later calls
+            if trial:
+                self.breaker.release_trial()
+            if span is not None:
+                span.set(retries=retries, throttled_ms=round(throttled * 1000, 1))
+
+
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def upstream(name, key=""):
+    """
+    Return the process-wide `Upstream` for a service and API key, so every
+    client using the same key shares one quota.
+    """
+    with _upstreams_lock:
+        if (name, key) not in _upstreams:
+            rate, burst = UPSTREAM_LIMITS.get(name, (60, 1))
+            rate = float(os.getenv(f"{name.upper()}_RATE_PER_MIN", rate))
+            _upstreams[(name, key)] = Upstream(name, rate, burst)
+        return _upstreams[(name, key)]
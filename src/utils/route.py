@@ -0,0 +1,272 @@
+import json
+import sys
+from array import array
+
+from . import polyline
+from .timeline import Timeline
+
+
+class Instruction:
+    """
+    A single turn-by-turn step of a route.
+
+    Instances are lightweight views created on demand from the column arrays
+    of a `Route`; they are not stored by the route itself.
+
+    Attributes:
+        text (str): Human readable instruction text.
+        street_name (str): Street the instruction refers to (may be empty).
+        distance (float): Distance of this step in meters.
+        time (int): Duration of this step in milliseconds.
+        sign (int): GraphHopper turn sign code.
+        interval (tuple): (first, last) index into the route's point list.
+    """
+    __slots__ = ("text", "street_name", "distance", "time", "sign", "interval")
+
+    def __init__(self, text, street_name, distance, time, sign, interval):
+        self.text = text
+        self.street_name = street_name
+        self.distance = distance
+        self.time = time
+        self.sign = sign
+        self.interval = interval
+
+    def __repr__(self):
+        return f"Instruction(sign={self.sign}, distance={self.distance:.1f}, text={self.text!r})"
+
+
+class Route:
+    """
+    Compact, column oriented representation of a single GraphHopper path.
+
+    Per-instruction numbers are kept in typed `array` columns instead of one
+    dict per step, and street names are interned, so long routes with
+    thousands of instructions stay small and are cheap to walk. The parsed
+    JSON document is dropped as soon as the columns are built.
+
+    Attributes:
+        distance (float): Total distance in meters.
+        time (int): Total duration in milliseconds.
+        points (str or dict): Route geometry as returned by the API
+            (encoded polyline string or GeoJSON LineString), or None.
+        distances (array): Step distances in meters ('d').
+        times (array): Step durations in milliseconds ('q').
+        signs (array): Step sign codes ('b').
+        intervals (array): Flattened (first, last) point indices ('l').
+        texts (list): Step instruction texts.
+        street_names (list): Interned step street names.
+    """
+    __slots__ = ("distance", "time", "points", "points_encoded", "distances", "times",
+                 "signs", "intervals", "texts", "street_names", "_timeline")
+
+    def __init__(self, distance=0.0, time=0, points=None, points_encoded=True):
+        self.distance = float(distance)
+        self.time = int(time)
+        self.points = points
+        self.points_encoded = points_encoded
+        self.distances = array("d")
+        self.times = array("q")
+        self.signs = array("b")
+        self.intervals = array("l")
+        self.texts = []
+        self.street_names = []
+        self._timeline = None
+
+    @classmethod
+    def from_path(cls, path):
+        """
+        Builds a route from one entry of a GraphHopper `paths` list.
+
+        Missing fields are tolerated so the same constructor can be used for
+        routes produced by other engines or by the LLM fallback.
+
+        Parameters:
+            path (dict): A single path object.
+
+        Returns:
+            Route: The compact route.
+        """
+        route = cls(path.get("distance", 0.0), path.get("time", 0),
+                    path.get("points"), path.get("points_encoded", True))
+        intern = sys.intern
+        distances = route.distances
+        times = route.times
+        signs = route.signs
+        intervals = route.intervals
+        texts = route.texts
+        street_names = route.street_names
+
+        for step in path.get("instructions", ()):
+            distances.append(float(step.get("distance", 0.0)))
+            times.append(int(step.get("time", 0)))
+            signs.append(int(step.get("sign", 0)))
+            interval = step.get("interval") or (0, 0)
+            intervals.append(int(interval[0]))
+            intervals.append(int(interval[-1]))
+            texts.append(step.get("text", ""))
+            street_names.append(intern(step.get("street_name", "")))
+        return route
+
+    @classmethod
+    def from_response(cls, data, index=0):
+        """
+        Builds a route from an already parsed GraphHopper response.
+
+        Parameters:
+            data (dict): Parsed response containing a `paths` list.
+            index (int): Which path to use (alternatives follow the first).
+
+        Returns:
+            Route: The compact route.
+        """
+        return cls.from_path(data["paths"][index])
+
+    @classmethod
+    def from_json(cls, payload, index=0):
+        """
+        Parses a raw GraphHopper response body straight into a route.
+
+        `json.loads` accepts the raw bytes, which skips the intermediate
+        decoded string `requests.Response.json()` would build.
+
+        Parameters:
+            payload (bytes or str): The response body.
+            index (int): Which path to use.
+
+        Returns:
+            Route: The compact route.
+        """
+        return cls.from_response(json.loads(payload), index)
+
+    @classmethod
+    def all_from_json(cls, payload):
+        """
+        Parses a raw response body into one route per returned path.
+
+        Used for alternative-route requests, where GraphHopper returns the best
+        path first followed by its alternatives.
+
+        Parameters:
+            payload (bytes or str): The response body.
+
+        Returns:
+            list: `Route` objects in the order returned by the API.
+        """
+        return [cls.from_path(path) for path in json.loads(payload)["paths"]]
+
+    @classmethod
+    def concat(cls, legs):
+        """
+        Joins consecutive routes, each starting where the previous one ends, into one route.
+
+        The shared point between two legs is kept once and the arrival step of
+        every leg but the last becomes a "waypoint reached" step (sign 5), as in
+        a GraphHopper route through several points.
+
+        Parameters:
+            legs (list): `Route` objects in travel order.
+
+        Returns:
+            Route: The joined route with an encoded polyline.
+        """
+        route = cls(sum(leg.distance for leg in legs), sum(leg.time for leg in legs))
+        lats = array("d")
+        lngs = array("d")
+        for n, leg in enumerate(legs):
+            leg_lats, leg_lngs = leg.coordinates()
+            offset = len(lats) - 1 if len(lats) else 0
+            start = 1 if len(lats) else 0
+            lats.extend(leg_lats[start:])
+            lngs.extend(leg_lngs[start:])
+
+            route.distances.extend(leg.distances)
+            route.times.extend(leg.times)
+            route.texts.extend(leg.texts)
+            route.street_names.extend(leg.street_names)
+            signs = array("b", leg.signs)
+            if n < len(legs) - 1 and len(signs) and signs[-1] == 4:
+                signs[-1] = 5
+            route.signs.extend(signs)
+            route.intervals.extend(i + offset for i in leg.intervals)
+
+        route.points = polyline.encode(lats, lngs)
+        return route
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        return Instruction(
+            self.texts[i],
+            self.street_names[i],
+            self.distances[i],
+            self.times[i],
+            self.signs[i],
+            (self.intervals[2 * i], self.intervals[2 * i + 1]),
+        )
+
+    def __iter__(self):
+        for i in range(len(self.texts)):
+            yield self[i]
+
+    @property
+    def distance_km(self):
+        return self.distance / 1000
+
+    @property
+    def hours(self):
+        return self.time / 1000 / 60 / 60
+
+    def coordinates(self):
+        """
+        Returns the route geometry as coordinate columns.
+
+        Encoded polylines are decoded on demand rather than at parse time, so
+        callers that never need the geometry do not pay for it.
+
+        Returns:
+            tuple: (lats, lngs) arrays; both empty when the route has no geometry.
+        """
+        if isinstance(self.points, str) and self.points_encoded:
+            return polyline.decode(self.points)
+        lats = array("d")
+        lngs = array("d")
+        if isinstance(self.points, dict):
+            for coordinate in self.points.get("coordinates", ()):
+                lngs.append(coordinate[0])
+                lats.append(coordinate[1])
+        return lats, lngs
+
+    def timeline(self):
+        """
+        Position-at-time and ETA index of the route (see `Timeline`), built on
+        first use and shared by every along-route lookup after that.
+        """
+        if self._timeline is None:
+            self._timeline = Timeline(self)
+        return self._timeline
+
+    def to_path(self):
+        """
+        Converts the route back into a GraphHopper-shaped path dict.
+
+        Returns:
+            dict: A path object with `distance`, `time`, `points` and `instructions`.
+        """
+        return {
+            "distance": self.distance,
+            "time": self.time,
+            "points": self.points,
+            "points_encoded": self.points_encoded,
+            "instructions": [
+                {
+                    "distance": step.distance,
+                    "time": step.time,
+                    "sign": step.sign,
+                    "interval": list(step.interval),
+                    "text": step.text,
+                    "street_name": step.street_name,
+                }
+                for step in self
+            ],
+        }
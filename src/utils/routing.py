@@ -0,0 +1,209 @@
+import json
+import urllib.parse
+import requests
+
+from .cache import TTLCache
+from .deadline import BudgetExceeded, request_timeout
+from .isochrone import Isochrone, snap, time_bucket
+from .resilience import RETRY_STATUSES, UpstreamUnavailable, upstream
+from .route import Route
+from .singleflight import SingleFlight
+from .trace import span
+
+# How long a route may be served while GraphHopper is unavailable
+FALLBACK_TTL = 24 * 3600
+# Routes and matrices younger than this are reused without a request
+FRESH_TTL = 3600
+
+# Concurrent identical route requests share one call
+_flight = SingleFlight("graphhopper.route")
+_matrix_flight = SingleFlight("graphhopper.matrix")
+_isochrone_flight = SingleFlight("graphhopper.isochrone")
+
+
+class Routing:
+    """
+    Thin client for the GraphHopper Routing API that returns compact `Route` objects.
+
+    Calls share the rate limiter and circuit breaker of the API key; while
+    GraphHopper is throttled or down the last answer for the same request is
+    served instead.
+    """
+    def __init__(self, graphhopper_api_key: str):
+        self.ghr_api_key = graphhopper_api_key
+        self.route_url = "https://graphhopper.com/api/1/route?"
+        self.matrix_url = "https://graphhopper.com/api/1/matrix?"
+        self.isochrone_url = "https://graphhopper.com/api/1/isochrone?"
+        self.upstream = upstream("graphhopper", graphhopper_api_key)
+        self.fallback = TTLCache(FALLBACK_TTL, maxsize=128)
+
+    def build_url(self, orig_lat, orig_lng, dest_lat, dest_lng, vehicle, alternatives=0):
+        return self.build_points_url(((orig_lat, orig_lng), (dest_lat, dest_lng)), vehicle, alternatives)
+
+    def build_points_url(self, points, vehicle, alternatives=0):
+        params = {"key": self.ghr_api_key, "vehicle": vehicle, "points_encoded": "true"}
+        if alternatives:
+            params["algorithm"] = "alternative_route"
+            params["alternative_route.max_paths"] = str(alternatives + 1)
+        return self.route_url + urllib.parse.urlencode(params) + _point_params(points)
+
+    def build_matrix_url(self, points, vehicle):
+        params = [("key", self.ghr_api_key), ("vehicle", vehicle), ("out_array", "distances"), ("out_array", "times")]
+        return self.matrix_url + urllib.parse.urlencode(params) + _point_params(points)
+
+    def build_isochrone_url(self, lat, lng, vehicle, minutes):
+        params = {"key": self.ghr_api_key, "profile": vehicle, "time_limit": str(minutes * 60), "buckets": "1"}
+        return self.isochrone_url + urllib.parse.urlencode(params) + _point_params(((lat, lng),))
+
+    def route(self, orig_lat, orig_lng, dest_lat, dest_lng, vehicle):
+        """
+        Requests a route between two coordinates.
+
+        Parameters:
+            orig_lat, orig_lng: Origin coordinates.
+            dest_lat, dest_lng: Destination coordinates.
+            vehicle (str): GraphHopper profile (car, bike, foot).
+
+        Returns:
+            tuple: (status code, data) where data is a `Route` on success and
+            the parsed error body (dict with a `message`) otherwise.
+        """
+        url = self.build_url(orig_lat, orig_lng, dest_lat, dest_lng, vehicle)
+        status, data = _flight.do(url, self.fetch, url, vehicle)
+        if status == 200:
+            with span("route.parse", bytes=len(data)):
+                return status, Route.from_json(data)
+        return status, data
+
+    def route_through(self, points, vehicle):
+        """
+        Requests one route visiting several coordinates in the given order.
+
+        Parameters:
+            points (list): (lat, lng) tuples, origin first and destination last.
+            vehicle (str): GraphHopper profile.
+
+        Returns:
+            tuple: (status code, data) like `route`.
+        """
+        url = self.build_points_url(points, vehicle)
+        status, data = _flight.do(url, self.fetch, url, vehicle)
+        if status == 200:
+            with span("route.parse", bytes=len(data)):
+                return status, Route.from_json(data)
+        return status, data
+
+    def matrix(self, points, vehicle):
+        """
+        Requests the travel distances and times between every pair of coordinates
+        with a single Matrix API call.
+
+        Parameters:
+            points (list): (lat, lng) tuples.
+            vehicle (str): GraphHopper profile.
+
+        Returns:
+            tuple: (status code, data) where data is a (distances, times) pair of
+            N×N lists in meters and milliseconds on success (None where no route
+            exists) and the parsed error body otherwise.
+        """
+        url = self.build_matrix_url(points, vehicle)
+        status, data = _matrix_flight.do(url, self._get, "graphhopper.matrix", url,
+                                         {"profile": vehicle, "points": len(points)})
+        if status != 200:
+            return status, data
+        with span("matrix.parse", bytes=len(data)):
+            parsed = json.loads(data)
+            times = [[None if t is None else int(t * 1000) for t in row] for row in parsed["times"]]
+            return status, (parsed["distances"], times)
+
+    def isochrone(self, lat, lng, vehicle, minutes):
+        """
+        Requests the area reachable from a coordinate within a time limit.
+
+        The origin is snapped and the time limit rounded to a bucket first (see
+        `snap` and `time_bucket`), so the request URL, and with it the cached
+        answer, is shared by nearby queries for similar times.
+
+        Parameters:
+            lat, lng: Origin coordinates.
+            vehicle (str): GraphHopper profile.
+            minutes (float): Time limit.
+
+        Returns:
+            tuple: (status code, data) where data is an `Isochrone` on success
+            and the parsed error body otherwise.
+        """
+        lat, lng = snap(lat, lng)
+        minutes = time_bucket(minutes)
+        url = self.build_isochrone_url(lat, lng, vehicle, minutes)
+        status, data = _isochrone_flight.do(url, self._get, "graphhopper.isochrone", url,
+                                            {"profile": vehicle, "minutes": minutes})
+        if status != 200:
+            return status, data
+        with span("isochrone.parse", bytes=len(data)):
+            return status, Isochrone.from_json(data, lat, lng, vehicle, minutes)
+
+    def alternatives(self, orig_lat, orig_lng, dest_lat, dest_lng, vehicle, count=2):
+        """
+        Requests the best route plus up to `count` alternative routes.
+
+        Returns:
+            tuple: (status code, data) where data is a list of `Route` objects
+            (best first) on success and the parsed error body otherwise.
+        """
+        url = self.build_url(orig_lat, orig_lng, dest_lat, dest_lng, vehicle, count)
+        status, data = _flight.do(url, self.fetch, url, vehicle, count)
+        if status == 200:
+            with span("route.parse", bytes=len(data)):
+                return status, Route.all_from_json(data)
+        return status, data
+
+    def fetch(self, url, vehicle, alternatives=0):
+        """
+        Sends a routing request through the rate limiter and circuit breaker.
+
+        Returns:
+            tuple: (status code, data) where data is the raw response body on
+            success (fresh or from the fallback cache) and an error dict otherwise.
+        """
+        attrs = {"profile": vehicle, "alternatives": alternatives} if alternatives else {"profile": vehicle}
+        return self._get("graphhopper.route", url, attrs)
+
+    def cache_key(self, url):
+        """The request URL without the API key, under which its answer is cached and snapshotted"""
+        base, _, query = url.partition("?")
+        return base + "?" + "&".join(p for p in query.split("&") if not p.startswith("key="))
+
+    def _get(self, name, url, attrs):
+        # A recent answer for the same URL is served without a request
+        with span(f"cache.{name.split('.', 1)[-1]}") as s:
+            cached = self.fallback.get(self.cache_key(url), max_age=FRESH_TTL)
+            s.set(cache_hit=cached is not None)
+        if cached is not None:
+            return 200, cached
+
+        with span(name, **attrs) as s:
+            try:
+                response = self.upstream.call(requests.get, url, timeout=request_timeout(), span=s)
+            except (UpstreamUnavailable, BudgetExceeded, requests.RequestException) as e:
+                s.set(status=503)
+                return self.from_fallback(url, str(e))
+            s.set(status=response.status_code, bytes=len(response.content))
+
+        if response.status_code == 200:
+            self.fallback.set(self.cache_key(url), response.content)
+            return 200, response.content
+        if response.status_code in RETRY_STATUSES:
+            return self.from_fallback(url, f"GraphHopper answered {response.status_code}")
+        return response.status_code, response.json()
+
+    def from_fallback(self, url, reason):
+        cached = self.fallback.get(self.cache_key(url), stale=True)
+        if cached is not None:
+            return 200, cached
+        return 503, {"message": reason}
+
+
+def _point_params(points):
+    return "".join("&point=" + str(lat) + "%2C" + str(lng) for lat, lng in points)
@@ -0,0 +1,70 @@
+import threading
+
+from . import deadline as trip_deadline
+from .trace import span
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is still running wait for it and receive the same result
+    or exception. Nothing is cached: once the leader finishes, the next call
+    for the key runs again.
+
+    Parameters:
+        name (str): Group name, reported on the `singleflight.wait` span of waiting callers.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` unless a call with the same key is already in flight.
+
+        Returns:
+            The result of the (shared) call. Exceptions of the shared call are re-raised
+            in every waiting caller; a caller whose trip deadline passes while
+            waiting gets `BudgetExceeded`.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            deadline = trip_deadline.current()
+            with span("singleflight.wait", group=self.name):
+                finished = call.done.wait(deadline.remaining() if deadline else None)
+            if not finished:
+                raise trip_deadline.BudgetExceeded(f"Trip budget of {deadline.budget_s:.0f} s exceeded")
+            if isinstance(call.error, trip_deadline.Cancelled):
+                # The leader's trip was cancelled, not ours: try again
+                return self.do(key, fn, *args, **kwargs)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,284 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from .trace import span
+
+SNAPSHOT_PATH = os.path.join("history", "cache.snap")
+
+# File layout (little endian):
+#   header   magic, format version, index length, index CRC-32
+#   index    JSON: {"created_at": ..., "sections": {name: [offset, length, crc, count]}},
+#            offsets counted from the end of the index
+#   sections per cache: u32 JSON length, JSON entry list, then the raw bytes values
+#            the entries point to, so large payloads (route bodies) are copied
+#            straight out of the memory map instead of being decoded from text
+MAGIC = b"TGSN"
+# Version 2: route keys no longer contain the GraphHopper API key
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<4sHII")
+SECTION_HEADER = struct.Struct("<I")
+
+# Size limits: the whole file, and single values (larger ones are not saved)
+MAX_SNAPSHOT_BYTES = 32 * 1024 * 1024
+MAX_ENTRY_BYTES = 1024 * 1024
+
+# Open snapshots by path; saving over a file closes its memory map first
+_open = {}
+_open_lock = threading.Lock()
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is truncated, corrupt or of another version"""
+
+
+def _encode(value, blobs):
+    """JSON-safe form of a cache key or value; bytes go to `blobs` and are referenced by index"""
+    if isinstance(value, bytes):
+        blobs.append(value)
+        return {"$b": len(blobs) - 1}
+    if isinstance(value, tuple):
+        return {"$t": [_encode(item, blobs) for item in value]}
+    if isinstance(value, list):
+        return [_encode(item, blobs) for item in value]
+    if isinstance(value, dict):
+        if any(not isinstance(k, str) or k.startswith("$") for k in value):
+            raise TypeError("only dicts with plain string keys can be saved")
+        return {k: _encode(v, blobs) for k, v in value.items()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"{type(value).__name__} values can't be saved")
+
+
+def _decode(value, blob):
+    if isinstance(value, list):
+        return [_decode(item, blob) for item in value]
+    if isinstance(value, dict):
+        if "$b" in value:
+            return blob(value["$b"])
+        if "$t" in value:
+            return tuple(_decode(item, blob) for item in value["$t"])
+        return {k: _decode(v, blob) for k, v in value.items()}
+    return value
+
+
+def _encode_section(entries, budget):
+    """
+    Encodes (key, stored_at, value) entries, keeping the most recently used ones
+    that fit into `budget` bytes.
+
+    Returns:
+        tuple: (section bytes, number of entries), or (None, 0) if nothing fits.
+    """
+    kept = []
+    blobs = []
+    size = SECTION_HEADER.size
+    for key, stored_at, value in reversed(entries):
+        entry_blobs = []
+        try:
+            encoded = [_encode(key, entry_blobs), stored_at, _encode(value, entry_blobs)]
+        except TypeError:
+            continue
+        entry_size = len(json.dumps(encoded, separators=(",", ":"))) + sum(len(b) for b in entry_blobs) + 16
+        if entry_size > MAX_ENTRY_BYTES or size + entry_size > budget:
+            continue
+        # Re-number this entry's blobs after the ones already kept
+        offset = len(blobs)
+        kept.append(_renumber(encoded, offset))
+        blobs.extend(entry_blobs)
+        size += entry_size
+    if not kept:
+        return None, 0
+
+    kept.reverse()
+    positions = []
+    position = 0
+    for b in blobs:
+        positions.append([position, len(b)])
+        position += len(b)
+    document = json.dumps({"entries": kept, "blobs": positions}, separators=(",", ":")).encode("utf-8")
+    return SECTION_HEADER.pack(len(document)) + document + b"".join(blobs), len(kept)
+
+
+def _renumber(value, offset):
+    if not offset:
+        return value
+    if isinstance(value, list):
+        return [_renumber(item, offset) for item in value]
+    if isinstance(value, dict):
+        if "$b" in value:
+            return {"$b": value["$b"] + offset}
+        return {k: _renumber(v, offset) for k, v in value.items()}
+    return value
+
+
+def save(caches, path=SNAPSHOT_PATH, max_bytes=MAX_SNAPSHOT_BYTES):
+    """
+    Write the entries of named caches to a snapshot file.
+
+    Caches are written in the given order; each gets what is left of
+    `max_bytes`, most recently used entries first. The file is replaced
+    atomically, so a crash while saving leaves the previous snapshot intact.
+
+    Parameters:
+        caches (dict): {section name: TTLCache}.
+        path (str): Snapshot file.
+        max_bytes (int): Size limit of the whole file.
+
+    Returns:
+        int: Size of the written file in bytes.
+    """
+    with span("snapshot.save") as s:
+        sections = {}
+        payloads = []
+        offset = 0
+        budget = max_bytes - HEADER.size - 4096  # leave room for the index
+        for name, cache in caches.items():
+            payload, count = _encode_section(cache.items(), budget - offset)
+            if payload is None:
+                continue
+            sections[name] = [offset, len(payload), zlib.crc32(payload), count]
+            payloads.append(payload)
+            offset += len(payload)
+
+        index = json.dumps({"created_at": time.time(), "sections": sections}, separators=(",", ":")).encode("utf-8")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        # Cached answers are the user's trips: readable only by the current user
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(index), zlib.crc32(index)))
+            fp.write(index)
+            for payload in payloads:
+                fp.write(payload)
+        with _open_lock:
+            previous = _open.pop(os.path.abspath(path), None)
+        if previous is not None:
+            previous.close()  # a mapped file can't be replaced on every platform
+        os.replace(tmp_path, path)
+        size = HEADER.size + len(index) + offset
+        s.set(bytes=size, sections=len(sections))
+        return size
+
+
+class Snapshot:
+    """
+    Read side of a snapshot file.
+
+    Opening only maps the file and checks the header and index; a section is
+    checked against its CRC and decoded when `entries(name)` is first called,
+    which is what `TTLCache.preload` does on the cache's first access.
+
+    Parameters:
+        path (str): Snapshot file.
+        max_bytes (int): Larger files are refused.
+
+    Raises:
+        SnapshotError: The file is too large, truncated, corrupt or of another format version.
+    """
+    def __init__(self, path=SNAPSHOT_PATH, max_bytes=MAX_SNAPSHOT_BYTES):
+        self.path = path
+        self._lock = threading.Lock()
+        with open(path, "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            if size > max_bytes:
+                raise SnapshotError(f"{path} is larger than {max_bytes} bytes")
+            if size < HEADER.size:
+                raise SnapshotError(f"{path} is truncated")
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_index(size)
+        except Exception:
+            self._map.close()
+            raise
+        with _open_lock:
+            _open[os.path.abspath(path)] = self
+
+    def _read_index(self, size):
+        path = self.path
+        magic, version, index_length, index_crc = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        index = self._map[HEADER.size:HEADER.size + index_length]
+        if len(index) != index_length or zlib.crc32(index) != index_crc:
+            raise SnapshotError(f"{path} has a corrupt index")
+        index = json.loads(index)
+        self.created_at = index["created_at"]
+        self.sections = index["sections"]
+        self._data_start = HEADER.size + index_length
+        for name, (offset, length, _, _) in self.sections.items():
+            if self._data_start + offset + length > size:
+                raise SnapshotError(f"{path} is truncated in section {name}")
+
+    def entries(self, name):
+        """
+        Decoded (key, stored_at, value) tuples of a section, least recently used first.
+
+        Raises:
+            SnapshotError: The section fails its CRC check.
+        """
+        if name not in self.sections:
+            return []
+        offset, length, crc, _ = self.sections[name]
+        with self._lock, span("snapshot.load", section=name, bytes=length):
+            if self._map.closed:
+                return []
+            start = self._data_start + offset
+            section = memoryview(self._map)[start:start + length]
+            try:
+                if zlib.crc32(section) != crc:
+                    raise SnapshotError(f"{self.path} section {name} is corrupt")
+                (document_length,) = SECTION_HEADER.unpack_from(section, 0)
+                start = SECTION_HEADER.size
+                document = json.loads(bytes(section[start:start + document_length]))
+                blobs_start = start + document_length
+                positions = document["blobs"]
+
+                def blob(i):
+                    position, size = positions[i]
+                    return bytes(section[blobs_start + position:blobs_start + position + size])
+
+                return [(_decode(key, blob), stored_at, _decode(value, blob))
+                        for key, stored_at, value in document["entries"]]
+            finally:
+                section.release()
+
+    def attach(self, caches):
+        """
+        Preload named caches from this snapshot; sections are only decoded on first use.
+
+        Parameters:
+            caches (dict): {section name: TTLCache}.
+        """
+        for name, cache in caches.items():
+            if name in self.sections:
+                cache.preload(lambda name=name: self.entries(name))
+
+    def close(self):
+        with self._lock:
+            self._map.close()
+
+
+def restore(caches, path=SNAPSHOT_PATH, max_bytes=MAX_SNAPSHOT_BYTES):
+    """
+    Open a snapshot and attach it to the caches, or start cold when the file is
+    missing or unusable.
+
+    Returns:
+        Snapshot: The open snapshot, or None.
+    """
+    try:
+        snapshot = Snapshot(path, max_bytes)
+    except (OSError, ValueError, SnapshotError):
+        return None
+    snapshot.attach(caches)
+    return snapshot
@@ -0,0 +1,184 @@
+import heapq
+import math
+from array import array
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in kilometers between two coordinates"""
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_many(lat, lng, lats, lngs):
+    """
+    Great-circle distances in kilometers from one coordinate to many.
+
+    The origin's trigonometric terms are computed once and the loop only does
+    per-target work, writing into a typed array.
+
+    Parameters:
+        lat, lng: Origin coordinate.
+        lats, lngs (sequence): Target coordinates.
+
+    Returns:
+        array: Distances ('d') in the order of the targets.
+    """
+    p1 = math.radians(lat)
+    cos_p1 = math.cos(p1)
+    l1 = math.radians(lng)
+    sin = math.sin
+    cos = math.cos
+    asin = math.asin
+    sqrt = math.sqrt
+    radians = math.radians
+    diameter = 2 * EARTH_RADIUS_KM
+
+    out = array("d", bytes(8 * len(lats)))
+    for i in range(len(lats)):
+        p2 = radians(lats[i])
+        a = sin((p2 - p1) / 2) ** 2 + cos_p1 * cos(p2) * sin((radians(lngs[i]) - l1) / 2) ** 2
+        out[i] = diameter * asin(min(1.0, sqrt(a)))
+    return out
+
+
+def _to_xyz(lat, lng):
+    p = math.radians(lat)
+    l = math.radians(lng)
+    cos_p = math.cos(p)
+    return cos_p * math.cos(l), cos_p * math.sin(l), math.sin(p)
+
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def _km_to_chord(km):
+    return 2 * math.sin(min(math.pi / 2, km / (2 * EARTH_RADIUS_KM)))
+
+
+class KDTree:
+    """
+    Static 3-d tree over points on the unit sphere for nearest-neighbour and
+    radius queries on latitude/longitude data.
+
+    Coordinates are converted to unit vectors, so straight-line (chord) distance
+    orders points exactly like great-circle distance and there are no problems
+    at the antimeridian or the poles. The tree is stored implicitly: the point
+    order array is arranged so every sub-range's median is its splitting node.
+
+    Parameters:
+        lats, lngs (sequence): Point coordinates.
+    """
+    def __init__(self, lats, lngs):
+        n = len(lats)
+        self.size = n
+        self.xyz = (array("d"), array("d"), array("d"))
+        for lat, lng in zip(lats, lngs):
+            x, y, z = _to_xyz(lat, lng)
+            self.xyz[0].append(x)
+            self.xyz[1].append(y)
+            self.xyz[2].append(z)
+
+        order = list(range(n))
+        stack = [(0, n, 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo < 2:
+                continue
+            column = self.xyz[depth % 3]
+            order[lo:hi] = sorted(order[lo:hi], key=column.__getitem__)
+            mid = (lo + hi) // 2
+            stack.append((lo, mid, depth + 1))
+            stack.append((mid + 1, hi, depth + 1))
+        self.order = array("l", order)
+
+    def _dist2(self, i, qx, qy, qz):
+        xs, ys, zs = self.xyz
+        dx = xs[i] - qx
+        dy = ys[i] - qy
+        dz = zs[i] - qz
+        return dx * dx + dy * dy + dz * dz
+
+    def nearest(self, lat, lng, k=1, max_km=None):
+        """
+        Finds the k points closest to a coordinate.
+
+        Parameters:
+            lat, lng: Query coordinate.
+            k (int): Number of neighbours to return.
+            max_km (float): Optional search radius in kilometers.
+
+        Returns:
+            list: (distance_km, index) tuples, closest first.
+        """
+        if not self.size:
+            return []
+        q = _to_xyz(lat, lng)
+        limit2 = _km_to_chord(max_km) ** 2 if max_km is not None else float("inf")
+        heap = []  # max-heap of (-dist2, index)
+
+        def bound():
+            return -heap[0][0] if len(heap) == k else limit2
+
+        stack = [(0, self.size, 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            i = self.order[mid]
+            d2 = self._dist2(i, *q)
+            if d2 <= bound():
+                heapq.heappush(heap, (-d2, i))
+                if len(heap) > k:
+                    heapq.heappop(heap)
+
+            axis = depth % 3
+            diff = q[axis] - self.xyz[axis][i]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            # Visit the far side only if the splitting plane is within reach
+            if diff * diff <= bound():
+                stack.append((far[0], far[1], depth + 1))
+            stack.append((near[0], near[1], depth + 1))
+
+        return sorted((_chord_to_km(math.sqrt(-d2)), i) for d2, i in heap)
+
+    def within(self, lat, lng, radius_km):
+        """
+        Finds all points within a radius of a coordinate.
+
+        Parameters:
+            lat, lng: Query coordinate.
+            radius_km (float): Search radius in kilometers.
+
+        Returns:
+            list: (distance_km, index) tuples, closest first.
+        """
+        q = _to_xyz(lat, lng)
+        limit2 = _km_to_chord(radius_km) ** 2
+        found = []
+        stack = [(0, self.size, 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            i = self.order[mid]
+            d2 = self._dist2(i, *q)
+            if d2 <= limit2:
+                found.append((d2, i))
+
+            axis = depth % 3
+            diff = q[axis] - self.xyz[axis][i]
+            if diff < 0 or diff * diff <= limit2:
+                stack.append((lo, mid, depth + 1))
+            if diff >= 0 or diff * diff <= limit2:
+                stack.append((mid + 1, hi, depth + 1))
+
+        return sorted((_chord_to_km(math.sqrt(d2)), i) for d2, i in found)
@@ -0,0 +1,183 @@
+import math
+from array import array
+from bisect import bisect_right
+
+from .spatial import KDTree, haversine
+
+
+class Timeline:
+    """
+    Where along a route the traveller is at a given time, and when they pass a
+    given place.
+
+    Built once per route from the decoded geometry and the instructions:
+    `meters` and `ms` hold the cumulative distance and time at every point.
+    Each instruction's time is spread over the points of its interval in
+    proportion to their distance, so positions follow the speed of each
+    step. Lookups are binary searches with linear interpolation between the
+    two surrounding points; the batch versions walk the arrays once for all
+    queries.
+
+    Parameters:
+        route (Route): The route.
+
+    Attributes:
+        lats, lngs (array): Route points.
+        meters (array): Cumulative distance in meters at each point.
+        ms (array): Cumulative time in milliseconds at each point.
+        starts (array): Time in milliseconds at which each instruction begins.
+    """
+    def __init__(self, route):
+        self.lats, self.lngs = route.coordinates()
+        n = len(self.lats)
+        self.starts = array("d", bytes(8 * len(route)))
+        for i in range(1, len(route)):
+            self.starts[i] = self.starts[i - 1] + route.times[i - 1]
+
+        self.meters = array("d", bytes(8 * n))
+        for i in range(1, n):
+            self.meters[i] = self.meters[i - 1] + haversine(self.lats[i - 1], self.lngs[i - 1],
+                                                            self.lats[i], self.lngs[i]) * 1000
+
+        self.ms = array("d", bytes(8 * n))
+        covered = 0
+        for i in range(len(route)):
+            first = min(route.intervals[2 * i], n - 1)
+            last = min(route.intervals[2 * i + 1], n - 1)
+            if last <= first or first < covered:
+                continue
+            for p in range(covered + 1, first + 1):
+                self.ms[p] = self.ms[covered]  # points no instruction covers
+            start_ms = self.ms[first]
+            span_m = self.meters[last] - self.meters[first]
+            for p in range(first + 1, last + 1):
+                share = (self.meters[p] - self.meters[first]) / span_m if span_m else (p - first) / (last - first)
+                self.ms[p] = start_ms + route.times[i] * share
+            covered = last
+        if n > 1 and covered < n - 1:
+            # Points after the last instruction (or routes without instructions): spread the rest by distance
+            rest = max(0, route.time - self.ms[covered])
+            span_m = self.meters[-1] - self.meters[covered]
+            for p in range(covered + 1, n):
+                share = (self.meters[p] - self.meters[covered]) / span_m if span_m else (p - covered) / (n - 1 - covered)
+                self.ms[p] = self.ms[covered] + rest * share
+
+        self._tree = None
+
+    def __len__(self):
+        return len(self.lats)
+
+    @property
+    def total_ms(self):
+        return self.ms[-1] if len(self.ms) else 0
+
+    def _interpolate(self, values, target, i):
+        # Position between points i - 1 and i at which `values` reaches `target`
+        a = i - 1
+        gap = values[i] - values[a]
+        share = (target - values[a]) / gap if gap else 0.0
+        return self.lats[a] + (self.lats[i] - self.lats[a]) * share, self.lngs[a] + (self.lngs[i] - self.lngs[a]) * share
+
+    def position_at(self, ms):
+        """
+        Where the traveller is `ms` milliseconds into the trip.
+
+        Returns:
+            tuple: (lat, lng), the start or end for times outside the trip, or
+            None for a route without geometry.
+        """
+        if not len(self.lats):
+            return None
+        i = bisect_right(self.ms, ms)
+        if i == 0:
+            return self.lats[0], self.lngs[0]
+        if i >= len(self.ms):
+            return self.lats[-1], self.lngs[-1]
+        return self._interpolate(self.ms, ms, i)
+
+    def positions_at(self, times):
+        """
+        Batch `position_at`: the queries are sorted and the route is walked once.
+
+        Parameters:
+            times (sequence): Milliseconds into the trip.
+
+        Returns:
+            tuple: (lats, lngs) arrays in the order of `times`; empty for a route without geometry.
+        """
+        lats = array("d", bytes(8 * len(times)))
+        lngs = array("d", bytes(8 * len(times)))
+        n = len(self.ms)
+        if not n:
+            return array("d"), array("d")
+        i = 0
+        for q in sorted(range(len(times)), key=times.__getitem__):
+            t = times[q]
+            while i < n and self.ms[i] <= t:
+                i += 1
+            if i == 0:
+                lats[q], lngs[q] = self.lats[0], self.lngs[0]
+            elif i >= n:
+                lats[q], lngs[q] = self.lats[-1], self.lngs[-1]
+            else:
+                lats[q], lngs[q] = self._interpolate(self.ms, t, i)
+        return lats, lngs
+
+    def position_at_distance(self, meters):
+        """Where the traveller is after `meters` along the route, like `position_at`"""
+        if not len(self.lats):
+            return None
+        i = bisect_right(self.meters, meters)
+        if i == 0:
+            return self.lats[0], self.lngs[0]
+        if i >= len(self.meters):
+            return self.lats[-1], self.lngs[-1]
+        return self._interpolate(self.meters, meters, i)
+
+    def step_at(self, ms):
+        """Index of the instruction being followed `ms` milliseconds into the trip, or None without instructions"""
+        if not len(self.starts):
+            return None
+        return max(0, bisect_right(self.starts, ms) - 1)
+
+    def eta_at(self, lat, lng):
+        """
+        When the traveller passes closest to a coordinate.
+
+        The nearest route point is found with a `KDTree` (built on first use)
+        and the coordinate is projected onto the two route segments around it.
+
+        Returns:
+            tuple: (ms into the trip, distance of the coordinate from the route in km),
+            or None for a route without geometry.
+        """
+        if not len(self.lats):
+            return None
+        if self._tree is None:
+            self._tree = KDTree(self.lats, self.lngs)
+        _, k = self._tree.nearest(lat, lng, 1)[0]
+
+        # Project onto the neighbouring segments in a local flat approximation
+        scale = math.cos(math.radians(lat))
+        best = (float("inf"), self.ms[k], k, 0.0)
+        for a in (k - 1, k):
+            b = a + 1
+            if a < 0 or b >= len(self.lats):
+                continue
+            ax, ay = self.lngs[a] * scale, self.lats[a]
+            dx, dy = self.lngs[b] * scale - ax, self.lats[b] - ay
+            length2 = dx * dx + dy * dy
+            t = 0.0 if not length2 else min(1.0, max(0.0, ((lng * scale - ax) * dx + (lat - ay) * dy) / length2))
+            px, py = ax + t * dx, ay + t * dy
+            d2 = (lng * scale - px) ** 2 + (lat - py) ** 2
+            if d2 < best[0]:
+                best = (d2, self.ms[a] + (self.ms[b] - self.ms[a]) * t, a, t)
+        _, ms, a, t = best
+        b = min(a + 1, len(self.lats) - 1)
+        point_lat = self.lats[a] + (self.lats[b] - self.lats[a]) * t
+        point_lng = self.lngs[a] + (self.lngs[b] - self.lngs[a]) * t
+        return ms, haversine(lat, lng, point_lat, point_lng)
+
+    def etas_at(self, lats, lngs):
+        """Batch `eta_at` sharing one point index; a list of (ms, off-route km) tuples"""
+        return [self.eta_at(lat, lng) for lat, lng in zip(lats, lngs)]
@@ -0,0 +1,254 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from .route import Route
+from .spatial import haversine
+from .trace import span
+
+MAX_STOPS = 30
+
+# Points per routing request (the GraphHopper free plan allows 5)
+MAX_ROUTE_POINTS = 5
+
+# Local estimate used when the Matrix API is unavailable
+ROAD_FACTOR = 1.3          # road distance vs. straight-line distance
+PROFILE_KMH = {"car": 50, "bike": 15, "foot": 5}
+
+# Cost of an unreachable pair; large enough that any reachable order wins
+UNREACHABLE = 10 ** 12
+
+
+class Tour:
+    """
+    A planned multi-stop trip.
+
+    Attributes:
+        stops (list): (name, lat, lng) tuples in visiting order.
+        queries (list): What the user typed, in visiting order.
+        route (Route): The joined route through all stops.
+        legs (list): (distance m, time ms) of each leg from the travel matrix.
+        entered_ms (int): Matrix travel time of the order the stops were entered in.
+        planned_ms (int): Matrix travel time of the planned order.
+        estimated (bool): True when the matrix was estimated locally.
+        requests (int): Upstream requests used for the plan.
+    """
+    __slots__ = ("stops", "queries", "route", "legs", "entered_ms", "planned_ms", "estimated", "requests")
+
+    def __init__(self, stops, queries, route, legs, entered_ms, planned_ms, estimated, requests):
+        self.stops = stops
+        self.queries = queries
+        self.route = route
+        self.legs = legs
+        self.entered_ms = entered_ms
+        self.planned_ms = planned_ms
+        self.estimated = estimated
+        self.requests = requests
+
+    @property
+    def saved_ms(self):
+        return max(0, self.entered_ms - self.planned_ms)
+
+
+def estimate_matrix(points, vehicle):
+    """
+    Straight-line distance and time matrix for when the Matrix API is unavailable.
+
+    Returns:
+        tuple: (distances, times) N×N lists in meters and milliseconds.
+    """
+    kmh = PROFILE_KMH.get(vehicle, PROFILE_KMH["car"])
+    distances = []
+    times = []
+    for lat1, lng1 in points:
+        row = [haversine(lat1, lng1, lat2, lng2) * ROAD_FACTOR for lat2, lng2 in points]
+        distances.append([km * 1000 for km in row])
+        times.append([int(km / kmh * 3600000) for km in row])
+    return distances, times
+
+
+def tour_cost(order, cost, round_trip=False):
+    """Total cost of visiting `order`, optionally returning to the first stop"""
+    total = sum(cost[a][b] for a, b in zip(order, order[1:]))
+    if round_trip and len(order) > 1:
+        total += cost[order[-1]][order[0]]
+    return total
+
+
+def nearest_neighbour(cost, start=0):
+    """Greedy order: always travel to the cheapest unvisited stop next"""
+    order = [start]
+    left = set(range(len(cost))) - {start}
+    while left:
+        here = cost[order[-1]]
+        stop = min(left, key=lambda j: (here[j], j))
+        order.append(stop)
+        left.remove(stop)
+    return order
+
+
+def two_opt(order, cost, round_trip=False):
+    """
+    Improves an order by reversing segments while that makes it cheaper.
+
+    The first stop stays fixed. Costs may be asymmetric (one-way streets), so
+    the reversed segment is re-priced from prefix sums of both directions.
+
+    Returns:
+        bool: True when the order was changed.
+    """
+    n = len(order)
+    changed = False
+    improved = True
+    while improved:
+        improved = False
+        forward = [0] * n
+        backward = [0] * n
+        for k in range(1, n):
+            forward[k] = forward[k - 1] + cost[order[k - 1]][order[k]]
+            backward[k] = backward[k - 1] + cost[order[k]][order[k - 1]]
+
+        for i in range(1, n - 1):
+            a = order[i - 1]
+            for j in range(i + 1, n):
+                b = order[j + 1] if j + 1 < n else (order[0] if round_trip else None)
+                before = cost[a][order[i]] + forward[j] - forward[i]
+                after = cost[a][order[j]] + backward[j] - backward[i]
+                if b is not None:
+                    before += cost[order[j]][b]
+                    after += cost[order[i]][b]
+                if after < before:
+                    order[i:j + 1] = order[i:j + 1][::-1]
+                    changed = improved = True
+                    break
+            if improved:
+                break
+    return changed
+
+
+def or_opt(order, cost, round_trip=False, max_segment=3):
+    """
+    Improves an order by moving runs of up to `max_segment` stops elsewhere.
+
+    Returns:
+        bool: True when the order was changed.
+    """
+    n = len(order)
+
+    def edge(a, b):
+        return 0 if a is None or b is None else cost[a][b]
+
+    def at(k):
+        if k < n:
+            return order[k]
+        return order[0] if round_trip else None
+
+    changed = False
+    improved = True
+    while improved:
+        improved = False
+        for size in range(1, max_segment + 1):
+            for i in range(1, n - size + 1):
+                first, last = order[i], order[i + size - 1]
+                prev, nxt = order[i - 1], at(i + size)
+                removed = edge(prev, first) + edge(last, nxt) - edge(prev, nxt)
+                # Insert between order[k - 1] and order[k], outside of the run itself
+                for k in range(1, n + 1):
+                    if i <= k <= i + size:
+                        continue
+                    left, right = order[k - 1], at(k)
+                    added = edge(left, first) + edge(last, right) - edge(left, right)
+                    if added < removed:
+                        run = order[i:i + size]
+                        del order[i:i + size]
+                        k = k - size if k > i else k
+                        order[k:k] = run
+                        changed = improved = True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+    return changed
+
+
+def optimize_order(cost, round_trip=False):
+    """
+    Near-optimal visiting order starting at stop 0: nearest neighbour, then
+    2-opt and Or-opt moves until neither finds an improvement.
+
+    Parameters:
+        cost (list): N×N matrix, None for unreachable pairs.
+        round_trip (bool): The trip ends back at the first stop.
+
+    Returns:
+        list: Stop indices in visiting order.
+    """
+    cost = [[UNREACHABLE if c is None else c for c in row] for row in cost]
+    with span("tour.optimize", stops=len(cost)):
+        order = nearest_neighbour(cost)
+        while two_opt(order, cost, round_trip) | or_opt(order, cost, round_trip):
+            pass
+    return order
+
+
+def chunk_points(points, size=MAX_ROUTE_POINTS):
+    """Split a point sequence into overlapping runs of at most `size` points"""
+    step = max(1, size - 1)
+    return [points[i:i + size] for i in range(0, max(1, len(points) - 1), step)]
+
+
+def plan_tour(geo, router, queries, vehicle, round_trip=False):
+    """
+    Plans a multi-stop trip with a handful of upstream requests.
+
+    All stops are geocoded concurrently, one N×N travel-time matrix is fetched
+    (or estimated locally when the Matrix API is unavailable), the visiting
+    order is optimized locally and only the final legs are routed, several
+    points per request.
+
+    Parameters:
+        geo (Geocoding): Geocoding client.
+        router (Routing): Routing client.
+        queries (list): Stop names, the first one is where the trip starts.
+        vehicle (str): GraphHopper profile.
+        round_trip (bool): Return to the first stop at the end.
+
+    Returns:
+        tuple: (status code, data) where data is a `Tour` on success and a dict
+        with a `message` otherwise.
+    """
+    with span("tour.plan", stops=len(queries), profile=vehicle), \
+            ThreadPoolExecutor(max_workers=min(len(queries), 8)) as pool:
+        def submit(fn, *args):
+            # Run in a copy of the caller's context so workers see the trip deadline
+            return pool.submit(contextvars.copy_context().run, fn, *args)
+
+        found = [future.result() for future in [submit(geo.geocoding, query) for query in queries]]
+        for query, (status, _, _, _) in zip(queries, found):
+            if status != 200:
+                return status, {"message": f"Could not find {query}"}
+        points = [(lat, lng) for _, lat, lng, _ in found]
+        requests = len(queries)
+
+        status, data = router.matrix(points, vehicle)
+        requests += 1
+        estimated = status != 200
+        distances, times = estimate_matrix(points, vehicle) if estimated else data
+
+        order = optimize_order(times, round_trip)
+        entered = list(range(len(points)))
+        visit = order + [order[0]] if round_trip else order
+
+        chunks = chunk_points([points[i] for i in visit])
+        results = [future.result() for future in [submit(router.route_through, chunk, vehicle) for chunk in chunks]]
+        requests += len(chunks)
+
+    for status, data in results:
+        if status != 200:
+            return status, data
+
+    legs = [(distances[a][b], times[a][b]) for a, b in zip(visit, visit[1:])]
+    stops = [(found[i][3], found[i][1], found[i][2]) for i in visit]
+    costs = [[UNREACHABLE if c is None else c for c in row] for row in times]
+    return 200, Tour(stops, [queries[i] for i in visit], Route.concat([data for _, data in results]), legs,
+                     tour_cost(entered, costs, round_trip), tour_cost(order, costs, round_trip), estimated, requests)
@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Span:
+    """
+    A timed section of work.
+
+    Attributes:
+        name (str): Stage name, e.g. "graphhopper.route".
+        start (float): Start time in seconds (perf_counter clock).
+        end (float): End time in seconds, None while the span is open.
+        attrs (dict): Extra attributes such as payload size or cache hits.
+        thread (int): Identifier of the thread that ran the span.
+        error (str): Exception type name if the span raised.
+    """
+    __slots__ = ("name", "start", "end", "attrs", "thread", "error")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.thread = threading.get_ident()
+        self.error = None
+        self.end = None
+        self.start = time.perf_counter()
+
+    def set(self, **attrs):
+        """Attach attributes to the span, e.g. span.set(bytes=len(body), cache_hit=False)"""
+        self.attrs.update(attrs)
+
+    @property
+    def duration_ms(self):
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+
+class Tracer:
+    """
+    Collects spans around outbound calls and render steps.
+
+    Spans are always timed and passed to the registered listeners (used for
+    running metrics); they are only kept in memory while `recording` is on,
+    which is what the --profile mode enables.
+    """
+    def __init__(self):
+        self.recording = False
+        self.spans = []
+        self.listeners = []
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self.origin = time.perf_counter()
+
+    def add_listener(self, listener):
+        """Register a callable that receives every finished span"""
+        self.listeners.append(listener)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        span = Span(name, attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+            if self.recording:
+                with self._lock:
+                    self.spans.append(span)
+            for listener in self.listeners:
+                listener(span)
+
+    def breakdown(self):
+        """
+        Aggregates recorded spans per name.
+
+        Returns:
+            list: (name, count, total ms, max ms, bytes) tuples, slowest first.
+        """
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            count, total, longest, size = totals.get(span.name, (0, 0.0, 0.0, 0))
+            duration = span.duration_ms
+            totals[span.name] = (count + 1, total + duration, max(longest, duration),
+                                 size + int(span.attrs.get("bytes", 0) or 0))
+        return sorted(((name,) + values for name, values in totals.items()), key=lambda row: -row[2])
+
+    def write_chrome_trace(self, path):
+        """
+        Writes the recorded spans in Chrome trace event format.
+
+        The file can be opened in chrome://tracing or https://ui.perfetto.dev.
+
+        Parameters:
+            path (str): Target .json file.
+
+        Returns:
+            int: Number of spans written.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        events = []
+        for span in spans:
+            args = {key: value if isinstance(value, (int, float, str, bool)) or value is None else str(value)
+                    for key, value in span.attrs.items()}
+            if span.error:
+                args["error"] = span.error
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(".")[0],
+                "ph": "X",
+                "ts": round((span.start - self.origin) * 1e6, 1),
+                "dur": round(span.duration_ms * 1000, 1),
+                "pid": pid,
+                "tid": span.thread,
+                "args": args,
+            })
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fp)
+        return len(events)
+
+
+# Process-wide tracer used by the utils classes and main()
+tracer = Tracer()
+
+
+def span(name, **attrs):
+    """Open a span on the process-wide tracer"""
+    return tracer.span(name, **attrs)
@@ -0,0 +1,470 @@
+import csv
+import datetime
+import io
+import os
+import zipfile
+from array import array
+
+from . import polyline
+from .route import Route
+from .spatial import KDTree, haversine
+from .trace import span
+
+INFINITY = 2 ** 40
+
+# Walking model for access, egress and transfers
+WALK_SPEED_MS = 1.2
+WALK_ROAD_FACTOR = 1.3
+ACCESS_RADIUS_KM = 1.0
+TRANSFER_RADIUS_KM = 0.3
+MIN_TRANSFER_S = 60
+MAX_ROUNDS = 5
+
+# GraphHopper public transit instruction signs
+SIGN_WALK = 0
+SIGN_FINISH = 4
+SIGN_START_TRIP = 101
+SIGN_TRANSFER = 102
+SIGN_END_TRIP = 103
+
+
+def parse_gtfs_time(value):
+    """Convert a GTFS HH:MM:SS time (hours may exceed 24) to seconds after midnight"""
+    hours, minutes, seconds = value.strip().split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def format_seconds(seconds):
+    """Format seconds after midnight as HH:MM"""
+    return f"{seconds // 3600 % 24:02d}:{seconds // 60 % 60:02d}"
+
+
+def walk_seconds(km):
+    return int(km * WALK_ROAD_FACTOR * 1000 / WALK_SPEED_MS)
+
+
+class GTFSFeed:
+    """
+    A GTFS feed loaded into compact, array-backed tables for RAPTOR queries.
+
+    Trips that visit the same stop sequence are grouped into patterns (RAPTOR
+    "routes"). Each pattern stores its stop list once and the arrival and
+    departure times of all its trips in one flat array, trips ordered by
+    departure, so the timetable needs no per-stop-time objects.
+
+    Parameters:
+        path (str): A GTFS directory or .zip file.
+        service_date (datetime.date): Only trips running on this date are loaded.
+            When None, or when the feed has no calendar files, all trips are used.
+    """
+    def __init__(self, path, service_date=None):
+        self.path = path
+        self.service_date = service_date
+
+        # Stops
+        self.stop_ids = []
+        self.stop_names = []
+        self.stop_lats = array("d")
+        self.stop_lngs = array("d")
+        # Routes and trips
+        self.route_labels = {}
+        self.trip_ids = []
+        self.trip_labels = []
+        self.trip_headsigns = []
+        # Patterns
+        self.pattern_stop_offsets = array("l", [0])
+        self.pattern_stops = array("l")
+        self.pattern_trip_offsets = array("l", [0])
+        self.pattern_trips = array("l")
+        self.pattern_time_offsets = array("l", [0])
+        self.arrivals = array("l")
+        self.departures = array("l")
+        # Stop -> (pattern, position) and stop -> (stop, seconds) transfers
+        self.stop_pattern_offsets = array("l")
+        self.stop_patterns = array("l")
+        self.stop_positions = array("l")
+        self.transfer_offsets = array("l")
+        self.transfer_stops = array("l")
+        self.transfer_times = array("l")
+
+        with span("transit.load", path=str(path)) as s:
+            self._load()
+            self.tree = KDTree(self.stop_lats, self.stop_lngs)
+            self._build_transfers()
+            s.set(stops=len(self.stop_ids), patterns=self.pattern_count)
+
+    def _rows(self, name):
+        if zipfile.is_zipfile(self.path):
+            with zipfile.ZipFile(self.path) as archive:
+                if name not in archive.namelist():
+                    return
+                with archive.open(name) as raw:
+                    yield from csv.DictReader(io.TextIOWrapper(raw, encoding="utf-8-sig"))
+        else:
+            file_path = os.path.join(self.path, name)
+            if not os.path.exists(file_path):
+                return
+            with open(file_path, newline="", encoding="utf-8-sig") as fp:
+                yield from csv.DictReader(fp)
+
+    def _active_services(self):
+        """Return the set of service_ids running on the service date, or None for all"""
+        if self.service_date is None:
+            return None
+        day = self.service_date.strftime("%Y%m%d")
+        weekday = self.service_date.strftime("%A").lower()
+        services = set()
+        has_calendar = False
+
+        for row in self._rows("calendar.txt"):
+            has_calendar = True
+            if row["start_date"] <= day <= row["end_date"] and row[weekday] == "1":
+                services.add(row["service_id"])
+        for row in self._rows("calendar_dates.txt"):
+            has_calendar = True
+            if row["date"] == day:
+                if row["exception_type"] == "1":
+                    services.add(row["service_id"])
+                else:
+                    services.discard(row["service_id"])
+
+        return services if has_calendar else None
+
+    def _load(self):
+        stop_index = {}
+        for row in self._rows("stops.txt"):
+            if not row.get("stop_lat") or not row.get("stop_lon"):
+                continue
+            stop_index[row["stop_id"]] = len(self.stop_ids)
+            self.stop_ids.append(row["stop_id"])
+            self.stop_names.append(row.get("stop_name", row["stop_id"]))
+            self.stop_lats.append(float(row["stop_lat"]))
+            self.stop_lngs.append(float(row["stop_lon"]))
+
+        for row in self._rows("routes.txt"):
+            self.route_labels[row["route_id"]] = row.get("route_short_name") or row.get("route_long_name") or row["route_id"]
+
+        services = self._active_services()
+        trip_index = {}
+        for row in self._rows("trips.txt"):
+            if services is not None and row["service_id"] not in services:
+                continue
+            trip_index[row["trip_id"]] = len(self.trip_ids)
+            self.trip_ids.append(row["trip_id"])
+            self.trip_labels.append(self.route_labels.get(row["route_id"], row["route_id"]))
+            self.trip_headsigns.append(row.get("trip_headsign", ""))
+
+        # trip -> list of (sequence, stop, arrival, departure)
+        trip_stop_times = {}
+        for row in self._rows("stop_times.txt"):
+            trip = trip_index.get(row["trip_id"])
+            stop = stop_index.get(row["stop_id"])
+            if trip is None or stop is None or not row.get("departure_time"):
+                continue
+            departure = parse_gtfs_time(row["departure_time"])
+            arrival = parse_gtfs_time(row["arrival_time"]) if row.get("arrival_time") else departure
+            trip_stop_times.setdefault(trip, []).append((int(row["stop_sequence"]), stop, arrival, departure))
+
+        # Group trips with identical stop sequences into patterns
+        patterns = {}
+        for trip, stop_times in trip_stop_times.items():
+            if len(stop_times) < 2:
+                continue
+            stop_times.sort()
+            key = tuple(stop for _, stop, _, _ in stop_times)
+            patterns.setdefault(key, []).append((stop_times[0][3], trip, stop_times))
+        del trip_stop_times
+
+        stop_patterns = [[] for _ in self.stop_ids]
+        for pattern, (stops, trips) in enumerate(patterns.items()):
+            trips.sort()
+            self.pattern_stops.extend(stops)
+            self.pattern_stop_offsets.append(len(self.pattern_stops))
+            for _, trip, stop_times in trips:
+                self.pattern_trips.append(trip)
+                for _, _, arrival, departure in stop_times:
+                    self.arrivals.append(arrival)
+                    self.departures.append(departure)
+            self.pattern_trip_offsets.append(len(self.pattern_trips))
+            self.pattern_time_offsets.append(len(self.arrivals))
+            for position, stop in enumerate(stops):
+                stop_patterns[stop].append((pattern, position))
+
+        for entries in stop_patterns:
+            self.stop_pattern_offsets.append(len(self.stop_patterns))
+            for pattern, position in entries:
+                self.stop_patterns.append(pattern)
+                self.stop_positions.append(position)
+        self.stop_pattern_offsets.append(len(self.stop_patterns))
+
+    def _build_transfers(self):
+        explicit = {}
+        for row in self._rows("transfers.txt"):
+            if row.get("min_transfer_time") and row["from_stop_id"] != row["to_stop_id"]:
+                explicit[(row["from_stop_id"], row["to_stop_id"])] = int(row["min_transfer_time"])
+
+        for stop in range(len(self.stop_ids)):
+            self.transfer_offsets.append(len(self.transfer_stops))
+            for km, other in self.tree.within(self.stop_lats[stop], self.stop_lngs[stop], TRANSFER_RADIUS_KM):
+                if other == stop:
+                    continue
+                seconds = explicit.get((self.stop_ids[stop], self.stop_ids[other]))
+                self.transfer_stops.append(other)
+                self.transfer_times.append(max(MIN_TRANSFER_S, seconds or walk_seconds(km)))
+        self.transfer_offsets.append(len(self.transfer_stops))
+
+    @property
+    def pattern_count(self):
+        return len(self.pattern_stop_offsets) - 1
+
+    def stops_near(self, lat, lng, radius_km=ACCESS_RADIUS_KM):
+        """Return (distance_km, stop) tuples for stops within walking distance"""
+        return self.tree.within(lat, lng, radius_km)
+
+
+class TransitPlanner:
+    """
+    Earliest-arrival public transit planner using the round-based RAPTOR algorithm.
+
+    Round k finds the best arrival at every stop using at most k vehicles: each
+    round scans only the patterns serving stops improved in the previous round,
+    then relaxes short walking transfers. Results are returned as a `Route` with
+    the same shape as a GraphHopper route.
+
+    Parameters:
+        feed (GTFSFeed): The loaded timetable.
+    """
+    def __init__(self, feed):
+        self.feed = feed
+
+    def _earliest_trip(self, pattern, position, ready):
+        """Index (within the pattern) of the first trip departing `position` at or after `ready`, or -1"""
+        feed = self.feed
+        n_stops = feed.pattern_stop_offsets[pattern + 1] - feed.pattern_stop_offsets[pattern]
+        n_trips = feed.pattern_trip_offsets[pattern + 1] - feed.pattern_trip_offsets[pattern]
+        base = feed.pattern_time_offsets[pattern] + position
+        departures = feed.departures
+        lo, hi = 0, n_trips
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if departures[base + mid * n_stops] < ready:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < n_trips else -1
+
+    def earliest_arrival(self, access, egress, departure, max_rounds=MAX_ROUNDS):
+        """
+        Runs RAPTOR from a set of access stops to a set of egress stops.
+
+        Parameters:
+            access (dict): {stop: walking seconds from the origin}.
+            egress (dict): {stop: walking seconds to the destination}.
+            departure (int): Departure time in seconds after midnight.
+            max_rounds (int): Maximum number of vehicles used.
+
+        Returns:
+            tuple: (arrival seconds, legs) for the best journey, or (None, None).
+            Legs are ("walk", from_stop, to_stop, seconds) and
+            ("ride", pattern, trip, board_position, alight_position) tuples, where
+            from_stop None means the origin and to_stop None the destination.
+        """
+        feed = self.feed
+        n = len(feed.stop_ids)
+        best = array("q", [INFINITY]) * n
+        previous = array("q", [INFINITY]) * n
+        labels = [{}]
+        marked = set()
+
+        for stop, seconds in access.items():
+            previous[stop] = best[stop] = departure + seconds
+            labels[0][stop] = ("walk", None, stop, seconds)
+            marked.add(stop)
+
+        def target_bound(times):
+            return min((times[stop] + seconds for stop, seconds in egress.items()), default=INFINITY)
+
+        rounds = [previous]
+        bound = target_bound(previous)
+
+        for _ in range(max_rounds):
+            current = array("q", previous)
+            round_labels = {}
+
+            queue = {}
+            for stop in marked:
+                for j in range(feed.stop_pattern_offsets[stop], feed.stop_pattern_offsets[stop + 1]):
+                    pattern = feed.stop_patterns[j]
+                    position = feed.stop_positions[j]
+                    if position < queue.get(pattern, INFINITY):
+                        queue[pattern] = position
+            marked = set()
+
+            for pattern, start in queue.items():
+                stop_base = feed.pattern_stop_offsets[pattern]
+                n_stops = feed.pattern_stop_offsets[pattern + 1] - stop_base
+                time_base = feed.pattern_time_offsets[pattern]
+                trip = -1
+                board = -1
+                for position in range(start, n_stops):
+                    stop = feed.pattern_stops[stop_base + position]
+                    if trip >= 0:
+                        arrival = feed.arrivals[time_base + trip * n_stops + position]
+                        if arrival < best[stop] and arrival < bound:
+                            current[stop] = best[stop] = arrival
+                            round_labels[stop] = ("ride", pattern, trip, board, position)
+                            marked.add(stop)
+                    ready = previous[stop]
+                    if ready < INFINITY and (trip < 0 or ready <= feed.departures[time_base + trip * n_stops + position]):
+                        earlier = self._earliest_trip(pattern, position, ready)
+                        if earlier >= 0 and (trip < 0 or earlier < trip):
+                            trip = earlier
+                            board = position
+
+            for stop in list(marked):
+                for j in range(feed.transfer_offsets[stop], feed.transfer_offsets[stop + 1]):
+                    other = feed.transfer_stops[j]
+                    arrival = current[stop] + feed.transfer_times[j]
+                    if arrival < best[other] and arrival < bound:
+                        current[other] = best[other] = arrival
+                        round_labels[other] = ("walk", stop, other, feed.transfer_times[j])
+                        marked.add(other)
+
+            labels.append(round_labels)
+            rounds.append(current)
+            previous = current
+            bound = min(bound, target_bound(current))
+            if not marked:
+                break
+
+        # Pick the best (round, egress stop) and walk the labels backwards
+        best_total = INFINITY
+        best_round = best_stop = None
+        for k, times in enumerate(rounds):
+            for stop, seconds in egress.items():
+                if times[stop] + seconds < best_total:
+                    best_total = times[stop] + seconds
+                    best_round = k
+                    best_stop = stop
+        if best_stop is None:
+            return None, None
+
+        legs = [("walk", best_stop, None, egress[best_stop])]
+        k = best_round
+        stop = best_stop
+        while True:
+            while stop not in labels[k]:
+                k -= 1
+            label = labels[k][stop]
+            legs.append(label)
+            if label[0] == "ride":
+                _, pattern, _, board, _ = label
+                stop = feed.pattern_stops[feed.pattern_stop_offsets[pattern] + board]
+                k -= 1
+            elif label[1] is None:
+                break
+            else:
+                stop = label[1]
+        legs.reverse()
+        return best_total, legs
+
+    def plan(self, orig_lat, orig_lng, dest_lat, dest_lng, departure):
+        """
+        Plans the earliest-arrival transit journey between two coordinates.
+
+        Parameters:
+            orig_lat, orig_lng: Origin coordinates.
+            dest_lat, dest_lng: Destination coordinates.
+            departure (datetime.datetime or datetime.time): Departure time.
+
+        Returns:
+            tuple: (status code, data) where data is a `Route` on success and a
+            dict with a `message` otherwise, mirroring `Routing.route`.
+        """
+        feed = self.feed
+        orig_lat, orig_lng, dest_lat, dest_lng = map(float, (orig_lat, orig_lng, dest_lat, dest_lng))
+        if isinstance(departure, datetime.datetime):
+            departure = departure.time()
+        start = departure.hour * 3600 + departure.minute * 60 + departure.second
+
+        access = {stop: walk_seconds(km) for km, stop in feed.stops_near(orig_lat, orig_lng)}
+        egress = {stop: walk_seconds(km) for km, stop in feed.stops_near(dest_lat, dest_lng)}
+        if not access or not egress:
+            return 404, {"message": f"No transit stop within {ACCESS_RADIUS_KM:.0f} km of the "
+                                    f"{'origin' if not access else 'destination'}"}
+
+        with span("transit.raptor", access=len(access), egress=len(egress)):
+            arrival, legs = self.earliest_arrival(access, egress, start)
+        if legs is None:
+            return 404, {"message": "No transit connection found for this departure time"}
+        return 200, self.build_route(orig_lat, orig_lng, dest_lat, dest_lng, start, arrival, legs)
+
+    def build_route(self, orig_lat, orig_lng, dest_lat, dest_lng, start, arrival, legs):
+        feed = self.feed
+        lats = array("d", [orig_lat])
+        lngs = array("d", [orig_lng])
+        instructions = []
+        clock = start
+        rides = 0
+
+        for leg in legs:
+            first = len(lats) - 1
+            if leg[0] == "walk":
+                _, from_stop, to_stop, seconds = leg
+                a = (orig_lat, orig_lng) if from_stop is None else (feed.stop_lats[from_stop], feed.stop_lngs[from_stop])
+                b = (dest_lat, dest_lng) if to_stop is None else (feed.stop_lats[to_stop], feed.stop_lngs[to_stop])
+                target = "your destination" if to_stop is None else feed.stop_names[to_stop]
+                lats.append(b[0])
+                lngs.append(b[1])
+                instructions.append({
+                    "text": f"Walk to {target}", "sign": SIGN_WALK, "time": seconds * 1000,
+                    "distance": haversine(a[0], a[1], b[0], b[1]) * WALK_ROAD_FACTOR * 1000,
+                    "interval": [first, len(lats) - 1], "street_name": "",
+                })
+                clock += seconds
+            else:
+                _, pattern, trip, board, alight = leg
+                stop_base = feed.pattern_stop_offsets[pattern]
+                n_stops = feed.pattern_stop_offsets[pattern + 1] - stop_base
+                time_base = feed.pattern_time_offsets[pattern] + trip * n_stops
+                trip_index = feed.pattern_trips[feed.pattern_trip_offsets[pattern] + trip]
+                board_stop = feed.pattern_stops[stop_base + board]
+                alight_stop = feed.pattern_stops[stop_base + alight]
+                depart_at = feed.departures[time_base + board]
+                arrive_at = feed.arrivals[time_base + alight]
+
+                distance = 0.0
+                for position in range(board + 1, alight + 1):
+                    stop = feed.pattern_stops[stop_base + position]
+                    distance += haversine(lats[-1], lngs[-1], feed.stop_lats[stop], feed.stop_lngs[stop])
+                    lats.append(feed.stop_lats[stop])
+                    lngs.append(feed.stop_lngs[stop])
+
+                headsign = feed.trip_headsigns[trip_index]
+                towards = f" towards {headsign}" if headsign else ""
+                instructions.append({
+                    "text": f"{format_seconds(depart_at)} Board {feed.trip_labels[trip_index]}{towards} "
+                            f"at {feed.stop_names[board_stop]}",
+                    "sign": SIGN_START_TRIP if rides == 0 else SIGN_TRANSFER,
+                    "time": (depart_at - clock) * 1000, "distance": 0,
+                    "interval": [first, first], "street_name": feed.trip_labels[trip_index],
+                })
+                instructions.append({
+                    "text": f"{format_seconds(arrive_at)} Get off at {feed.stop_names[alight_stop]} "
+                            f"({alight - board} stops)",
+                    "sign": SIGN_END_TRIP, "time": (arrive_at - depart_at) * 1000, "distance": distance * 1000,
+                    "interval": [first, len(lats) - 1], "street_name": feed.trip_labels[trip_index],
+                })
+                clock = arrive_at
+                rides += 1
+
+        instructions.append({
+            "text": f"{format_seconds(arrival)} Arrive at destination", "sign": SIGN_FINISH, "time": 0,
+            "distance": 0, "interval": [len(lats) - 1, len(lats) - 1], "street_name": "",
+        })
+        return Route.from_path({
+            "distance": sum(step["distance"] for step in instructions),
+            "time": (arrival - start) * 1000,
+            "points": polyline.encode(lats, lngs),
+            "instructions": instructions,
+        })
@@ -0,0 +1,148 @@
+import math
+import time
+
+from .fallbacks import is_error
+from .meteo import FRESH_TTL as FORECAST_TTL
+from .trace import span
+
+
+class _Stage:
+    __slots__ = ("fn", "deps", "max_age", "keep")
+
+    def __init__(self, fn, deps, max_age, keep):
+        self.fn = fn
+        self.deps = deps
+        self.max_age = max_age
+        self.keep = keep
+
+
+class TripState:
+    """
+    Inputs and stage results of a trip, re-computed only when something they
+    depend on changed.
+
+    Inputs (what the user typed, the profile) are set with `set`. A stage is
+    a function of named inputs or other stages; `get` runs it only when one
+    of those changed since its last run, so a new profile re-routes without
+    geocoding again and a new destination keeps the origin and its forecast.
+    Every value has a version that is bumped when it changes; a stage whose
+    result comes out equal to the previous one keeps its version, so the
+    stages after it are not re-run either.
+
+    Stage results can also be set directly, e.g. a route that was picked from
+    a comparison, and are then treated as computed from the current inputs.
+    """
+    def __init__(self):
+        self._stages = {}
+        self._values = {}
+        self._versions = {}
+        self._seen = {}       # stage: dependency versions of its last run
+        self._stored_at = {}
+        self.runs = {}
+
+    def stage(self, name, deps, fn, max_age=None, keep=None):
+        """
+        Register a stage.
+
+        Parameters:
+            name (str): Stage name.
+            deps (tuple): Names of the inputs and stages it reads, in the order of `fn`'s arguments.
+            fn (callable): Computes the result from the dependency values.
+            max_age (float): Seconds a result is reused at most, None for no limit.
+            keep (callable): Whether a result may be reused, e.g. not errors; default keeps all.
+        """
+        self._stages[name] = _Stage(fn, tuple(deps), max_age, keep)
+
+    def set(self, **values):
+        """Set inputs or stage results, in the given order; equal values change nothing"""
+        for name, value in values.items():
+            if name in self._values and self._values[name] == value:
+                continue
+            self._values[name] = value
+            self._versions[name] = self._versions.get(name, 0) + 1
+            if name in self._stages:
+                self._seen[name] = self._dep_versions(self._stages[name])
+                self._stored_at[name] = time.time()
+
+    def _dep_versions(self, stage):
+        return tuple(self._versions.get(dep, 0) for dep in stage.deps)
+
+    def get(self, name):
+        """Value of an input, or the result of a stage, re-running it and its dependencies as needed"""
+        stage = self._stages.get(name)
+        if stage is None:
+            return self._values.get(name)
+        args = [self.get(dep) for dep in stage.deps]
+        versions = self._dep_versions(stage)
+        with span(f"trip.{name}") as s:
+            if not self._is_current(name, stage, versions):
+                value = stage.fn(*args)
+                s.set(reused=False)
+                self.runs[name] = self.runs.get(name, 0) + 1
+                if stage.keep is not None and not stage.keep(value):
+                    # Not reused, and stages after it must not keep results built on the old value
+                    self._seen.pop(name, None)
+                    self._values.pop(name, None)
+                    self._versions[name] = self._versions.get(name, 0) + 1
+                    return value
+                if name not in self._values or self._values[name] != value:
+                    self._values[name] = value
+                    self._versions[name] = self._versions.get(name, 0) + 1
+                self._seen[name] = versions
+                self._stored_at[name] = time.time()
+            else:
+                s.set(reused=True)
+        return self._values[name]
+
+    def _is_current(self, name, stage, versions):
+        if self._seen.get(name) != versions:
+            return False
+        return stage.max_age is None or time.time() - self._stored_at[name] <= stage.max_age
+
+
+def _found(result):
+    return result[0] == 200
+
+
+def trip_state(geo, router, weather, gpt):
+    """
+    The stages of a trip:
+
+        origin_query -> origin -> origin_forecast ----------------+
+        destination_query -> destination -> destination_forecast -+-> weather_advisory
+        origin, destination, vehicle -> route --------------------+
+
+    Inputs are `origin_query`, `destination_query` and `vehicle`. Geocoding and
+    routing results are (status, ...) tuples like the clients return; only
+    successful ones are reused. Forecasts are reused while Open-Meteo's data
+    is fresh, and failed AI answers are never reused.
+
+    Parameters:
+        geo (Geocoding): Geocoding client.
+        router (Routing): Routing client.
+        weather (OpenMeteo): Weather client.
+        gpt (Genai): AI client for the weather advisory.
+    """
+    state = TripState()
+    state.stage("origin", ("origin_query",), geo.geocoding, keep=_found)
+    state.stage("destination", ("destination_query",), geo.geocoding, keep=_found)
+
+    def route(origin, destination, vehicle):
+        return router.route(origin[1], origin[2], destination[1], destination[2], vehicle)
+
+    state.stage("route", ("origin", "destination", "vehicle"), route, keep=_found)
+    state.stage("origin_forecast", ("origin",), lambda origin: weather.get_hourly(origin[1], origin[2]),
+                max_age=FORECAST_TTL, keep=bool)
+    state.stage("destination_forecast", ("destination",),
+                lambda destination: weather.get_hourly(destination[1], destination[2]),
+                max_age=FORECAST_TTL, keep=bool)
+
+    def advisory(origin, destination, route, origin_hourly, destination_hourly):
+        hours = route[1].hours
+        return gpt.check_weather_conditions(origin[3], destination[3], f"{hours:.1f}",
+                                            origin_hourly, destination_hourly, math.ceil(hours))
+
+    state.stage("weather_advisory",
+                ("origin", "destination", "route", "origin_forecast", "destination_forecast"),
+                advisory, keep=lambda text: not is_error(text))
+    return state
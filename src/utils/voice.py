@@ -3,6 +3,8 @@ import pygame
 import time
 from io import BytesIO
 
+from .trace import span
+
 
 def clean_instruction(text):
     return text.replace("**", "").strip()
@@ -14,7 +16,7 @@ def play_audio(filename):
     while pygame.mixer.music.get_busy():
         time.sleep(0.1)
 
-def voice_navigation(instructions):
+def voice_navigation(instructions, should_stop=None):
     """
     Provides functionality to navigate using voice guidance based on natural language
     instructions provided as input.
@@ -27,21 +29,40 @@ def voice_navigation(instructions):
     ----------
     natural_instructions : list of str
         A list of natural language instructions to be spoken aloud.
+    should_stop : callable, optional
+        Checked before each instruction and while audio plays; playback stops
+        as soon as it returns True (e.g. after Ctrl+C).
+    """
+    voice_navigation_stream(instructions[1:], should_stop)
+
+def voice_navigation_stream(instructions, should_stop=None):
+    """
+    Speaks instructions as they arrive from any iterable, e.g. a generator that
+    yields rewritten chunks while later ones are still being generated. Unlike
+    `voice_navigation` there is no heading entry to skip.
     """
-    for instruction in instructions[1:]:
+    for instruction in instructions:
+        if should_stop and should_stop():
+            return
         if not instruction.strip():
             continue
 
         clean_text = clean_instruction(instruction)
         # print(f"🎙️ Speaking: {clean_text}")
 
-        tts = gTTS(text=clean_text, lang='en')
-        audio_data = BytesIO()
-        tts.write_to_fp(audio_data)
-        audio_data.seek(0)
+        with span("tts.synthesize", chars=len(clean_text)) as s:
+            tts = gTTS(text=clean_text, lang='en')
+            audio_data = BytesIO()
+            tts.write_to_fp(audio_data)
+            s.set(bytes=audio_data.tell())
+            audio_data.seek(0)
 
-        pygame.mixer.init()
-        pygame.mixer.music.load(audio_data, "mp3")
-        pygame.mixer.music.play()
-        while pygame.mixer.music.get_busy():
-            time.sleep(0.1)
+        with span("tts.playback"):
+            pygame.mixer.init()
+            pygame.mixer.music.load(audio_data, "mp3")
+            pygame.mixer.music.play()
+            while pygame.mixer.music.get_busy():
+                if should_stop and should_stop():
+                    pygame.mixer.music.stop()
+                    return
+                time.sleep(0.1)